@@ -0,0 +1,64 @@
+import os
+import glob
+
+from pgpointcloud_utils import PcInvalidArgException
+
+# extensions of GeoJSON files found in directories
+GEOJSON_EXTENSIONS = ['.json', '.geojson', '.geojsonl', '.geojsons', '.ndjson']
+
+def read_manifest(manifest):
+    '''
+    paths or globs of input files listed one per line. blank lines and lines
+    starting with # are skipped. relative paths are relative to the
+    directory of the manifest
+    '''
+
+    base_dir = os.path.dirname(manifest)
+
+    entries = []
+    with open(manifest, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entries.append(os.path.join(base_dir, line))
+
+    return entries
+
+def expand_input_files(inputs):
+    '''
+    expand globs and directories into a list of files. GeoJSON files of
+    directories are found by extension. files are returned once, in the
+    order found, however the path is spelled
+    '''
+
+    files = []
+    seen = set()
+    for entry in inputs:
+
+        paths = sorted(glob.glob(entry))
+        if not paths:
+            raise PcInvalidArgException(
+                message='Input file not found: %s' % entry
+            )
+
+        # GeoJSON files of directories
+        files_of_paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                files_of_paths.extend(sorted(
+                    os.path.join(path, name)
+                    for name in os.listdir(path)
+                    if os.path.splitext(name)[1].lower() in GEOJSON_EXTENSIONS
+                ))
+            else:
+                files_of_paths.append(path)
+        paths = files_of_paths
+
+        for path in paths:
+            key = os.path.normpath(os.path.abspath(path))
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+
+    return files
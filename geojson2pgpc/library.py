@@ -5,7 +5,11 @@ from tzlocal import get_localzone
 import pytz
 
 import os
+import itertools
+import collections
+import multiprocessing
 import simplejson as json
+import numpy
 
 import psycopg2
 from psycopg2.extensions import AsIs
@@ -18,8 +22,14 @@ from .pgpointcloud import (
     DATA_TYPE_MAPPING,
     build_pc_dimension, build_pc_schema, add_pc_schema,
     create_pcpatch_table, create_temp_table,
-    insert_pcpoints, copy_pcpoints, insert_pcpatches, make_wkb_point
+    insert_pcpoints, copy_pcpoints, insert_pcpatches, make_wkb_point,
+    make_pcpoint_rows, copy_pcpoint_rows, pack_wkb_point,
+    make_pcpoint_binary_rows, copy_pcpoints_binary, convert_binary_temp_table,
+    get_pcformat, build_pcpatches, PointBuffer,
+    get_connection, release_connection, close_connections
 )
+from .reader import GeoJSONReader
+from .inputs import read_manifest, expand_input_files
 
 from pgpointcloud_utils import PcRunTimeException, PcInvalidArgException
 
@@ -46,29 +56,52 @@ Config = {
     'datetime': [],
     'timezone': get_localzone(),
     'copy_mode': False,
+    'binary_mode': False,
+    'client_mode': False,
+    'patch_strategy': 'grid',
     'buffer_size': 1000,
-    'patch_size': 400
+    'patch_size': 400,
+    'sample_size': 1,
+    'jobs': 1,
+    'pool_size': 1,
+    'input_files': [],
+    'manifest': None,
+    'workers': 1
 }
 DSIn = None
 DBConn = None
 
+# state of worker process
+Worker = {}
+
 def open_input_file(f):
+    '''
+    features are read one at a time as the layer is iterated
+    '''
 
     global DSIn
 
-    DSIn = json.load(open(f, 'r'))
-
-    if DSIn is None or DSIn.get('type', None) != 'FeatureCollection':
-        raise PcInvalidArgException(
-            message='Invalid input file'
-        )
+    DSIn = GeoJSONReader(f)
 
     return DSIn
 
 def open_db_connection(dsn):
-    return psycopg2.connect(dsn)
+    '''
+    connections are pooled by DSN and reused by later imports of the
+    process. see close_db_connection
+    '''
+
+    return get_connection(dsn, Config.get('pool_size', 1))
+
+def close_db_connection(dsn, dbconn):
+
+    release_connection(dsn, dbconn)
 
-def interpret_fields(layer):
+def interpret_fields(sample):
+    '''
+    fields are interpreted from a sample of the leading features. the type
+    of a field is that of its first value that is not null
+    '''
 
     def add_coordinate(dimensions, coord):
         field_type = float
@@ -88,7 +121,7 @@ def interpret_fields(layer):
         'overrides': {}
     }
 
-    if len(layer) < 1:
+    if len(sample) < 1:
         raise PcRunTimeException(
             message='Layer has no fields'
         )
@@ -97,9 +130,12 @@ def interpret_fields(layer):
     add_coordinate(fields['dimension'], 'Y')
     add_coordinate(fields['dimension'], 'Z')
 
-    # use the first feature
-    feat = layer[0]
-    properties = feat['properties']
+    # use the sampled features
+    properties = {}
+    for feat in sample:
+        for key, value in (feat['properties'] or {}).iteritems():
+            if properties.get(key, None) is None:
+                properties[key] = value
     keys = properties.keys()
     keys.sort()
 
@@ -279,13 +315,26 @@ def get_layer_srid(layer):
     return srid
     '''
 
+def get_metadata():
+    '''
+    metadata from config or properties of the FeatureCollection. properties
+    may follow the features so this is checked once the layer is read
+    '''
+
+    metadata = Config.get('metadata', None)
+    if not metadata:
+        metadata = DSIn.members.get('properties', None)
+
+    return metadata
+
 def extract_group(feat, fields):
 
     num_group_by = len(fields['group_by'])
     group_list = []
     group_dict = {}
+    properties = feat['properties']
     for idx in xrange(num_group_by):
-        group_list.append(feat.GetField(fields['group_by'][idx]['index']))
+        group_list.append(properties.get(fields['group_by'][idx]['name']))
         group_dict[fields['group_by'][idx]['name']] = group_list[-1]
 
     return group_dict
@@ -442,46 +491,249 @@ def build_pcpoint_from_feature(feat, fields, struct_format=False):
     else:
         return vals
 
-def import_layer(layer, file_table, pcid, fields):
+def _init_worker(config, fields, pcid):
 
-    buffer_size = Config.get('buffer_size')
-    copy_mode = Config.get('copy_mode')
+    global Config
 
-    num_features = len(layer)
+    Config = config
+    Worker['fields'] = fields
+    Worker['pcid'] = pcid
 
-    # create temporary table for layer
-    temp_table = create_temp_table(DBConn)
+def build_pcpoint_rows(features, fields, pcid, binary=False):
+    '''
+    returns COPY rows of (pt, group_by) of features. rows are in the
+    binary format of COPY if binary, otherwise text
+    '''
+
+    if binary:
+        make_point = pack_wkb_point
+        make_rows = make_pcpoint_binary_rows
+    else:
+        make_point = make_wkb_point
+        make_rows = make_pcpoint_rows
 
     frmt = None
     wkb_set = []
+    groups = []
+    for feat in features:
 
-    # iterate over features
-    for idx in xrange(num_features):
-
-        feat = layer[idx]
+        groups.append(extract_group(feat, fields))
 
-        # get group
-        group = extract_group(feat, fields)
-
-        # build pcpoint values
         if frmt is None:
             vals, frmt = build_pcpoint_from_feature(feat, fields, True)
         else:
             vals = build_pcpoint_from_feature(feat, fields)
 
-        # make wkb of pcpoint
-        wkb_set.append(make_wkb_point(pcid, frmt, vals))
+        wkb_set.append(make_point(pcid, frmt, vals))
+
+    return make_rows(wkb_set, groups)
 
-        if len(wkb_set) >= buffer_size:
-            if copy_mode is True:
-                copy_pcpoints(DBConn, temp_table, wkb_set, group)
+def _pcpoint_rows_from_features(features):
+
+    return build_pcpoint_rows(
+        features,
+        Worker['fields'],
+        Worker['pcid'],
+        Config.get('binary_mode', False)
+    )
+
+def _values_from_features(features):
+    '''
+    returns tuple of list of groups and 2D array of PcPoint values of
+    features
+    '''
+
+    fields = Worker['fields']
+
+    groups = []
+    points = []
+    for feat in features:
+
+        groups.append(json.dumps(extract_group(feat, fields), sort_keys=True))
+        points.append(build_pcpoint_from_feature(feat, fields))
+
+    return groups, numpy.array(points, dtype=numpy.float64)
+
+def chunk_features(layer, chunk_size):
+    '''
+    generate lists of chunk_size consecutive features
+    '''
+
+    features = iter(layer)
+    while True:
+        chunk = list(itertools.islice(features, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+def map_chunks(func, chunks, jobs, initargs):
+    '''
+    apply func to each chunk in a pool of jobs processes. results are
+    generated in the order of chunks. no more than 2 * jobs chunks are
+    pending at a time so that memory stays bounded
+    '''
+
+    pool = multiprocessing.Pool(
+        jobs,
+        initializer=_init_worker,
+        initargs=initargs
+    )
+
+    try:
+
+        pending = collections.deque()
+        for chunk in chunks:
+
+            pending.append(pool.apply_async(func, (chunk,)))
+
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+        pool.close()
+
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def import_layer_patches(layer, file_table, pcid, fields):
+    '''
+    build PcPatches of layer in Python and copy them into file_table.
+    no temporary table of PcPoints is used
+    '''
+
+    pcformat = get_pcformat(DBConn, pcid)
+    jobs = int(Config.get('jobs', 1) or 1)
+
+    # each feature has one value per dimension of fields
+    if len(fields['dimension']) != len(pcformat.dimensions):
+        raise PcRunTimeException(
+            message='Features do not match the dimensions of PCID: %s' % pcid
+        )
+
+    points = PointBuffer(
+        len(pcformat.dimensions), int(Config.get('buffer_size', 1000))
+    )
+    if jobs > 1:
+
+        for chunk_groups, chunk_points in map_chunks(
+            _values_from_features,
+            chunk_features(layer, int(Config.get('buffer_size', 1000))),
+            jobs,
+            (Config, fields, pcid)
+        ):
+            points.extend(chunk_groups, chunk_points)
+
+    else:
+
+        for feat in layer:
+
+            # get group and pcpoint values
+            points.append(
+                json.dumps(extract_group(feat, fields), sort_keys=True),
+                build_pcpoint_from_feature(feat, fields)
+            )
+
+    if len(points) < 1:
+        return True
+
+    file_name = Config.get('input_file', None)
+    if file_name:
+        file_name = os.path.basename(file_name)
+
+    # build patches for layer by distinct group
+    build_pcpatches(
+        DBConn,
+        file_table,
+        pcformat,
+        points.columns,
+        points.groups,
+        layer_name=None,
+        metadata=get_metadata(),
+        file_name=file_name,
+        max_points_per_patch=int(Config.get('patch_size', 400)),
+        buffer_size=int(Config.get('buffer_size', 1000)),
+        strategy=Config.get('patch_strategy', 'grid'),
+        binary=Config.get('binary_mode', False)
+    )
+
+    return True
+
+def import_layer(layer, file_table, pcid, fields):
+
+    # quadtree patches can only be built in Python
+    if (
+        Config.get('client_mode', False) or
+        Config.get('patch_strategy', 'grid') == 'quadtree'
+    ):
+        return import_layer_patches(layer, file_table, pcid, fields)
+
+    buffer_size = Config.get('buffer_size')
+    copy_mode = Config.get('copy_mode')
+    binary_mode = Config.get('binary_mode', False)
+    jobs = int(Config.get('jobs', 1) or 1)
+
+    # create temporary table for layer
+    temp_table = create_temp_table(DBConn, binary=binary_mode)
+
+    if jobs > 1 or copy_mode is True or binary_mode:
+
+        buffer_size = int(buffer_size)
+
+        # features are converted by worker processes, or buffer_size at a
+        # time, so only a few chunks of rows are held at once
+        if jobs > 1:
+            data = map_chunks(
+                _pcpoint_rows_from_features,
+                chunk_features(layer, buffer_size),
+                jobs,
+                (Config, fields, pcid)
+            )
+        else:
+            data = (
+                build_pcpoint_rows(chunk, fields, pcid, binary_mode)
+                for chunk in chunk_features(layer, buffer_size)
+            )
+
+        # all PcPoints of layer are streamed in one COPY, each PcPoint with
+        # the group of its feature
+        if binary_mode:
+            copy_pcpoints_binary(DBConn, temp_table, data)
+            convert_binary_temp_table(DBConn, temp_table)
+        else:
+            copy_pcpoint_rows(DBConn, temp_table, data)
+
+    else:
+
+        frmt = None
+        wkb_set = []
+
+        # iterate over features
+        for feat in layer:
+
+            # get group
+            group = extract_group(feat, fields)
+
+            # build pcpoint values
+            if frmt is None:
+                vals, frmt = build_pcpoint_from_feature(feat, fields, True)
             else:
+                vals = build_pcpoint_from_feature(feat, fields)
+
+            # make wkb of pcpoint
+            wkb_set.append(make_wkb_point(pcid, frmt, vals))
+
+            if len(wkb_set) >= buffer_size:
                 insert_pcpoints(DBConn, temp_table, wkb_set, group)
-            wkb_set = []
+                wkb_set = []
 
-    if len(wkb_set) >= 0:
-        copy_pcpoints(DBConn, temp_table, wkb_set, group)
-        wkb_set = []
+        if wkb_set:
+            insert_pcpoints(DBConn, temp_table, wkb_set, group)
+            wkb_set = []
 
     file_name = Config.get('input_file', None)
     if file_name:
@@ -493,7 +745,7 @@ def import_layer(layer, file_table, pcid, fields):
         file_table,
         temp_table,
         layer,
-        Config.get('metadata', None),
+        get_metadata(),
         file_name,
         max_points_per_patch=Config.get('patch_size', 400)
     )
@@ -522,7 +774,8 @@ def get_pcid(layer, fields):
         while pcid is None and retry < 5:
             # add schema to database
             pcid = add_pc_schema(DBConn, pc_schema, srid)
-            time.sleep(1)
+            if pcid is None:
+                time.sleep(1)
             retry += 1
 
         if pcid is None:
@@ -545,20 +798,20 @@ def convert_layer(layer, pcid, fields, file_name, file_table):
 
 def convert_file():
 
-    layer = DSIn['features']
+    features = DSIn.features()
 
-    if not layer:
+    # sampled features are put back in front of the remaining features
+    sample_size = max(int(Config.get('sample_size', 1) or 1), 1)
+    sample = list(itertools.islice(features, sample_size))
+    if not sample:
         raise PcRunTimeException(
             message='Input file has no layer'
         )
+    layer = itertools.chain(sample, features)
 
-    fields = interpret_fields(layer)
+    fields = interpret_fields(sample)
     pcid = get_pcid(layer, fields)
 
-    metadata = DSIn.get('properties', None)
-    if metadata and not Config.get('metadata', None):
-        Config['metadata'] = metadata
-
     file_name = Config.get('input_file', None)
     table_name = Config.get('table_name', None)
 
@@ -566,7 +819,7 @@ def convert_file():
         table_name = '"' + os.path.splitext(os.path.basename(file_name))[0] + '"'
     else:
         # qualify
-        table_name = '"' + '"."'.join(table_name.split('.', 1)) + '"'
+        table_name = qualify_table_name(table_name)
 
     table_action = Config.get('table_action', 'c')
     if table_action is None:
@@ -598,4 +851,150 @@ def geojson_to_pgpointcloud(config):
         DBConn.rollback()
         raise
     finally:
-        DBConn.close()
+        close_db_connection(Config.get('dsn', None), DBConn)
+        DSIn.close()
+
+def qualify_table_name(table_name):
+
+    return '"' + '"."'.join(table_name.split('.', 1)) + '"'
+
+def _import_file(config):
+    '''
+    import one file of import_files. returns tuple of input file, size in
+    bytes, seconds and error message if failed
+    '''
+
+    input_file = config.get('input_file', None)
+
+    try:
+        size = os.path.getsize(input_file)
+    except OSError:
+        size = 0
+
+    start = time.time()
+    try:
+        geojson_to_pgpointcloud(config)
+    except Exception as e:
+        return (
+            input_file, size, time.time() - start,
+            getattr(e, 'message', None) or str(e) or e.__class__.__name__
+        )
+
+    return input_file, size, time.time() - start, None
+
+def import_files(config):
+    '''
+    import the files of input_files and manifest. files are imported by a
+    pool of worker processes, each reusing its connections and lookups
+    across files. throughput is reported per file
+
+    if table_name is specified, the table is created once before any file
+    is imported and all files are appended to it
+    '''
+
+    inputs = list(config.get('input_files', None) or [])
+    if config.get('input_file', None):
+        inputs.append(config['input_file'])
+    if config.get('manifest', None):
+        inputs.extend(read_manifest(config['manifest']))
+
+    files = expand_input_files(inputs)
+    if not files:
+        raise PcInvalidArgException(
+            message='No input file'
+        )
+
+    # one file, as is
+    if len(files) == 1:
+        config = dict(config)
+        config['input_file'] = files[0]
+        return geojson_to_pgpointcloud(config)
+
+    workers = min(max(int(config.get('workers', 1) or 1), 1), len(files))
+
+    table_name = config.get('table_name', None)
+    table_action = (config.get('table_action', None) or 'c')[0]
+    if table_name is not None and table_action != 'a':
+
+        dsn = config.get('dsn', None)
+        dbconn = get_connection(dsn)
+        try:
+            create_pcpatch_table(
+                dbconn, qualify_table_name(table_name), table_action
+            )
+            dbconn.commit()
+        except:
+            dbconn.rollback()
+            raise
+        finally:
+            release_connection(dsn, dbconn)
+
+        table_action = 'append'
+
+    configs = []
+    for input_file in files:
+
+        file_config = dict(config)
+        file_config['input_file'] = input_file
+        if table_name is not None:
+            file_config['table_action'] = table_action
+
+        # workers cannot have worker processes of their own
+        if workers > 1:
+            file_config['jobs'] = 1
+
+        configs.append(file_config)
+
+    if workers > 1:
+
+        # connections are not shared with worker processes
+        close_connections()
+
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(_import_file, configs)
+
+    else:
+
+        pool = None
+        results = itertools.imap(_import_file, configs)
+
+    failed = 0
+    total_size = 0
+    start = time.time()
+    try:
+
+        for input_file, size, seconds, error in results:
+
+            if error is not None:
+                failed += 1
+                print 'File "%s" failed after %.2f seconds: %s' % (
+                    input_file, seconds, error
+                )
+                continue
+
+            total_size += size
+            print 'File "%s" imported in %.2f seconds (%.2f MB/s)' % (
+                input_file, seconds, size / 1048576. / max(seconds, 1e-6)
+            )
+
+        if pool is not None:
+            pool.close()
+
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+
+    seconds = time.time() - start
+    print '%d of %d files imported in %.2f seconds (%.2f MB/s)' % (
+        len(files) - failed, len(files), seconds,
+        total_size / 1048576. / max(seconds, 1e-6)
+    )
+
+    if failed:
+        raise PcRunTimeException(
+            message='%d of %d files failed' % (failed, len(files))
+        )
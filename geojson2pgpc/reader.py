@@ -0,0 +1,212 @@
+import simplejson as json
+
+from pgpointcloud_utils import PcInvalidArgException
+
+# record separator of GeoJSONSeq (RFC 8142)
+RS = '\x1e'
+
+WHITESPACE = ' \t\n\r' + RS
+
+class GeoJSONReader(object):
+    '''
+    incremental reader of GeoJSON features. only one feature is held in
+    memory at a time
+
+    supported inputs are
+
+        FeatureCollection: features are read one at a time from the
+            "features" array. other members of the FeatureCollection are
+            available in members once read
+        GeoJSONSeq or newline-delimited GeoJSON: one Feature per record
+    '''
+
+    # number of bytes read from file at a time
+    CHUNK_SIZE = 65536
+
+    def __init__(self, f, chunk_size=None):
+
+        if isinstance(f, basestring):
+            f = open(f, 'rb')
+        self._file = f
+
+        self._chunk_size = chunk_size or self.CHUNK_SIZE
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+        self._decoder = json.JSONDecoder()
+
+        # members of FeatureCollection other than features
+        self.members = {}
+        self._is_collection = False
+
+    def close(self):
+
+        self._file.close()
+
+    def _fill(self):
+        '''
+        read next chunk. returns False if end of file
+        '''
+
+        if self._eof:
+            return False
+
+        data = self._file.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            return False
+
+        # drop what was consumed
+        if self._pos > self._chunk_size:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        self._buffer += data
+
+        return True
+
+    def _peek(self):
+        '''
+        returns next character that is not whitespace. returns None if end
+        of file
+        '''
+
+        while True:
+
+            buf = self._buffer
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            self._pos = pos
+
+            if pos < len(buf):
+                return buf[pos]
+
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+
+        char = self._peek()
+        if char is None or char not in chars:
+            raise PcInvalidArgException(
+                message='Invalid input file'
+            )
+
+        self._pos += 1
+
+        return char
+
+    def _decode(self):
+        '''
+        decode next JSON value
+        '''
+
+        self._peek()
+
+        # make sure that small values are in buffer before decoding
+        while len(self._buffer) - self._pos < self._chunk_size:
+            if not self._fill():
+                break
+
+        while True:
+
+            try:
+                value, end = self._decoder.raw_decode(
+                    self._buffer, self._pos
+                )
+            except ValueError:
+                value, end = None, None
+
+            # value may be incomplete if at end of buffer
+            if end is not None and (end < len(self._buffer) or self._eof):
+                self._pos = end
+                return value
+
+            if not self._fill():
+                if end is not None:
+                    self._pos = end
+                    return value
+
+                raise PcInvalidArgException(
+                    message='Invalid input file'
+                )
+
+    def _decode_members(self):
+        '''
+        decode members of object whose opening brace was consumed into
+        members. elements of "features" are generated one at a time instead
+        '''
+
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+
+            key = self._decode()
+            if not isinstance(key, basestring):
+                raise PcInvalidArgException(
+                    message='Invalid input file'
+                )
+            self._expect(':')
+
+            if key == 'features':
+                self._is_collection = True
+                for feat in self._decode_features():
+                    yield feat
+            else:
+                self.members[key] = self._decode()
+
+            if self._expect(',}') == '}':
+                break
+
+    def _decode_features(self):
+        '''
+        decode elements of "features" array one at a time
+        '''
+
+        self._expect('[')
+
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+
+            yield self._decode()
+
+            if self._expect(',]') == ']':
+                break
+
+    def features(self):
+        '''
+        generate features one at a time
+        '''
+
+        while True:
+
+            char = self._peek()
+            if char is None:
+                break
+
+            self._expect('{')
+
+            self.members = {}
+            self._is_collection = False
+            for feat in self._decode_members():
+                yield feat
+
+            if self._is_collection:
+                continue
+
+            # one feature of a sequence
+            feat = self.members
+            self.members = {}
+            if feat.get('type', None) != 'Feature':
+                raise PcInvalidArgException(
+                    message='Invalid input file'
+                )
+
+            yield feat
@@ -0,0 +1,48 @@
+import os
+import glob
+
+from pgpointcloud_utils import PcInvalidArgException
+
+def read_manifest(manifest):
+    '''
+    paths or globs of input files listed one per line. blank lines and lines
+    starting with # are skipped. relative paths are relative to the
+    directory of the manifest
+    '''
+
+    base_dir = os.path.dirname(manifest)
+
+    entries = []
+    with open(manifest, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entries.append(os.path.join(base_dir, line))
+
+    return entries
+
+def expand_input_files(inputs):
+    '''
+    expand globs into a list of files. directories are kept as is as OGR
+    opens them as datasets (e.g. directory of shapefiles). files are
+    returned once, in the order found, however the path is spelled
+    '''
+
+    files = []
+    seen = set()
+    for entry in inputs:
+
+        paths = sorted(glob.glob(entry))
+        if not paths:
+            raise PcInvalidArgException(
+                message='Input file not found: %s' % entry
+            )
+
+        for path in paths:
+            key = os.path.normpath(os.path.abspath(path))
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+
+    return files
@@ -5,6 +5,13 @@ from tzlocal import get_localzone
 import pytz
 
 import os
+import itertools
+import multiprocessing
+import traceback
+import Queue
+from multiprocessing.pool import ThreadPool
+import simplejson as json
+import numpy
 
 import psycopg2
 from psycopg2.extensions import AsIs
@@ -15,9 +22,14 @@ from .ogr import OGR_TZ
 from .pgpointcloud import (
     DATA_TYPE_MAPPING,
     build_pc_dimension, build_pc_schema, add_pc_schema,
-    create_pcpatch_table, create_temp_table,
-    insert_pcpoints, copy_pcpoints, insert_pcpatches, make_wkb_point
+    create_pcpatch_table, drop_pcpatch_table, create_temp_table,
+    insert_pcpoints, copy_pcpoints, insert_pcpatches, make_wkb_point,
+    make_pcpoint_rows, copy_pcpoint_rows, pack_wkb_point,
+    make_pcpoint_binary_rows, copy_pcpoints_binary, convert_binary_temp_table,
+    get_pcformat, build_pcpatches, PointBuffer,
+    get_connection, release_connection, close_connections
 )
+from .inputs import read_manifest, expand_input_files
 
 from pgpointcloud_utils import PcRunTimeException, PcInvalidArgException
 
@@ -45,13 +57,26 @@ Config = {
     'datetime': [],
     'timezone': get_localzone(),
     'copy_mode': False,
+    'binary_mode': False,
+    'client_mode': False,
+    'patch_strategy': 'grid',
     'buffer_size': 1000,
-    'patch_size': 400
+    'patch_size': 400,
+    'jobs': 1,
+    'pool_size': 1,
+    'input_files': [],
+    'manifest': None,
+    'workers': 1,
+    'layer_concurrency': 1,
+    'commit_barrier': False
 }
 
 DSIn = None
 DBConn = None
 
+# state of worker process
+Worker = {}
+
 def open_input_file(f):
 
     global DSIn
@@ -67,8 +92,39 @@ def open_input_file(f):
 
     return DSIn
 
-def open_db_connection(dsn):
-    return psycopg2.connect(dsn)
+def get_pool_size(config, num_layers=1):
+    '''
+    size of the connection pool. layers imported concurrently each need a
+    connection in addition to the connection of the file. with
+    commit_barrier, the connections of all num_layers layers are held
+    until all layers are imported
+    '''
+
+    pool_size = int(config.get('pool_size', 1) or 1)
+
+    concurrency = int(config.get('layer_concurrency', 1) or 1)
+    if concurrency > 1:
+        if config.get('commit_barrier', False):
+            concurrency = max(concurrency, int(num_layers))
+        pool_size = max(pool_size, concurrency + 1)
+
+    return pool_size
+
+def open_db_connection(dsn, pool_size=None):
+    '''
+    connections are pooled by DSN and reused by later imports of the
+    process. the pool grows to pool_size if smaller. see
+    close_db_connection
+    '''
+
+    if pool_size is None:
+        pool_size = get_pool_size(Config)
+
+    return get_connection(dsn, pool_size)
+
+def close_db_connection(dsn, dbconn):
+
+    release_connection(dsn, dbconn)
 
 def interpret_fields(layer):
 
@@ -90,7 +146,12 @@ def interpret_fields(layer):
         'overrides': {}
     }
 
-    if layer.GetFeatureCount() < 1:
+    # use the first feature
+    layer.ResetReading()
+    feat = layer.GetNextFeature()
+    layer.ResetReading()
+
+    if feat is None:
         raise PcRunTimeException(
             message='Layer has no fields'
         )
@@ -99,8 +160,6 @@ def interpret_fields(layer):
     add_coordinate(fields['dimension'], 'Y')
     add_coordinate(fields['dimension'], 'Z')
 
-    # use the first feature
-    feat = layer.GetFeature(0)
     numFields = feat.GetFieldCount()
 
     group_by = Config.get('group_by', [])
@@ -489,54 +548,396 @@ def build_pcpoint_from_feature(feat, fields, struct_format=False):
     else:
         return vals
 
-def import_layer(layer, file_table, pcid, fields):
+def _init_worker(config, fields, pcid, layer_name):
+    '''
+    OGR objects cannot be shared with worker processes. each worker opens
+    the input file and reads the features of its range
+    '''
+
+    global Config
 
-    buffer_size = Config.get('buffer_size')
-    copy_mode = Config.get('copy_mode')
+    Config = config
+    Worker['fields'] = fields
+    Worker['pcid'] = pcid
 
-    num_features = layer.GetFeatureCount()
+    ogr.RegisterAll()
+    Worker['dsin'] = ogr.Open(Config.get('input_file', None), update=False)
+    if Worker['dsin'] is None:
+        raise PcInvalidArgException(
+            message='Invalid input file'
+        )
 
-    # create temporary table for layer
-    temp_table = create_temp_table(DBConn)
+    Worker['layer'] = Worker['dsin'].GetLayerByName(layer_name)
+    if not Worker['layer']:
+        raise PcRunTimeException(
+            message='Layer not found'
+        )
 
-    frmt = None
-    wkb_set = []
+def _get_features(start, stop):
+    '''
+    features of range of feature positions. features are read
+    sequentially. features before start are skipped once, unless the
+    driver can seek to a position quickly
+    '''
+
+    layer = Worker['layer']
+    layer.ResetReading()
+
+    if layer.TestCapability(ogr.OLCFastSetNextByIndex):
+        layer.SetNextByIndex(start)
+    else:
+        for idx in xrange(start):
+            if layer.GetNextFeature() is None:
+                return
+
+    for idx in xrange(start, stop):
+
+        feat = layer.GetNextFeature()
+        if feat is None:
+            return
+
+        yield feat
+
+def iterate_features(layer):
+    '''
+    generate features of layer in order. features are read sequentially
+    instead of by FID, which is random access for many drivers and not
+    always 0-based
+    '''
+
+    layer.ResetReading()
+
+    while True:
+
+        feat = layer.GetNextFeature()
+        if feat is None:
+            break
+
+        yield feat
+
+def build_pcpoint_rows(features, fields, pcid, binary=False):
+    '''
+    returns COPY rows of (pt, group_by) of features. rows are in the
+    binary format of COPY if binary, otherwise text
+    '''
 
-    # iterate over features
-    for idx in xrange(num_features):
+    if binary:
+        make_point = pack_wkb_point
+        make_rows = make_pcpoint_binary_rows
+    else:
+        make_point = make_wkb_point
+        make_rows = make_pcpoint_rows
 
-        feat = layer.GetFeature(idx)
+    frmt = None
+    wkb_set = []
+    groups = []
+    for feat in features:
 
-        # get group
-        group = extract_group(feat, fields)
+        groups.append(extract_group(feat, fields))
 
-        # build pcpoint values
         if frmt is None:
             vals, frmt = build_pcpoint_from_feature(feat, fields, True)
         else:
             vals = build_pcpoint_from_feature(feat, fields)
 
-        # make wkb of pcpoint
-        wkb_set.append(make_wkb_point(pcid, frmt, vals))
+        wkb_set.append(make_point(pcid, frmt, vals))
+
+    return make_rows(wkb_set, groups)
+
+def _pcpoint_rows_from_features(features):
+
+    return build_pcpoint_rows(
+        features,
+        Worker['fields'],
+        Worker['pcid'],
+        Config.get('binary_mode', False)
+    )
+
+def _values_from_features(features):
+    '''
+    returns tuple of list of groups and 2D array of PcPoint values of
+    features
+    '''
+
+    fields = Worker['fields']
+
+    groups = []
+    points = []
+    for feat in features:
+
+        groups.append(json.dumps(extract_group(feat, fields), sort_keys=True))
+        points.append(build_pcpoint_from_feature(feat, fields))
+
+    return groups, numpy.array(points, dtype=numpy.float64)
+
+def split_features(layer, jobs):
+    '''
+    returns list of tuples of (start, stop) of ranges of consecutive feature
+    positions, one range per job. the feature count is only used to split
+    the layer
+    '''
+
+    num_features = layer.GetFeatureCount()
+    size = max((num_features + jobs - 1) // jobs, 1)
+
+    return [
+        (start, min(start + size, num_features))
+        for start in xrange(0, num_features, size)
+    ]
+
+def chunk_feature_lists(layer, chunk_size):
+    '''
+    generate lists of chunk_size consecutive features, read sequentially
+    '''
+
+    features = iterate_features(layer)
+    while True:
+        chunk = list(itertools.islice(features, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+def _map_feature_range(func, feature_range, chunk_size, results, initargs):
+    '''
+    body of worker process of map_feature_ranges. results are put on the
+    queue as tuples of (position of first feature of chunk, result). None
+    is put once done. the traceback is put if failed
+    '''
+
+    try:
+
+        _init_worker(*initargs)
+
+        start, stop = feature_range
+        features = _get_features(start, stop)
+        while True:
+
+            chunk = list(itertools.islice(features, chunk_size))
+            if not chunk:
+                break
+
+            results.put((start, func(chunk)))
+            start += len(chunk)
 
-        if len(wkb_set) >= buffer_size:
-            if copy_mode is True:
-                copy_pcpoints(DBConn, temp_table, wkb_set, group)
+        results.put(None)
+
+    except Exception:
+        results.put(traceback.format_exc())
+
+def map_feature_ranges(func, layer, chunk_size, jobs, initargs):
+    '''
+    apply func to lists of chunk_size consecutive features of layer in
+    jobs processes. each process is given one contiguous range of the
+    layer so that features are never read by more than one process
+
+    generates tuples of (position of first feature of chunk, result) as
+    results are ready, not in the order of features. no more than
+    2 * jobs results are pending at a time so that memory stays bounded
+    '''
+
+    results = multiprocessing.Queue(2 * jobs)
+
+    processes = []
+    for feature_range in split_features(layer, jobs):
+        process = multiprocessing.Process(
+            target=_map_feature_range,
+            args=(func, feature_range, chunk_size, results, initargs)
+        )
+        process.daemon = True
+        process.start()
+        processes.append(process)
+
+    try:
+
+        running = len(processes)
+        while running > 0:
+
+            try:
+                result = results.get(timeout=1)
+            except Queue.Empty:
+                if any(
+                    process.exitcode not in (None, 0)
+                    for process in processes
+                ):
+                    raise PcRunTimeException(
+                        message='Worker process exited unexpectedly'
+                    )
+                continue
+
+            if result is None:
+                running -= 1
+            elif isinstance(result, basestring):
+                raise PcRunTimeException(
+                    message='Worker process failed:\n%s' % result
+                )
             else:
-                insert_pcpoints(DBConn, temp_table, wkb_set, group)
-            wkb_set = []
+                yield result
+
+    except:
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+
+def import_layer_patches(layer, file_table, pcid, fields, dbconn=None):
+    '''
+    build PcPatches of layer in Python and copy them into file_table.
+    no temporary table of PcPoints is used
+    '''
+
+    if dbconn is None:
+        dbconn = DBConn
+
+    pcformat = get_pcformat(dbconn, pcid)
+    jobs = int(Config.get('jobs', 1) or 1)
+    buffer_size = int(Config.get('buffer_size', 1000))
+
+    # each feature has one value per dimension of fields
+    if len(fields['dimension']) != len(pcformat.dimensions):
+        raise PcRunTimeException(
+            message='Features do not match the dimensions of PCID: %s' % pcid
+        )
+
+    points = PointBuffer(len(pcformat.dimensions), buffer_size)
+    if jobs > 1:
+
+        # chunks are added as they are converted, not in the order of
+        # features. points are binned by group and cell so order does not
+        # matter, and only the chunks pending in the queue are held
+        for start, (chunk_groups, chunk_points) in map_feature_ranges(
+            _values_from_features,
+            layer,
+            buffer_size,
+            jobs,
+            (Config, fields, pcid, layer.GetName())
+        ):
+            points.extend(chunk_groups, chunk_points)
+
+    else:
+
+        for feat in iterate_features(layer):
+
+            # get group and pcpoint values
+            points.append(
+                json.dumps(extract_group(feat, fields), sort_keys=True),
+                build_pcpoint_from_feature(feat, fields)
+            )
+
+    if len(points) < 1:
+        return True
 
-    if len(wkb_set) >= 0:
-        copy_pcpoints(DBConn, temp_table, wkb_set, group)
+    file_name = Config.get('input_file', None)
+    if file_name:
+        file_name = os.path.basename(file_name)
+
+    # build patches for layer by distinct group
+    build_pcpatches(
+        dbconn,
+        file_table,
+        pcformat,
+        points.columns,
+        points.groups,
+        layer_name=layer.GetName(),
+        metadata=Config.get('metadata', None),
+        file_name=file_name,
+        max_points_per_patch=int(Config.get('patch_size', 400)),
+        buffer_size=buffer_size,
+        strategy=Config.get('patch_strategy', 'grid'),
+        binary=Config.get('binary_mode', False)
+    )
+
+    return True
+
+def import_layer(layer, file_table, pcid, fields, dbconn=None):
+
+    if dbconn is None:
+        dbconn = DBConn
+
+    # quadtree patches can only be built in Python
+    if (
+        Config.get('client_mode', False) or
+        Config.get('patch_strategy', 'grid') == 'quadtree'
+    ):
+        return import_layer_patches(
+            layer, file_table, pcid, fields, dbconn
+        )
+
+    buffer_size = Config.get('buffer_size')
+    copy_mode = Config.get('copy_mode')
+    binary_mode = Config.get('binary_mode', False)
+    jobs = int(Config.get('jobs', 1) or 1)
+
+    # create temporary table for layer
+    temp_table = create_temp_table(dbconn, binary=binary_mode)
+
+    if jobs > 1 or copy_mode is True or binary_mode:
+
+        buffer_size = int(buffer_size)
+
+        # features are converted by worker processes, or buffer_size at a
+        # time, so only a few chunks of rows are held at once
+        if jobs > 1:
+            data = (
+                rows
+                for start, rows in map_feature_ranges(
+                    _pcpoint_rows_from_features,
+                    layer,
+                    buffer_size,
+                    jobs,
+                    (Config, fields, pcid, layer.GetName())
+                )
+            )
+        else:
+            data = (
+                build_pcpoint_rows(chunk, fields, pcid, binary_mode)
+                for chunk in chunk_feature_lists(layer, buffer_size)
+            )
+
+        # all PcPoints of layer are streamed in one COPY, each PcPoint with
+        # the group of its feature
+        if binary_mode:
+            copy_pcpoints_binary(dbconn, temp_table, data)
+            convert_binary_temp_table(dbconn, temp_table)
+        else:
+            copy_pcpoint_rows(dbconn, temp_table, data)
+
+    else:
+
+        frmt = None
         wkb_set = []
 
+        # iterate over features
+        for feat in iterate_features(layer):
+
+            # get group
+            group = extract_group(feat, fields)
+
+            # build pcpoint values
+            if frmt is None:
+                vals, frmt = build_pcpoint_from_feature(feat, fields, True)
+            else:
+                vals = build_pcpoint_from_feature(feat, fields)
+
+            # make wkb of pcpoint
+            wkb_set.append(make_wkb_point(pcid, frmt, vals))
+
+            if len(wkb_set) >= buffer_size:
+                insert_pcpoints(dbconn, temp_table, wkb_set, group)
+                wkb_set = []
+
+        if wkb_set:
+            insert_pcpoints(dbconn, temp_table, wkb_set, group)
+            wkb_set = []
+
     file_name = Config.get('input_file', None)
     if file_name:
         file_name = os.path.basename(file_name)
 
     # build patches for layer by distinct group
     insert_pcpatches(
-        DBConn,
+        dbconn,
         file_table,
         temp_table,
         layer,
@@ -569,7 +970,8 @@ def get_pcid(layer, fields):
         while pcid is None and retry < 5:
             # add schema to database
             pcid = add_pc_schema(DBConn, pc_schema, srid)
-            time.sleep(1)
+            if pcid is None:
+                time.sleep(1)
             retry += 1
 
         if pcid is None:
@@ -577,10 +979,12 @@ def get_pcid(layer, fields):
                 message='Cannot create pointcloud schema'
             )
 
-def convert_layer(layer, pcid, fields, file_table):
+    return pcid
+
+def convert_layer(layer, pcid, fields, file_table, dbconn=None):
 
     # do the actual import
-    import_layer(layer, file_table, pcid, fields)
+    import_layer(layer, file_table, pcid, fields, dbconn)
 
     print 'Layer "%s" has been imported into Table "%s" with PCID "%s"' % (
         layer.GetName(),
@@ -588,6 +992,130 @@ def convert_layer(layer, pcid, fields, file_table):
         pcid
     )
 
+def get_layer(dsin, layer_ref, filtered_layers):
+
+    if filtered_layers:
+        layer = dsin.GetLayerByName(layer_ref)
+    else:
+        layer = dsin.GetLayerByIndex(layer_ref)
+
+    if not layer:
+        raise PcRunTimeException(
+            message='Layer not found'
+        )
+
+    return layer
+
+def _convert_layer_on_connection(
+    layer_ref, filtered_layers, pcid, fields, file_table, commit, pool_size
+):
+    '''
+    import layer on its own connection and OGR dataset. connection is
+    committed and released if commit. otherwise, the open connection is
+    returned for the caller to commit
+    '''
+
+    dsn = Config.get('dsn', None)
+
+    # OGR datasets cannot be shared between threads
+    dsin = ogr.Open(Config.get('input_file', None), update=False)
+    if dsin is None:
+        raise PcInvalidArgException(
+            message='Invalid input file'
+        )
+
+    dbconn = open_db_connection(dsn, pool_size)
+
+    try:
+        layer = get_layer(dsin, layer_ref, filtered_layers)
+        convert_layer(layer, pcid, fields, file_table, dbconn)
+
+        if not commit:
+            return dbconn
+
+        dbconn.commit()
+
+    except:
+        dbconn.rollback()
+        close_db_connection(dsn, dbconn)
+        raise
+
+    close_db_connection(dsn, dbconn)
+
+def convert_layers_concurrently(
+    layers, filtered_layers, pcid, fields, file_table
+):
+    '''
+    import layers by layer_concurrency threads, each layer on its own
+    connection with its own temporary table
+
+    without commit_barrier, each layer is committed once imported. with
+    commit_barrier, layers are committed only once all layers are
+    imported. if any layer failed, all layers are rolled back. the
+    connection pool is grown to hold the connections of all layers
+    '''
+
+    dsn = Config.get('dsn', None)
+    concurrency = int(Config.get('layer_concurrency', 1) or 1)
+    commit = not Config.get('commit_barrier', False)
+
+    # imported layers hold their connections until all layers are imported
+    pool_size = get_pool_size(Config, len(layers))
+
+    pool = ThreadPool(min(concurrency, len(layers)))
+    try:
+        results = [
+            pool.apply_async(
+                _convert_layer_on_connection,
+                (
+                    layer_ref, filtered_layers, pcid, fields, file_table,
+                    commit, pool_size
+                )
+            )
+            for layer_ref in layers
+        ]
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    dbconns = []
+    errors = []
+    for layer_ref, result in zip(layers, results):
+        try:
+            dbconn = result.get()
+        except Exception as e:
+            errors.append((layer_ref, e))
+            continue
+
+        if dbconn is not None:
+            dbconns.append(dbconn)
+
+    try:
+
+        for dbconn in dbconns:
+            if errors:
+                dbconn.rollback()
+            else:
+                dbconn.commit()
+
+    finally:
+        for dbconn in dbconns:
+            close_db_connection(dsn, dbconn)
+
+    for layer_ref, e in errors:
+        print 'Layer "%s" failed: %s' % (
+            layer_ref,
+            getattr(e, 'message', None) or str(e) or e.__class__.__name__
+        )
+
+    if errors:
+        raise PcRunTimeException(
+            message='%d of %d layers failed' % (len(errors), len(layers))
+        )
+
 def convert_file():
 
     num_layers = DSIn.GetLayerCount()
@@ -600,10 +1128,7 @@ def convert_file():
         layers = range(num_layers)
         filtered_layers = False
 
-    if filtered_layers:
-        layer = DSIn.GetLayerByName(layers[0])
-    else:
-        layer = DSIn.GetLayerByIndex(layers[0])
+    layer = get_layer(DSIn, layers[0], filtered_layers)
 
     fields = interpret_fields(layer)
     pcid = get_pcid(layer, fields)
@@ -613,7 +1138,7 @@ def convert_file():
         table_name = '"' + os.path.splitext(os.path.basename(DSIn.name))[0] + '"'
     else:
         # qualify
-        table_name = '"' + '"."'.join(table_name.split('.', 1)) + '"'
+        table_name = qualify_table_name(table_name)
 
     table_action = Config.get('table_action', 'c')
     if table_action is None:
@@ -626,17 +1151,26 @@ def convert_file():
         table_action
     )
 
-    for e in layers:
+    if int(Config.get('layer_concurrency', 1) or 1) > 1 and len(layers) > 1:
 
-        if filtered_layers:
-            layer = DSIn.GetLayerByName(e)
-        else:
-            layer = DSIn.GetLayerByIndex(e)
+        # table must be visible to the connections of the layers
+        DBConn.commit()
 
-        if not layer:
-            raise PcRunTimeException(
-                message='Layer not found'
+        try:
+            return convert_layers_concurrently(
+                layers, filtered_layers, pcid, fields, table_name
             )
+        except:
+            # with commit_barrier, nothing is left of a failed import. the
+            # table is dropped unless appended to
+            if Config.get('commit_barrier', False) and table_action != 'a':
+                drop_pcpatch_table(DBConn, table_name)
+                DBConn.commit()
+            raise
+
+    for e in layers:
+
+        layer = get_layer(DSIn, e, filtered_layers)
 
         convert_layer(layer, pcid, fields, table_name)
 
@@ -657,4 +1191,149 @@ def ogr_to_pgpointcloud(config):
         DBConn.rollback()
         raise
     finally:
-        DBConn.close()
+        close_db_connection(Config.get('dsn', None), DBConn)
+
+def qualify_table_name(table_name):
+
+    return '"' + '"."'.join(table_name.split('.', 1)) + '"'
+
+def _import_file(config):
+    '''
+    import one file of import_files. returns tuple of input file, size in
+    bytes, seconds and error message if failed
+    '''
+
+    input_file = config.get('input_file', None)
+
+    try:
+        size = os.path.getsize(input_file)
+    except OSError:
+        size = 0
+
+    start = time.time()
+    try:
+        ogr_to_pgpointcloud(config)
+    except Exception as e:
+        return (
+            input_file, size, time.time() - start,
+            getattr(e, 'message', None) or str(e) or e.__class__.__name__
+        )
+
+    return input_file, size, time.time() - start, None
+
+def import_files(config):
+    '''
+    import the files of input_files and manifest. files are imported by a
+    pool of worker processes, each reusing its connections and lookups
+    across files. throughput is reported per file
+
+    if table_name is specified, the table is created once before any file
+    is imported and all files are appended to it
+    '''
+
+    inputs = list(config.get('input_files', None) or [])
+    if config.get('input_file', None):
+        inputs.append(config['input_file'])
+    if config.get('manifest', None):
+        inputs.extend(read_manifest(config['manifest']))
+
+    files = expand_input_files(inputs)
+    if not files:
+        raise PcInvalidArgException(
+            message='No input file'
+        )
+
+    # one file, as is
+    if len(files) == 1:
+        config = dict(config)
+        config['input_file'] = files[0]
+        return ogr_to_pgpointcloud(config)
+
+    workers = min(max(int(config.get('workers', 1) or 1), 1), len(files))
+
+    table_name = config.get('table_name', None)
+    table_action = (config.get('table_action', None) or 'c')[0]
+    if table_name is not None and table_action != 'a':
+
+        dsn = config.get('dsn', None)
+        dbconn = get_connection(dsn, get_pool_size(config))
+        try:
+            create_pcpatch_table(
+                dbconn, qualify_table_name(table_name), table_action
+            )
+            dbconn.commit()
+        except:
+            dbconn.rollback()
+            raise
+        finally:
+            release_connection(dsn, dbconn)
+
+        table_action = 'append'
+
+    configs = []
+    for input_file in files:
+
+        file_config = dict(config)
+        file_config['input_file'] = input_file
+        if table_name is not None:
+            file_config['table_action'] = table_action
+
+        # workers cannot have worker processes of their own
+        if workers > 1:
+            file_config['jobs'] = 1
+
+        configs.append(file_config)
+
+    if workers > 1:
+
+        # connections are not shared with worker processes
+        close_connections()
+
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(_import_file, configs)
+
+    else:
+
+        pool = None
+        results = itertools.imap(_import_file, configs)
+
+    failed = 0
+    total_size = 0
+    start = time.time()
+    try:
+
+        for input_file, size, seconds, error in results:
+
+            if error is not None:
+                failed += 1
+                print 'File "%s" failed after %.2f seconds: %s' % (
+                    input_file, seconds, error
+                )
+                continue
+
+            total_size += size
+            print 'File "%s" imported in %.2f seconds (%.2f MB/s)' % (
+                input_file, seconds, size / 1048576. / max(seconds, 1e-6)
+            )
+
+        if pool is not None:
+            pool.close()
+
+    except:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.join()
+
+    seconds = time.time() - start
+    print '%d of %d files imported in %.2f seconds (%.2f MB/s)' % (
+        len(files) - failed, len(files), seconds,
+        total_size / 1048576. / max(seconds, 1e-6)
+    )
+
+    if failed:
+        raise PcRunTimeException(
+            message='%d of %d files failed' % (failed, len(files))
+        )
@@ -1,18 +1,29 @@
 import psycopg2
 from psycopg2.extensions import AsIs
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 from osgeo import ogr
 from xml.etree import ElementTree as ETree
 
-import math
 import random
+import itertools
+import threading
+import weakref
+import atexit
 import simplejson as json
 
 from cStringIO import StringIO
 import struct
 import binascii
+import numpy
 
-from pgpointcloud_utils import PcRunTimeException, PcInvalidArgException
+from pgpointcloud_utils import (
+    PcRunTimeException, PcInvalidArgException,
+    PcFormat, PcPatch, PcTransformer
+)
+from pgpointcloud_utils import pcgrid
+from pgpointcloud_utils.pccache import LRUCache
 
 # mapping between OGR datatypes and pgPointCloud datatypes
 DATA_TYPE_MAPPING = {
@@ -44,6 +55,150 @@ DATA_TYPE_MAPPING = {
     }
 }
 
+# strategies for binning points into patches in Python
+PATCH_STRATEGIES = ['grid', 'quadtree']
+
+# pools of connections by DSN. connections are reused across files, layers
+# and threads of a process
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+# names of statements prepared on each connection
+_PREPARED = weakref.WeakKeyDictionary()
+_PREPARED_LOCK = threading.Lock()
+
+# formats by (DSN, PCID), PCIDs by (DSN, schema) and proj4text by
+# (DSN, SRID). lookups are done once per database instead of once per file
+LOOKUP_CACHE_SIZE = 64
+_FORMATS = LRUCache(LOOKUP_CACHE_SIZE)
+_PCIDS = LRUCache(LOOKUP_CACHE_SIZE)
+_PROJ4TEXTS = LRUCache(LOOKUP_CACHE_SIZE)
+
+# number of rows made at a time by copy_pcpoints
+COPY_BATCH_SIZE = 1000
+
+# header and trailer of the binary format of COPY
+COPY_BINARY_HEADER = 'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_BINARY_TRAILER = struct.pack('!h', -1)
+
+class _ConnectionPool(object):
+    '''
+    pool of connections of one DSN. getconn waits until a connection is
+    available. the pool only grows
+    '''
+
+    def __init__(self, dsn, size):
+
+        self.size = max(int(size), 1)
+        self._pool = ThreadedConnectionPool(self.size, self.size, dsn)
+        self._used = 0
+        self._available = threading.Condition(threading.Lock())
+
+    def resize(self, size):
+        '''
+        grow pool to size connections. a smaller size is ignored
+        '''
+
+        size = int(size)
+        with self._available:
+            if size <= self.size:
+                return
+
+            # connections up to minconn are kept once returned
+            self._pool.minconn = self._pool.maxconn = self.size = size
+            self._available.notify_all()
+
+    def getconn(self):
+
+        with self._available:
+            while self._used >= self.size:
+                self._available.wait()
+            self._used += 1
+
+        try:
+            return self._pool.getconn()
+        except:
+            self._release()
+            raise
+
+    def putconn(self, dbconn):
+
+        try:
+            self._pool.putconn(dbconn)
+        finally:
+            self._release()
+
+    def _release(self):
+
+        with self._available:
+            self._used -= 1
+            self._available.notify()
+
+    def closeall(self):
+
+        self._pool.closeall()
+
+def get_connection(dsn, pool_size=1):
+    '''
+    get connection from the pool of DSN. the pool is created with pool_size
+    connections if not found and grown if smaller. waits until a
+    connection is available
+    '''
+
+    with _POOLS_LOCK:
+        pool = _POOLS.get(dsn, None)
+        if pool is None:
+            pool = _ConnectionPool(dsn, pool_size)
+            _POOLS[dsn] = pool
+        else:
+            pool.resize(pool_size)
+
+    return pool.getconn()
+
+def release_connection(dsn, dbconn):
+    '''
+    return connection to the pool of DSN. an open transaction is rolled
+    back
+    '''
+
+    with _POOLS_LOCK:
+        pool = _POOLS.get(dsn, None)
+
+    if pool is None:
+        dbconn.close()
+        return
+
+    pool.putconn(dbconn)
+
+def close_connections():
+
+    with _POOLS_LOCK:
+        for pool in _POOLS.itervalues():
+            pool.closeall()
+        _POOLS.clear()
+
+atexit.register(close_connections)
+
+def execute_prepared(cursor, name, statement, params):
+    '''
+    execute statement prepared once per connection. placeholders of
+    statement are $1, $2, ...
+    '''
+
+    dbconn = cursor.connection
+
+    with _PREPARED_LOCK:
+        prepared = _PREPARED.setdefault(dbconn, set())
+
+    if name not in prepared:
+        cursor.execute('PREPARE %s AS %s' % (name, statement))
+        prepared.add(name)
+
+    cursor.execute(
+        'EXECUTE %s (%s)' % (name, ', '.join(['%s'] * len(params))),
+        params
+    )
+
 def build_pc_dimension(doc, dimension, index):
 
     pc_dimension = ETree.Element('pc:dimension')
@@ -120,20 +275,27 @@ def build_pc_schema(fields):
 
 def add_pc_schema(dbconn, pc_schema, srid=0):
 
+    key = (dbconn.dsn, pc_schema)
+    pcid = _PCIDS.get(key)
+    if pcid is not None:
+        return pcid
+
     try:
 
         cursor = dbconn.cursor()
 
         # check if this schema already exists
-        cursor.execute("""
+        execute_prepared(cursor, 'pc_find_schema', """
 SELECT
     pcid
 FROM pointcloud_formats
-WHERE schema = %s
+WHERE schema = $1
         """, [pc_schema])
         # it does exist, use
         if cursor.rowcount > 0:
-            return cursor.fetchone()[0]
+            pcid = cursor.fetchone()[0]
+            _PCIDS.set(key, pcid)
+            return pcid
 
         # next best PCID
         cursor.execute("""
@@ -167,6 +329,8 @@ WHERE used.pcid IS NULL
     finally:
         cursor.close()
 
+    _PCIDS.set(key, pcid)
+
     return pcid
 
 def create_pcpatch_table(dbconn, table_name, table_action):
@@ -213,12 +377,34 @@ CREATE TABLE %s (
     finally:
         cursor.close()
 
-def make_wkb_point(pcid, frmt, vals):
+def drop_pcpatch_table(dbconn, table_name):
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.execute("""
+DROP TABLE IF EXISTS %s
+        """, [AsIs(table_name)])
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error dropping PcPatch table'
+        )
+    finally:
+        cursor.close()
+
+def pack_wkb_point(pcid, frmt, vals):
 
     values = [1, pcid] + vals
     s = struct.Struct('< B I' + frmt)
 
-    return binascii.hexlify(s.pack(*values))
+    return s.pack(*values)
+
+def make_wkb_point(pcid, frmt, vals):
+
+    return binascii.hexlify(pack_wkb_point(pcid, frmt, vals))
 
 def insert_pcpoints(dbconn, table_name, wkb_set, group):
 
@@ -233,16 +419,20 @@ def insert_pcpoints(dbconn, table_name, wkb_set, group):
 
         cursor = dbconn.cursor()
 
+        # many rows per statement instead of one round-trip per row
         statement = """
 INSERT INTO %s (pt, group_by)
-VALUES (%%s::pcpoint, %%s)
+VALUES %%s
         """ % (
             AsIs(table_name)
         )
 
-        cursor.executemany(
+        execute_values(
+            cursor,
             statement,
-            values
+            values,
+            template='(%s::pcpoint, %s)',
+            page_size=len(values) or 1
         )
 
     except psycopg2.Error:
@@ -256,21 +446,78 @@ VALUES (%%s::pcpoint, %%s)
     return True
 
 def copy_pcpoints(dbconn, table_name, wkb_set, group):
+    '''
+    copy PcPoints of one group into table. rows are made and streamed
+    COPY_BATCH_SIZE at a time instead of joined into one string
+    '''
 
-    group_str = json.dumps(group)
+    return copy_pcpoint_rows(dbconn, table_name, (
+        make_pcpoint_rows(
+            wkb_set[idx:idx + COPY_BATCH_SIZE],
+            itertools.repeat(group)
+        )
+        for idx in xrange(0, len(wkb_set), COPY_BATCH_SIZE)
+    ))
 
-    f = StringIO(
-        '\n'.join([
-            '\t'.join([wkb, group_str])
-            for wkb in wkb_set
-        ])
-    )
+def make_pcpoint_rows(wkb_set, groups):
+    '''
+    returns COPY text of rows of (pt, group_by), one group per PcPoint
+    '''
+
+    return '\n'.join([
+        _copy_text(wkb) + '\t' + _copy_text(json.dumps(group))
+        for wkb, group in zip(wkb_set, groups)
+    ])
+
+class CopyReader(object):
+    '''
+    file-like object of the text format of COPY read by copy_expert. data
+    is an iterable of strings of one or more rows without the last end of
+    line. data is consumed as read so only about one read of rows is
+    buffered
+    '''
+
+    def __init__(self, data):
+
+        self._data = iter(data)
+        self._buffer = ''
+        self._done = False
+
+    def read(self, size=-1):
+
+        while not self._done and (size < 0 or len(self._buffer) < size):
+
+            try:
+                rows = next(self._data)
+            except StopIteration:
+                self._done = True
+                break
+
+            if rows:
+                self._buffer += rows + '\n'
+
+        if size < 0:
+            size = len(self._buffer)
+
+        chunk = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+
+        return chunk
+
+def copy_pcpoint_rows(dbconn, table_name, data):
+    '''
+    copy iterable of COPY text of rows made by make_pcpoint_rows into table.
+    all rows are streamed in one COPY
+    '''
 
     try:
 
         cursor = dbconn.cursor()
 
-        cursor.copy_from(f, table_name, columns=('pt', 'group_by'))
+        cursor.copy_expert(
+            'COPY %s (pt, group_by) FROM STDIN' % table_name,
+            CopyReader(data)
+        )
 
     except psycopg2.Error:
         dbconn.rollback()
@@ -282,6 +529,130 @@ def copy_pcpoints(dbconn, table_name, wkb_set, group):
 
     return True
 
+def make_binary_row(values):
+    '''
+    returns row of the binary format of COPY. values are strings or None
+    '''
+
+    data = [struct.pack('!h', len(values))]
+    for value in values:
+
+        if value is None:
+            data.append(struct.pack('!i', -1))
+            continue
+
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+
+        data.append(struct.pack('!i', len(value)))
+        data.append(value)
+
+    return ''.join(data)
+
+class BinaryCopyReader(object):
+    '''
+    file-like object of the binary format of COPY read by copy_expert.
+    data is an iterable of strings of rows made by make_binary_row. data is
+    consumed as read so only about one read of rows is buffered
+    '''
+
+    def __init__(self, data):
+
+        self._data = iter(data)
+        self._buffer = COPY_BINARY_HEADER
+        self._done = False
+
+    def read(self, size=-1):
+
+        while not self._done and (size < 0 or len(self._buffer) < size):
+
+            try:
+                self._buffer += next(self._data)
+            except StopIteration:
+                self._buffer += COPY_BINARY_TRAILER
+                self._done = True
+
+        if size < 0:
+            size = len(self._buffer)
+
+        chunk = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+
+        return chunk
+
+def copy_binary(dbconn, table_name, columns, data):
+    '''
+    copy iterable of strings of rows made by make_binary_row into table
+    with the binary format of COPY
+    '''
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.copy_expert(
+            'COPY %s (%s) FROM STDIN WITH (FORMAT binary)' % (
+                table_name,
+                ', '.join(columns)
+            ),
+            BinaryCopyReader(data)
+        )
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error copying binary rows'
+        )
+    finally:
+        cursor.close()
+
+    return True
+
+def make_pcpoint_binary_rows(wkb_set, groups):
+    '''
+    returns binary COPY rows of (pt, group_by), one group per PcPoint.
+    wkb_set is of PcPoints packed by pack_wkb_point
+    '''
+
+    return ''.join([
+        make_binary_row((wkb, json.dumps(group)))
+        for wkb, group in zip(wkb_set, groups)
+    ])
+
+def copy_pcpoints_binary(dbconn, table_name, data):
+    '''
+    copy iterable of strings made by make_pcpoint_binary_rows into a
+    temporary table created with binary=True. call
+    convert_binary_temp_table once all PcPoints are copied
+    '''
+
+    return copy_binary(dbconn, table_name, ('pt', 'group_by'), data)
+
+def convert_binary_temp_table(dbconn, table_name):
+    '''
+    PCPOINT has no binary input function. PcPoints are copied as BYTEA and
+    converted in place
+    '''
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.execute("""
+ALTER TABLE %s
+    ALTER COLUMN pt TYPE PCPOINT USING encode(pt, 'hex')::pcpoint
+        """, [AsIs(table_name)])
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error converting PcPoints'
+        )
+    finally:
+        cursor.close()
+
+    return True
+
 def get_extent_corners(cursor, table_name, in_utm=True):
     if not in_utm:
         cursor.execute("""
@@ -328,119 +699,75 @@ FROM extent
 
     return cursor.fetchone()
 
-def _compute_patch_size(dbconn, temp_table, max_points_per_patch=400):
+def get_utm_coordinates(cursor, table_name):
+    '''
+    returns tuple of arrays of x and y of the points of table in the UTM
+    zone of the centroid of their extent. points are read once with COPY.
+    points without geometry are skipped
+    '''
 
-    def get_patch_count(cursor, temp_table, dim, max_points):
-        cursor.execute("""
-WITH raw_extent AS (
-    SELECT
-        ST_Envelope(ST_Collect(pt::geometry)) AS shp
-    FROM %s
-), utmzone AS (
-    SELECT
-        utmzone(ST_Centroid(shp)) AS srid
-    FROM raw_extent
-), points AS (
-    SELECT
-        ST_Transform(pt::geometry, srid) AS geom
-    FROM %s
-    JOIN utmzone
-        ON true
-), extent AS (
+    f = StringIO()
+
+    cursor.copy_expert("""
+COPY (
+    WITH raw_extent AS (
+        SELECT
+            ST_Envelope(ST_Collect(pt::geometry)) AS shp
+        FROM %s
+    ), utmzone AS (
+        SELECT
+            utmzone(ST_Centroid(shp)) AS srid
+        FROM raw_extent
+    ), points AS (
+        SELECT
+            ST_Transform(pt::geometry, srid) AS geom
+        FROM %s
+        JOIN utmzone
+            ON true
+    )
     SELECT
-        ST_Transform(shp::geometry, srid) AS shp
-    FROM raw_extent
-    JOIN utmzone
-        ON true
-)
-SELECT
-    ST_Centroid(ST_Collect(geom)) AS shp,
-    count(points.*) AS geom_count
-FROM points
-JOIN extent
-    ON true
-GROUP BY ST_SnapToGrid(geom, ST_XMin(extent.shp), ST_YMax(extent.shp), %s, %s)
-HAVING count(points.*) > %s
-        """ % (
-            AsIs(temp_table),
-            AsIs(temp_table),
-            dim,
-            dim,
-            max_points
-        ))
+        ST_X(geom),
+        ST_Y(geom)
+    FROM points
+    WHERE geom IS NOT NULL
+) TO STDOUT
+    """ % (
+        AsIs(table_name),
+        AsIs(table_name)
+    ), f)
 
-        return cursor.rowcount
+    # one row of x and y per point
+    data = f.getvalue()
+    num_points = data.count('\n')
 
     try:
+        values = numpy.array(data.split(), dtype=numpy.float64)
+    except ValueError:
+        raise PcRunTimeException(
+            message='Invalid coordinates of PcPoints'
+        )
 
-        cursor = dbconn.cursor()
-
-        ulx, uly, lrx, lry = get_extent_corners(cursor, temp_table)
-        width = lrx - ulx
-        height = uly - lry
-
-        # starting patch size in meters (due to UTM zone usage)
-        patch_size = int(max(width / 10., height / 10.))
-
-        # no patch size, any patch size is valid
-        if patch_size < 1:
-            return 100
-
-        old_patch_sizes = [0]
-        old_patch_counts = [0]
-        delta = None
-        long_tail_count = 0
-
-        while True:
-
-            # patch size less than 1
-            # means no reasonable patch size worked
-            if patch_size < 1:
-
-                # use largest patch_size that had
-                # the least number of patches over max points per patch
-
-                min_patch_count = min(old_patch_counts[1:])
-                max_patch_size = -1
-
-                for idx in xrange(len(old_patch_counts) -  1, 0, -1):
-                    if (
-                        old_patch_counts[idx] == min_patch_count and
-                        old_patch_sizes[idx] > max_patch_size
-                    ):
-                        max_patch_size = old_patch_sizes[idx]
-
-                patch_size = max_patch_size
-                break
+    if len(values) != 2 * num_points:
+        raise PcRunTimeException(
+            message='Expected %d coordinates of PcPoints, got %d' % (
+                2 * num_points, len(values)
+            )
+        )
 
-            patch_count = \
-                get_patch_count(cursor, temp_table, patch_size, max_points_per_patch)
-
-            if abs(patch_size - old_patch_size) <= 1:
-                if patch_count == 0:
-                    if long_tail_count >= 5:
-                        patch_size = old_patch_size
-                        break
-                    elif patch_size > old_patch_size:
-                        long_tail_count += 1
-                elif old_patch_count == 0:
-                    patch_size = old_patch_size
-                    break
-            elif long_tail_count > 0 and patch_count > 0 and old_patch_count == 0:
-                patch_size = old_patch_size
-                break
+    return values[0::2], values[1::2]
 
-            delta = max(abs(patch_size - old_patch_size) / 2, 1)
-            if patch_count > 0:
-                delta *= -1
+def _compute_patch_size(dbconn, temp_table, max_points_per_patch=400):
+    '''
+    the coordinates are read once and the search for the patch size is done
+    in memory
+    '''
 
-            old_patch_size = patch_size
-            patch_size += delta
+    try:
 
-            old_patch_count = patch_count
+        cursor = dbconn.cursor()
 
-        cols = int(math.ceil(width / patch_size))
-        rows = int(math.ceil(height / patch_size))
+        extent = get_extent_corners(cursor, temp_table)
+        x, y = get_utm_coordinates(cursor, temp_table)
 
     except psycopg2.Error:
         dbconn.rollback()
@@ -450,7 +777,12 @@ HAVING count(points.*) > %s
     finally:
         cursor.close()
 
-    return patch_size
+    if len(x) < 1:
+        return 100
+
+    return pcgrid.compute_patch_size(
+        x, y, int(max_points_per_patch), extent=extent
+    )
 
 def insert_pcpatches(
     dbconn, file_table, temp_table, layer,
@@ -534,13 +866,482 @@ FROM (
 
     return True
 
-def create_temp_table(dbconn):
+def get_pcformat(dbconn, pcid):
+    '''
+    load format of PCID. proj4text is set if the SRID is found. formats
+    are cached by DSN and PCID
+    '''
+
+    key = (dbconn.dsn, int(pcid))
+    pcformat = _FORMATS.get(key)
+    if pcformat is not None:
+        return pcformat
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        execute_prepared(cursor, 'pc_get_format', """
+SELECT
+    pc.srid,
+    pc.schema,
+    srs.proj4text
+FROM pointcloud_formats pc
+LEFT JOIN spatial_ref_sys srs
+    ON pc.srid = srs.srid
+WHERE pc.pcid = $1
+        """, [int(pcid)])
+
+        if cursor.rowcount < 1:
+            raise PcInvalidArgException(
+                message='PCID not found: %s' % pcid
+            )
+
+        srid, schema, proj4text = cursor.fetchone()
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error getting pointcloud format'
+        )
+    finally:
+        cursor.close()
+
+    pcformat = PcFormat.import_format(pcid=pcid, srid=srid, schema=schema)
+    pcformat.proj4text = proj4text
+
+    _FORMATS.set(key, pcformat)
+
+    return pcformat
+
+def get_proj4text(dbconn, srid):
+
+    key = (dbconn.dsn, int(srid))
+    if key in _PROJ4TEXTS:
+        return _PROJ4TEXTS.get(key)
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        execute_prepared(cursor, 'pc_get_proj4text', """
+SELECT
+    proj4text
+FROM spatial_ref_sys
+WHERE srid = $1
+        """, [int(srid)])
+
+        if cursor.rowcount > 0:
+            proj4text = cursor.fetchone()[0]
+        else:
+            proj4text = None
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error getting proj4text'
+        )
+    finally:
+        cursor.close()
+
+    _PROJ4TEXTS.set(key, proj4text)
+
+    return proj4text
+
+def get_grid_coordinates(dbconn, pcformat, x, y):
+    '''
+    coordinates used to bin points into patches. as done in the database,
+    coordinates are reprojected to the UTM zone of the centroid of their
+    extent. coordinates without a known spatial reference system are used
+    as is
+
+    returns tuple of x, y and extent (ulx, uly, lrx, lry)
+    '''
+
+    ulx, uly, lrx, lry = pcgrid.get_extent(x, y)
+
+    if not pcformat.proj4text:
+        return x, y, (ulx, uly, lrx, lry)
+
+    to_wgs84 = PcTransformer.get(
+        pcformat.proj4text, get_proj4text(dbconn, 4326)
+    )
+    lon, lat = to_wgs84.transform((ulx + lrx) / 2., (uly + lry) / 2.)
+
+    utm_proj4text = get_proj4text(dbconn, pcgrid.utm_srid(lon, lat))
+    if not utm_proj4text:
+        return x, y, (ulx, uly, lrx, lry)
+
+    to_utm = PcTransformer.get(pcformat.proj4text, utm_proj4text)
+    x, y = to_utm.transform_columns(x, y)
+    corners_x, corners_y = to_utm.transform_columns(
+        [ulx, ulx, lrx, lrx], [uly, lry, uly, lry]
+    )
+
+    return x, y, (
+        corners_x.min(), corners_y.max(), corners_x.max(), corners_y.min()
+    )
+
+def _copy_text(value):
+    '''
+    escape value for the text format of COPY
+    '''
+
+    if value is None:
+        return '\\N'
+
+    return (
+        value.
+        replace('\\', '\\\\').
+        replace('\t', '\\t').
+        replace('\n', '\\n').
+        replace('\r', '\\r')
+    )
+
+def copy_pcpatches(dbconn, table_name, rows):
+    '''
+    copy rows of (layer_name, file_name, group_by, metadata, pa) into table
+    '''
+
+    f = StringIO(
+        '\n'.join([
+            '\t'.join([_copy_text(value) for value in row])
+            for row in rows
+        ])
+    )
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.copy_from(
+            f, table_name,
+            columns=('layer_name', 'file_name', 'group_by', 'metadata', 'pa')
+        )
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error copying PcPatches'
+        )
+    finally:
+        cursor.close()
+
+    return True
+
+def copy_pcpatches_binary(dbconn, table_name, data):
+    '''
+    copy iterable of binary COPY rows of
+    (layer_name, file_name, group_by, metadata, pa) into table. PCPATCH has
+    no binary input function so the rows are staged in a temporary table
+    '''
+
+    staging_table = _make_temp_table_name()
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.execute("""
+CREATE TEMPORARY TABLE %s (
+    layer_name TEXT,
+    file_name TEXT,
+    group_by TEXT,
+    metadata TEXT,
+    pa BYTEA
+)
+ON COMMIT DROP;
+        """, [AsIs(staging_table)])
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error creating temporary PcPatch table'
+        )
+    finally:
+        cursor.close()
+
+    copy_binary(
+        dbconn, staging_table,
+        ('layer_name', 'file_name', 'group_by', 'metadata', 'pa'),
+        data
+    )
+
+    try:
+
+        cursor = dbconn.cursor()
+
+        cursor.execute("""
+INSERT INTO %s (layer_name, file_name, group_by, metadata, pa)
+SELECT
+    layer_name,
+    file_name,
+    group_by::json,
+    metadata::json,
+    encode(pa, 'hex')::pcpatch
+FROM %s;
+DROP TABLE %s;
+        """, [
+            AsIs(table_name),
+            AsIs(staging_table),
+            AsIs(staging_table)
+        ])
+
+    except psycopg2.Error:
+        dbconn.rollback()
+        raise PcRunTimeException(
+            message='Query error copying PcPatches'
+        )
+    finally:
+        cursor.close()
+
+    return True
+
+class PointBuffer(object):
+    '''
+    values and group of points of a layer. values are stored in one numpy
+    array per dimension, grown geometrically as points are added, instead
+    of lists of floats. equal groups are stored once
+    '''
+
+    def __init__(self, num_dimensions, capacity=1024):
+
+        self._values = numpy.empty(
+            (num_dimensions, max(int(capacity), 1)), dtype=numpy.float64
+        )
+        self._npoints = 0
+        self._groups = []
+        self._distinct_groups = {}
+
+    def __len__(self):
+
+        return self._npoints
+
+    def _reserve(self, npoints):
+        '''
+        grow arrays to hold npoints. capacity is doubled as needed
+        '''
+
+        num_dimensions, capacity = self._values.shape
+        if npoints <= capacity:
+            return
+
+        while capacity < npoints:
+            capacity *= 2
+
+        values = numpy.empty((num_dimensions, capacity), dtype=numpy.float64)
+        values[:, :self._npoints] = self._values[:, :self._npoints]
+        self._values = values
+
+    def _check_dimensions(self, num_values):
+
+        if num_values != self._values.shape[0]:
+            raise PcInvalidArgException(
+                message='Values do not match the number of dimensions'
+            )
+
+    def append(self, group, values):
+        '''
+        add point of group (JSON of group_by) and list of values, one per
+        dimension
+        '''
+
+        self._check_dimensions(len(values))
+        self._reserve(self._npoints + 1)
+
+        self._values[:, self._npoints] = values
+        self._groups.append(self._distinct_groups.setdefault(group, group))
+        self._npoints += 1
+
+    def extend(self, groups, points):
+        '''
+        add points of list of groups and 2D array of values, one row per
+        point
+        '''
+
+        npoints = len(groups)
+        if npoints < 1:
+            return
+
+        points = numpy.asarray(points, dtype=numpy.float64)
+        if points.ndim != 2 or len(points) != npoints:
+            raise PcInvalidArgException(
+                message='Groups do not match the number of points'
+            )
+        self._check_dimensions(points.shape[1])
+        self._reserve(self._npoints + npoints)
+
+        self._values[:, self._npoints:self._npoints + npoints] = points.T
+        self._groups.extend(
+            self._distinct_groups.setdefault(group, group) for group in groups
+        )
+        self._npoints += npoints
+
+    @property
+    def columns(self):
+        '''
+        list of arrays of values, one array per dimension
+        '''
+
+        return list(self._values[:, :self._npoints])
+
+    @property
+    def groups(self):
+        '''
+        list of JSON of group_by, one per point
+        '''
+
+        return self._groups
+
+def build_pcpatches(
+    dbconn, file_table, pcformat, columns, groups, layer_name=None,
+    metadata=None, file_name=None, max_points_per_patch=400, buffer_size=1000,
+    strategy='grid', binary=False
+):
+    '''
+    bin points into patches by group and cell without a temporary table.
+    dimensionally compressed PcPatches are copied into file_table
+
+    columns is the list of arrays of values, one array per dimension of
+    pcformat, e.g. PointBuffer.columns. groups is the list of JSON of
+    group_by, one per point
+
+    strategy is one of
+
+        grid: cells of one size for the layer, as done in the database
+        quadtree: cells of each group are split into quadrants until no
+            more than max_points_per_patch points
+
+    if binary, all PcPatches are streamed in one binary COPY instead of
+    text COPY every buffer_size PcPatches
+    '''
+
+    if strategy not in PATCH_STRATEGIES:
+        raise PcInvalidArgException(
+            message='Unknown patch strategy: %s' % strategy
+        )
+
+    if metadata:
+        # try to be nice with json metadata
+        try:
+            metadata = json.loads(metadata)
+        except (json.JSONDecodeError, TypeError):
+            pass
+    metadata = json.dumps(metadata)
+
+    if len(groups) < 1:
+        return 0
+
+    x, y, extent = get_grid_coordinates(
+        dbconn,
+        pcformat,
+        columns[pcformat.get_dimension_index('X')],
+        columns[pcformat.get_dimension_index('Y')]
+    )
+
+    if strategy == 'grid':
+        patch_size = pcgrid.compute_patch_size(
+            x, y, max_points_per_patch, extent=extent
+        )
+        cols, rows = pcgrid.snap_to_grid(
+            x, y, extent[0], extent[1], patch_size
+        )
+
+    # arrays of indices of points by group, in order of first point
+    distinct_groups = {}
+    codes = numpy.fromiter(
+        (
+            distinct_groups.setdefault(group, len(distinct_groups))
+            for group in groups
+        ),
+        dtype=numpy.int64,
+        count=len(groups)
+    )
+    order = numpy.argsort(codes, kind='mergesort')
+    group_indices = zip(
+        sorted(distinct_groups, key=distinct_groups.get),
+        numpy.split(order, numpy.flatnonzero(numpy.diff(codes[order])) + 1)
+    )
+
+    def generate_pcpatches():
+
+        for group, indices in group_indices:
+
+            if strategy == 'quadtree':
+                cells = pcgrid.quadtree_cells(
+                    x[indices], y[indices], max_points_per_patch
+                )
+            else:
+                cells = pcgrid.group_cells(cols[indices], rows[indices])
+
+            for cell in cells:
+
+                cell = indices[cell]
+                yield group, PcPatch(
+                    pcformat, values=[column[cell] for column in columns]
+                )
+
+    if binary:
+
+        # counter is advanced once per PcPatch read by the COPY
+        counter = itertools.count()
+        copy_pcpatches_binary(dbconn, file_table, (
+            make_binary_row((
+                layer_name,
+                file_name,
+                group,
+                metadata,
+                pcpatch.as_binary(PcPatch.DIMENSIONAL)
+            ))
+            for (group, pcpatch), idx in itertools.izip(
+                generate_pcpatches(), counter
+            )
+        ))
+
+        return next(counter)
+
+    num_patches = 0
+    patches = []
+    for group, pcpatch in generate_pcpatches():
+
+        patches.append((
+            layer_name,
+            file_name,
+            group,
+            metadata,
+            pcpatch.as_hex(PcPatch.DIMENSIONAL)
+        ))
+
+        if len(patches) >= buffer_size:
+            copy_pcpatches(dbconn, file_table, patches)
+            num_patches += len(patches)
+            patches = []
+
+    if patches:
+        copy_pcpatches(dbconn, file_table, patches)
+        num_patches += len(patches)
+
+    return num_patches
+
+def _make_temp_table_name():
 
     table_name = (
         'temp_' +
         ''.join(random.choice('0123456789abcdefghijklmnopqrstuvwxyz') for i in range(16))
     )
-    table_name = '"' + table_name + '"'
+
+    return '"' + table_name + '"'
+
+def create_temp_table(dbconn, binary=False):
+    '''
+    PcPoints are stored as BYTEA if binary. see convert_binary_temp_table
+    '''
+
+    table_name = _make_temp_table_name()
+    if binary:
+        pt_type = 'BYTEA'
+    else:
+        pt_type = 'PCPOINT'
 
     try:
 
@@ -549,11 +1350,11 @@ def create_temp_table(dbconn):
         cursor.execute("""
 CREATE TEMPORARY TABLE %s (
     id BIGSERIAL PRIMARY KEY,
-    pt PCPOINT,
+    pt %s,
     group_by TEXT
 )
 ON COMMIT DROP;
-        """, [AsIs(table_name)])
+        """, [AsIs(table_name), AsIs(pt_type)])
 
     except psycopg2.Error:
         dbconn.rollback()
@@ -2,3 +2,5 @@ from .pcexception import *
 from .pcformat import PcDimension, PcFormat
 from .pcpatch import PcPatch
 from .pcpoint import PcPoint
+from .pctransform import PcTransformPlan
+from .pctransformer import PcTransformer
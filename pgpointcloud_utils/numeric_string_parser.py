@@ -11,12 +11,23 @@
 # result = nsp.eval('2^4')
 # print(result)
 #
+# func = nsp.compile('$a * 2 + $b')
+# result = func({'a': 1, 'b': 2})
+# print(result)
+#
+# func = nsp.compile('$a * 2 + $b', vectorize=True)
+# result = func({'a': numpy.array([1, 2]), 'b': numpy.array([2, 3])})
+# print(result)
+#
 
 from __future__ import division
 from pyparsing import (Literal,CaselessLiteral,Word,Combine,Group,Optional,
-                       ZeroOrMore,Forward,nums,alphas,oneOf)
+                       ZeroOrMore,Forward,nums,alphas,alphanums,oneOf)
 import math
 import operator
+import numpy
+
+from .pccache import LRUCache
 
 __author__='Paul McGuire'
 __version__ = '$Revision: 0.0 $'
@@ -34,6 +45,9 @@ class NumericStringParser(object):
     Most of this code comes from the fourFn.py pyparsing example
 
     '''
+
+    # parsed expressions by expression text and parseAll
+    _STACKS = LRUCache(256)
     def pushFirst(self, strg, loc, toks ):
         self.exprStack.append( toks[0] )
     def pushUMinus(self, strg, loc, toks ):
@@ -45,7 +59,8 @@ class NumericStringParser(object):
         multop  :: '*' | '/'
         addop   :: '+' | '-'
         integer :: ['+' | '-'] '0'..'9'+
-        atom    :: PI | E | real | fn '(' expr ')' | '(' expr ')'
+        var     :: '$' [a-zA-Z0-9_]+
+        atom    :: PI | E | real | var | fn '(' expr ')' | '(' expr ')'
         factor  :: atom [ expop factor ]*
         term    :: factor [ multop factor ]*
         expr    :: term [ addop term ]*
@@ -56,6 +71,7 @@ class NumericStringParser(object):
                            Optional( point + Optional( Word( nums ) ) ) +
                            Optional( e + Word( "+-"+nums, nums ) ) )
         ident = Word(alphas, alphas+nums+"_$")       
+        var   = Combine( Literal( "$" ) + Word( alphanums+"_" ) )
         plus  = Literal( "+" )
         minus = Literal( "-" )
         mult  = Literal( "*" )
@@ -68,7 +84,7 @@ class NumericStringParser(object):
         pi    = CaselessLiteral( "PI" )
         expr = Forward()
         atom = ((Optional(oneOf("- +")) +
-                 (pi|e|fnumber|ident+lpar+expr+rpar).setParseAction(self.pushFirst))
+                 (pi|e|fnumber|var|ident+lpar+expr+rpar).setParseAction(self.pushFirst))
                 | Optional(oneOf("- +")) + Group(lpar+expr+rpar)
                 ).setParseAction(self.pushUMinus)       
         # by defining exponentiation as "atom [ ^ factor ]..." instead of 
@@ -96,6 +112,19 @@ class NumericStringParser(object):
                 "trunc" : lambda a: int(a),
                 "round" : round,
                 "sgn" : lambda a: abs(a)>epsilon and cmp(a,0) or 0}
+        # same operations over numpy arrays. variables are float64 so
+        # integer columns do not overflow or wrap around
+        self.vopn = dict(self.opn)
+        self.vopn["^"] = lambda a, b: numpy.power(
+            numpy.asarray(a, dtype=numpy.float64), b )
+        self.vfn = { "sin" : numpy.sin,
+                "cos" : numpy.cos,
+                "tan" : numpy.tan,
+                "abs" : numpy.abs,
+                "trunc" : numpy.trunc,
+                # round half away from zero like python's round
+                "round" : lambda a: numpy.sign(a) * numpy.floor(numpy.abs(a) + 0.5),
+                "sgn" : lambda a: numpy.where(numpy.abs(a)>epsilon, numpy.sign(a), 0.)}
     def evaluateStack(self, s ):
         op = s.pop()
         if op == 'unary -':
@@ -114,8 +143,67 @@ class NumericStringParser(object):
             return 0
         else:
             return float( op )
+    def compileStack(self, s, resolve, vectorize=False ):
+        if vectorize:
+            opn, fns = self.vopn, self.vfn
+        else:
+            opn, fns = self.opn, self.fn
+        op = s.pop()
+        if op == 'unary -':
+            f = self.compileStack( s, resolve, vectorize )
+            return lambda v: -f( v )
+        if op in "+-*/^":
+            f2 = self.compileStack( s, resolve, vectorize )
+            f1 = self.compileStack( s, resolve, vectorize )
+            fn = opn[op]
+            return lambda v: fn( f1( v ), f2( v ) )
+        elif op == "PI":
+            return lambda v: math.pi
+        elif op == "E":
+            return lambda v: math.e
+        elif op in fns:
+            f = self.compileStack( s, resolve, vectorize )
+            fn = fns[op]
+            return lambda v: fn( f( v ) )
+        elif op[0] == '$':
+            key = resolve( op[1:] )
+            if vectorize:
+                return lambda v: numpy.asarray( v[key], dtype=numpy.float64 )
+            return lambda v: v[key]
+        elif op[0].isalpha():
+            return lambda v: 0
+        else:
+            value = float( op )
+            return lambda v: value
+    def parse(self,num_string,parseAll=True):
+        '''
+        returns the parsed expression stack. stacks are cached by
+        expression text and parseAll
+        '''
+        key = (num_string, bool(parseAll))
+        stack = self._STACKS.get(key)
+        if stack is None:
+            self.exprStack=[]
+            self.bnf.parseString(num_string,parseAll)
+            stack = self.exprStack
+            self._STACKS.set(key, stack)
+        return stack
     def eval(self,num_string,parseAll=True):
-        self.exprStack=[]
-        results=self.bnf.parseString(num_string,parseAll)
-        val=self.evaluateStack( self.exprStack[:] )
+        val=self.evaluateStack( self.parse(num_string,parseAll)[:] )
         return val
+    def compile(self,num_string,parseAll=True,resolve=None,vectorize=False):
+        '''
+        parse expression once. returns a function taking the values of the
+        variables ($name) of the expression
+
+        resolve converts variable names (without $) to the key used to get
+        the value from the function's argument. by default, the name is the key
+
+        if vectorize is True, the values of the variables are arrays and the
+        function evaluates the expression over all elements at once. an
+        expression without variables returns a scalar
+        '''
+        if resolve is None:
+            resolve = lambda name: name
+        return self.compileStack(
+            self.parse(num_string,parseAll)[:], resolve, vectorize )
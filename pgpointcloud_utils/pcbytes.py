@@ -0,0 +1,309 @@
+'''
+per-dimension compression of pgPointCloud dimensional patches
+
+each dimension of a dimensional patch is serialized as
+
+    uint8 (compression)
+    uint32 (size)
+    byte[size] (data)
+
+where data is one of
+
+    NONE: the raw values
+    RLE: runs of uint8 (count) followed by the value
+    SIGBITS: word (number of unique bits), word (common value) followed
+        by the unique bits of each value packed into words. a word is the
+        size of the dimension
+    ZLIB: zlib deflated raw values
+'''
+
+import struct
+import zlib
+import numpy
+
+from .pcexception import *
+
+NONE = 0
+RLE = 1
+SIGBITS = 2
+ZLIB = 3
+
+COMPRESSION = [NONE, RLE, SIGBITS, ZLIB]
+
+# longest run that fits in the uint8 count of a RLE run
+MAX_RUN = 255
+
+# average run length before RLE is preferred
+RLE_THRESHOLD = 4.
+
+# fraction of common bits before SIGBITS is preferred
+SIGBITS_THRESHOLD = 0.4
+
+# header format
+#
+# uint8 (compression)
+# uint32 (size)
+_HEADER_FORMAT = ['B', 'I']
+
+_HEADER_STRUCTS = {
+    True: struct.Struct(' '.join(['<'] + _HEADER_FORMAT)),
+    False: struct.Struct(' '.join(['>'] + _HEADER_FORMAT)),
+}
+
+def _value_dtype(dimension, is_ndr=None):
+
+    return dimension.get_dtype(is_ndr)
+
+def _word_dtype(dimension, is_ndr=None):
+    '''
+    unsigned integer dtype with the size of the dimension
+    '''
+
+    return numpy.dtype('u%d' % dimension.size).newbyteorder(
+        _value_dtype(dimension, is_ndr).byteorder
+    )
+
+def decode(dimension, npoints, data, offset=0, is_ndr=True):
+    '''
+    decode serialized dimension at offset of data into an array of native
+    raw values. returns tuple of values and offset after the dimension
+    '''
+
+    s = _HEADER_STRUCTS[bool(is_ndr)]
+    compression, size = s.unpack_from(data, offset)
+    offset += s.size
+
+    if len(data) - offset < size:
+        raise PcInvalidArgException(
+            message='Data too short for size of dimension'
+        )
+
+    if compression == NONE:
+        values = _decode_none(dimension, npoints, data, offset, is_ndr)
+    elif compression == RLE:
+        values = _decode_rle(dimension, npoints, data, offset, size, is_ndr)
+    elif compression == SIGBITS:
+        values = _decode_sigbits(dimension, npoints, data, offset, is_ndr)
+    elif compression == ZLIB:
+        values = _decode_zlib(
+            dimension, npoints, data[offset:offset + size], is_ndr
+        )
+    else:
+        raise PcInvalidArgException(
+            message='Unknown dimension compression: {compression}'.format(
+                compression=compression
+            )
+        )
+
+    if len(values) != npoints:
+        raise PcInvalidArgException(
+            message='Dimension has different number of values than points'
+        )
+
+    return values.astype(_value_dtype(dimension)), offset + size
+
+def encode(dimension, values, compression=None):
+    '''
+    serialize array of raw values as NDR. if compression is not provided,
+    the compression is chosen based upon the values
+    '''
+
+    values = numpy.asarray(values, dtype=_value_dtype(dimension, True))
+
+    if compression is None:
+        compression = suggest_compression(dimension, values)
+
+    if compression == NONE:
+        data = values.tostring()
+    elif compression == RLE:
+        data = _encode_rle(dimension, values)
+    elif compression == SIGBITS:
+        data = _encode_sigbits(dimension, values)
+    elif compression == ZLIB:
+        data = zlib.compress(values.tostring())
+    else:
+        raise PcInvalidArgException(
+            message='Unknown dimension compression: {compression}'.format(
+                compression=compression
+            )
+        )
+
+    return _HEADER_STRUCTS[True].pack(compression, len(data)) + data
+
+def suggest_compression(dimension, values):
+    '''
+    suggest compression for the values of dimension
+    '''
+
+    npoints = len(values)
+    if npoints < 1:
+        return NONE
+
+    values = numpy.asarray(values, dtype=_value_dtype(dimension))
+    words = values.view(_word_dtype(dimension))
+
+    # lots of runs
+    num_runs = numpy.count_nonzero(words[1:] != words[:-1]) + 1
+    if float(npoints) / num_runs > RLE_THRESHOLD:
+        return RLE
+
+    # lots of common bits in integer values
+    if dimension.struct_format not in ('f', 'd'):
+        bitwidth = dimension.size * 8
+        nbits = _count_sigbits(words)[0]
+        if float(bitwidth - nbits) / bitwidth >= SIGBITS_THRESHOLD:
+            return SIGBITS
+
+    return ZLIB
+
+def _decode_none(dimension, npoints, data, offset, is_ndr):
+
+    return numpy.frombuffer(
+        data,
+        dtype=_value_dtype(dimension, is_ndr),
+        count=npoints,
+        offset=offset
+    )
+
+def _rle_dtype(dimension, is_ndr):
+
+    return numpy.dtype([
+        ('count', 'u1'),
+        ('value', _value_dtype(dimension, is_ndr))
+    ])
+
+def _decode_rle(dimension, npoints, data, offset, size, is_ndr):
+
+    dtype = _rle_dtype(dimension, is_ndr)
+    runs = numpy.frombuffer(
+        data,
+        dtype=dtype,
+        count=size // dtype.itemsize,
+        offset=offset
+    )
+
+    return numpy.repeat(runs['value'], runs['count'])
+
+def _encode_rle(dimension, values):
+
+    npoints = len(values)
+    if npoints < 1:
+        return ''
+
+    # compare bits so that NaNs can be part of runs
+    words = values.view(_word_dtype(dimension, True))
+
+    starts = numpy.concatenate((
+        [0], numpy.flatnonzero(words[1:] != words[:-1]) + 1
+    )).astype(numpy.intp)
+    lengths = numpy.diff(numpy.concatenate((starts, [npoints])))
+
+    # runs longer than MAX_RUN are split
+    num_chunks = (lengths + MAX_RUN - 1) // MAX_RUN
+    counts = numpy.full(num_chunks.sum(), MAX_RUN, dtype=numpy.uint8)
+    counts[numpy.cumsum(num_chunks) - 1] = \
+        lengths - MAX_RUN * (num_chunks - 1)
+
+    runs = numpy.empty(len(counts), dtype=_rle_dtype(dimension, True))
+    runs['count'] = counts
+    runs['value'] = numpy.repeat(values[starts], num_chunks)
+
+    return runs.tostring()
+
+def _count_sigbits(words):
+    '''
+    returns tuple of the number of unique bits and the common value
+    '''
+
+    if len(words) < 1:
+        return 0, 0
+
+    elem_and = int(numpy.bitwise_and.reduce(words))
+    elem_or = int(numpy.bitwise_or.reduce(words))
+
+    # number of unique bits is the bit length of the differing bits
+    nbits = 0
+    differ = elem_and ^ elem_or
+    while differ:
+        differ >>= 1
+        nbits += 1
+
+    common = (elem_and >> nbits) << nbits
+
+    return nbits, common
+
+def _decode_sigbits(dimension, npoints, data, offset, is_ndr):
+
+    bitwidth = dimension.size * 8
+    word_dtype = _word_dtype(dimension, is_ndr)
+
+    nbits, common = numpy.frombuffer(
+        data, dtype=word_dtype, count=2, offset=offset
+    ).tolist()
+
+    values = numpy.full(npoints, common, dtype=numpy.uint64)
+
+    if nbits > 0:
+        num_words = (nbits * npoints + bitwidth - 1) // bitwidth
+        words = numpy.frombuffer(
+            data,
+            dtype=word_dtype,
+            count=num_words,
+            offset=offset + 2 * word_dtype.itemsize
+        )
+
+        # unique bits are packed from most significant bit of each word
+        bits = numpy.unpackbits(
+            words.astype(word_dtype.newbyteorder('>')).view(numpy.uint8)
+        )[:nbits * npoints].reshape(npoints, nbits)
+
+        weights = numpy.left_shift(
+            numpy.uint64(1),
+            numpy.arange(nbits - 1, -1, -1, dtype=numpy.uint64)
+        )
+        values |= numpy.dot(bits.astype(numpy.uint64), weights)
+
+    return values.astype(_word_dtype(dimension)).view(
+        _value_dtype(dimension)
+    )
+
+def _encode_sigbits(dimension, values):
+
+    bitwidth = dimension.size * 8
+    word_dtype = _word_dtype(dimension, True)
+
+    words = values.view(word_dtype)
+    nbits, common = _count_sigbits(words)
+
+    data = numpy.array([nbits, common], dtype=word_dtype).tostring()
+
+    # all values are the same
+    if nbits < 1:
+        return data
+
+    shifts = numpy.arange(nbits - 1, -1, -1, dtype=numpy.uint64)
+    bits = (
+        numpy.right_shift(
+            words.astype(numpy.uint64)[:, numpy.newaxis], shifts
+        ) & numpy.uint64(1)
+    ).astype(numpy.uint8).ravel()
+
+    # pad out to a whole number of words
+    padding = -len(bits) % bitwidth
+    if padding:
+        bits = numpy.concatenate((bits, numpy.zeros(padding, numpy.uint8)))
+
+    packed = numpy.packbits(bits).view(word_dtype.newbyteorder('>'))
+
+    return data + packed.astype(word_dtype).tostring()
+
+def _decode_zlib(dimension, npoints, data, is_ndr):
+
+    try:
+        data = zlib.decompress(data)
+    except zlib.error:
+        raise PcInvalidArgException(
+            message='Cannot decompress zlib dimension'
+        )
+
+    return _decode_none(dimension, npoints, data, 0, is_ndr)
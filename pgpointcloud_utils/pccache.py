@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+from .pcexception import *
+
+class LRUCache(object):
+    '''
+    dict-like cache holding at most maxsize items. when full, the least
+    recently used item is discarded
+    '''
+
+    def __init__(self, maxsize=128):
+
+        try:
+            maxsize = int(maxsize)
+        except:
+            raise PcInvalidArgException(
+                message='Value cannot be treated as an integer'
+            )
+
+        if maxsize < 1:
+            raise PcInvalidArgException(
+                message='Value must be greater than zero'
+            )
+
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    def get(self, key, default=None):
+
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+
+            # most recently used is last
+            self._items[key] = value
+
+        return value
+
+    def set(self, key, value):
+
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
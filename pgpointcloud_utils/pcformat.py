@@ -1,3 +1,5 @@
+import struct
+import numpy
 from decimal import Decimal
 import xml.etree.ElementTree as ET
 
@@ -157,8 +159,60 @@ class PcDimension(object):
             'struct', None
         )
 
+    def get_dtype(self, is_ndr=None):
+        '''
+        return the numpy dtype of the dimension for the endian-ness. if
+        is_ndr is None, the native byte order is used
+        '''
+
+        frmt = self.struct_format
+        if frmt is None:
+            return None
+
+        if is_ndr is None:
+            endian = '='
+        elif is_ndr:
+            endian = '<'
+        else:
+            endian = '>'
+
+        return numpy.dtype(endian + frmt)
+
+    def compute_processed_values(self, raw_values):
+        '''
+        convert array of raw values to array of processed values
+        '''
+
+        if Decimal(self.scale) != Decimal(PcDimension.DEFAULT_SCALE):
+            return raw_values * self.scale
+        else:
+            return raw_values.copy()
+
+    def compute_raw_values(self, values):
+        '''
+        convert array of processed values to array of raw values. values of
+        integer dimensions are rounded, not truncated
+        '''
+
+        values = numpy.asarray(values)
+
+        if Decimal(self.scale) != Decimal(PcDimension.DEFAULT_SCALE):
+            values = values / self.scale
+
+        dtype = self.get_dtype()
+        if dtype.kind in 'iu' and values.dtype.kind == 'f':
+            values = numpy.rint(values)
+
+        return values.astype(dtype)
+
 class PcFormat(object):
 
+    # PcPoint header format
+    #
+    # byte (endian)
+    # uint32 (pcid)
+    POINT_HEADER_FORMAT = ['B', 'I']
+
     def __init__(self, pcid=None, srid=None, proj4text=None, dimensions=None):
 
         self._pcid = None
@@ -166,6 +220,10 @@ class PcFormat(object):
         self._proj4text = None
         self._dimensions = []
         self._dimension_lookup = {}
+        self._compression = None
+        self._structs = {}
+        self._dtypes = {}
+        self._scales = None
 
         if pcid:
             self.pcid = pcid
@@ -221,6 +279,21 @@ class PcFormat(object):
 
         self._proj4text = new_value
 
+    @property
+    def compression(self):
+        return self._compression
+
+    @compression.setter
+    def compression(self, new_value):
+        try:
+            new_value = str(new_value)
+        except:
+            raise PcInvalidArgException(
+                message='Value cannot be treated as a string'
+            )
+
+        self._compression = new_value
+
     @property
     def dimensions(self):
         return self._dimensions
@@ -244,6 +317,11 @@ class PcFormat(object):
         # build lookups
         self._build_dimension_lookups()
 
+        # compiled structs and dtypes depend upon the dimensions
+        self._structs = {}
+        self._dtypes = {}
+        self._scales = None
+
     def _build_dimension_lookups(self):
 
         self._dimension_lookups = {
@@ -290,6 +368,13 @@ class PcFormat(object):
             _dimensions[index] = dimension
         frmt.dimensions = _dimensions
 
+        # compression of patches
+        metadata = root.find('pc:metadata', namespaces)
+        if metadata is not None:
+            for md in metadata.findall('Metadata'):
+                if md.get('name') == 'compression':
+                    frmt.compression = md.text
+
         return frmt
 
     @property
@@ -305,6 +390,73 @@ class PcFormat(object):
         frmt = ' '.join(frmt)
         return frmt
 
+    def get_struct(self, is_ndr, with_header=True):
+        '''
+        return the compiled struct.Struct of a PcPoint for the endian-ness.
+        if with_header is False, the struct only covers the dimension values
+
+        structs are built once and cached until dimensions is reassigned
+        '''
+
+        key = (bool(is_ndr), bool(with_header))
+
+        s = self._structs.get(key, None)
+        if s is None:
+
+            if is_ndr:
+                frmt = ['<']
+            else:
+                frmt = ['>']
+
+            if with_header:
+                frmt += PcFormat.POINT_HEADER_FORMAT
+            frmt.append(self.struct_format)
+
+            s = struct.Struct(' '.join(frmt))
+            self._structs[key] = s
+
+        return s
+
+    def get_dtype(self, is_ndr=None):
+        '''
+        return the numpy structured dtype of the dimension values of a
+        PcPoint for the endian-ness. fields are named by dimension name.
+        if is_ndr is None, the native byte order is used
+
+        dtypes are built once and cached until dimensions is reassigned
+        '''
+
+        dtype = self._dtypes.get(is_ndr, None)
+        if dtype is None:
+
+            try:
+                dtype = numpy.dtype([
+                    (dim.name, dim.get_dtype(is_ndr))
+                    for dim in self.dimensions
+                ])
+            except (TypeError, ValueError):
+                raise PcRunTimeException(
+                    message='Cannot build dtype. Dimension names must be unique'
+                )
+
+            self._dtypes[is_ndr] = dtype
+
+        return dtype
+
+    @property
+    def scales(self):
+        '''
+        return array of the scale of each dimension
+        '''
+
+        if self._scales is None:
+            self._scales = numpy.array(
+                [dim.scale for dim in self.dimensions],
+                dtype=numpy.float64
+            )
+
+        return self._scales
+
     def get_dimension(self, name_or_pos):
         '''
         return the dimension by name or position (1-based)
@@ -0,0 +1,257 @@
+'''
+binning of points into the square cells of a grid, as done in the database
+with ST_SnapToGrid when building PcPatches
+'''
+
+import math
+import numpy
+
+from .pcexception import *
+
+def utm_srid(lon, lat):
+    '''
+    SRID of the WGS84 UTM zone of a longitude and latitude
+    '''
+
+    zone = int(math.floor((lon + 180.) / 6.)) + 1
+
+    if lat > 0:
+        return 32600 + zone
+    else:
+        return 32700 + zone
+
+def get_extent(x, y):
+    '''
+    returns tuple of the upper-left and lower-right corners
+    (ulx, uly, lrx, lry)
+    '''
+
+    if len(x) < 1:
+        raise PcInvalidArgException(
+            message='Cannot compute extent of no coordinates'
+        )
+
+    return x.min(), y.max(), x.max(), y.min()
+
+def snap_to_grid(x, y, origin_x, origin_y, size):
+    '''
+    returns tuple of arrays of the column and row of the cell of each point.
+    same as ST_SnapToGrid, points are snapped to the nearest corner
+    '''
+
+    if size <= 0:
+        raise PcInvalidArgException(
+            message='Grid size must be greater than zero'
+        )
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+
+    return (
+        numpy.rint((x - origin_x) / size).astype(numpy.int64),
+        numpy.rint((y - origin_y) / size).astype(numpy.int64)
+    )
+
+def _cell_keys(cols, rows):
+    '''
+    one integer per cell
+    '''
+
+    if len(cols) < 1:
+        return numpy.empty(0, dtype=numpy.int64)
+
+    cols = cols - cols.min()
+    rows = rows - rows.min()
+
+    return cols * (rows.max() + 1) + rows
+
+# number of cells per point up to which cells are counted with a histogram
+# instead of sorting
+HISTOGRAM_CELLS_PER_POINT = 4
+
+def count_cells(cols, rows):
+    '''
+    returns array of the number of points of each occupied cell
+    '''
+
+    keys = _cell_keys(cols, rows)
+    if len(keys) < 1:
+        return numpy.empty(0, dtype=numpy.int64)
+
+    # single pass histogram if grid is small enough
+    num_cells = int(keys.max()) + 1
+    if num_cells <= HISTOGRAM_CELLS_PER_POINT * len(keys):
+        counts = numpy.bincount(keys, minlength=num_cells)
+        return counts[counts > 0]
+
+    return numpy.unique(keys, return_counts=True)[1]
+
+def group_cells(cols, rows):
+    '''
+    returns list of arrays of indices of points, one array per occupied
+    cell. indices keep the order of the points
+    '''
+
+    keys = _cell_keys(cols, rows)
+    if len(keys) < 1:
+        return []
+
+    order = numpy.argsort(keys, kind='mergesort')
+    keys = keys[order]
+
+    return numpy.split(order, numpy.flatnonzero(keys[1:] != keys[:-1]) + 1)
+
+def compute_patch_size(x, y, max_points_per_patch=400, extent=None):
+    '''
+    search for the size of the cells of a grid so that cells have no more
+    than max_points_per_patch points. the grid starts at the upper-left
+    corner of extent. if extent is not provided, the extent of the points
+    is used
+
+    the points are counted in memory for each probed size
+    '''
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+
+    if extent is None:
+        extent = get_extent(x, y)
+    ulx, uly, lrx, lry = extent
+
+    def get_patch_count(dim):
+        '''
+        returns the number of patches whose point count > max_points
+        '''
+
+        cols, rows = snap_to_grid(x, y, ulx, uly, dim)
+        counts = count_cells(cols, rows)
+
+        return int(numpy.count_nonzero(counts > max_points_per_patch))
+
+    width = lrx - ulx
+    height = uly - lry
+
+    # starting patch size in meters (due to UTM zone usage)
+    patch_size = int(max(width / 10., height / 10.))
+
+    # no patch size, any patch size is valid
+    if patch_size < 1:
+        return 100
+
+    old_patch_sizes = [0]
+    old_patch_counts = [0]
+    delta = None
+    long_tail_count = 0
+
+    while True:
+
+        # patch size less than 1
+        # means no reasonable patch size worked
+        if patch_size < 1:
+
+            # use largest patch_size that had
+            # the least number of patches over max points per patch
+
+            min_patch_count = min(old_patch_counts[1:])
+            max_patch_size = -1
+
+            for idx in xrange(len(old_patch_counts) -  1, 0, -1):
+                if (
+                    old_patch_counts[idx] == min_patch_count and
+                    old_patch_sizes[idx] > max_patch_size
+                ):
+                    max_patch_size = old_patch_sizes[idx]
+
+            patch_size = max_patch_size
+            break
+
+        patch_count = get_patch_count(patch_size)
+
+        if abs(patch_size - old_patch_sizes[-1]) <= 1:
+            if patch_count == 0:
+                if long_tail_count >= 5:
+                    patch_size = old_patch_sizes[-1]
+                    break
+                elif patch_size > old_patch_sizes[-1]:
+                    long_tail_count += 1
+            elif old_patch_counts[-1] == 0:
+                patch_size = old_patch_sizes[-1]
+                break
+        elif long_tail_count > 0 and patch_count > 0 and old_patch_counts[-1] == 0:
+            patch_size = old_patch_sizes[-1]
+            break
+
+        delta = max(abs(patch_size - old_patch_sizes[-1]) // 2, 1)
+        if patch_count > 0:
+            delta *= -1
+
+        old_patch_sizes.append(patch_size)
+        patch_size += delta
+
+        old_patch_counts.append(patch_count)
+
+    return patch_size
+
+def quadtree_cells(x, y, max_points_per_patch=400, max_depth=32):
+    '''
+    recursively split the square extent of the points into four quadrants
+    until each quadrant has no more than max_points_per_patch points.
+    returns list of arrays of indices of points, one array per non-empty
+    quadrant. indices keep the order of the points
+
+    points that cannot be split further (same location or max_depth
+    reached) are split into consecutive chunks of max_points_per_patch
+    '''
+
+    max_points_per_patch = int(max_points_per_patch)
+    if max_points_per_patch < 1:
+        raise PcInvalidArgException(
+            message='Maximum number of points per patch must be greater than zero'
+        )
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+
+    if len(x) < 1:
+        return []
+
+    ulx, uly, lrx, lry = get_extent(x, y)
+
+    cells = []
+    stack = [(
+        numpy.arange(len(x)), ulx, lry, max(lrx - ulx, uly - lry), 0
+    )]
+    while stack:
+
+        indices, min_x, min_y, size, depth = stack.pop()
+
+        if len(indices) <= max_points_per_patch:
+            cells.append(indices)
+            continue
+
+        if size <= 0 or depth >= max_depth:
+            cells.extend(
+                indices[idx:idx + max_points_per_patch]
+                for idx in xrange(0, len(indices), max_points_per_patch)
+            )
+            continue
+
+        half = size / 2.
+        mid_x = min_x + half
+        mid_y = min_y + half
+
+        east = x[indices] >= mid_x
+        north = y[indices] >= mid_y
+
+        # pushed in reverse so that quadrants are popped NW, NE, SW, SE
+        for is_north, is_east, quad_x, quad_y in (
+            (False, True, mid_x, min_y),
+            (False, False, min_x, min_y),
+            (True, True, mid_x, mid_y),
+            (True, False, min_x, mid_y),
+        ):
+            quadrant = indices[(north == is_north) & (east == is_east)]
+            if len(quadrant) > 0:
+                stack.append((quadrant, quad_x, quad_y, half, depth + 1))
+
+    return cells
@@ -2,12 +2,13 @@ import warnings
 import copy
 import struct
 import binascii
-import pyproj
-from decimal import Decimal
-from numeric_string_parser import NumericStringParser
+import numpy
 
 from .pcexception import *
 from .pcformat import PcDimension, PcFormat
+from .pcpoint import PcPoint
+from .pctransform import PcTransformPlan
+from . import pcbytes
 
 class PcPatch(object):
 
@@ -23,9 +24,12 @@ class PcPatch(object):
     HEADER_POS_COMPRESSION = 2
     HEADER_POS_NPOINTS = 3
 
+    # compiled header structs by endian-ness
+    _HEADER_STRUCTS = {}
+
     _compression = None
     _npoints = None
-    _points = None
+    _columns = None
     _data = None
 
     UNCOMPRESSED = 'uncompressed'
@@ -39,30 +43,105 @@ class PcPatch(object):
         2: DIMENSIONAL,
     }
 
-    def __init__(self, pcformat, data):
+    # compression of schema metadata to compression of patch
+    _FORMAT_COMPRESSION = {
+        'none': UNCOMPRESSED,
+        'dimensional': DIMENSIONAL,
+        'ght': GHT,
+    }
 
-        cls = self.__class__
+    def __init__(self, pcformat, data=None, values=None):
 
         self._pcformat = None
-        self._raw_values = []
-        self._compression = None
-        self._npoints = None
-        self._points = None
+        self._compression = 0
+        self._npoints = 0
+        self._columns = []
+        self._data = None
 
         if pcformat is not None:
             self.pcformat = pcformat
 
-        header = cls.extract_header_from_binary(data)
-        self.compression = header[cls.HEADER_POS_COMPRESSION]
+        if data is not None:
+            self._load(data)
+        elif values is not None:
+            self.values = values
+
+    @property
+    def pcformat(self):
+        return self._pcformat
+
+    @pcformat.setter
+    def pcformat(self, new_value):
+
+        if not isinstance(new_value, PcFormat):
+            raise PcInvalidArgException(
+                message='Value not an instance of PcFormat'
+            )
+
+        self._pcformat = new_value
+
+        # new patches use the compression of the format
+        self._compression = PcPatch._COMPRESSION_ID[
+            PcPatch._FORMAT_COMPRESSION.get(
+                self._pcformat.compression, PcPatch.UNCOMPRESSED
+            )
+        ]
+
+        # empty columns for each dimension
+        self._npoints = 0
+        self._columns = [
+            numpy.empty(0, dtype=dim.get_dtype())
+            for dim in self._pcformat.dimensions
+        ]
+
+    @property
+    def compression(self):
+        return self._compression
+
+    @property
+    def npoints(self):
+        return self._npoints
+
+    def _load(self, data):
+        '''
+        load binary representation into per-dimension columns
+        '''
 
-        if cls._COMPRESSION.get(self.compression, None) == cls.UNCOMPRESSED:
-            # TODO: convert to array of PcPoint objects
-            pass
+        cls = self.__class__
+
+        if self.pcformat is None:
+            raise PcRunTimeException(
+                message='Cannot load PcPatch without a PcFormat'
+            )
+
+        is_ndr = cls.is_ndr(data)
+        header = cls.extract_header_from_binary(data)
+        self._compression = header[cls.HEADER_POS_COMPRESSION]
+        self._npoints = header[cls.HEADER_POS_NPOINTS]
+
+        offset = cls.header_struct(is_ndr).size
+
+        compression = cls._COMPRESSION.get(self.compression, None)
+        if compression == cls.UNCOMPRESSED:
+            self._columns = _unpack_uncompressed(
+                self.pcformat, is_ndr, data, offset, self.npoints
+            )
+        elif compression == cls.DIMENSIONAL:
+            self._columns = _unpack_dimensional(
+                self.pcformat, is_ndr, data, offset, self.npoints
+            )
         else:
             warnings.warn('Compressed patch detected. Cannot access points')
-            self.npoints = header[cls.HEADER_POS_NPOINTS]
+            self._columns = None
             self._data = data
-        
+
+    def _check_columns(self):
+
+        if self._columns is None:
+            raise PcRunTimeException(
+                message='Cannot access points of compressed PcPatch'
+            )
+
     @classmethod
     def is_ndr(cls, data):
         '''
@@ -84,19 +163,34 @@ class PcPatch(object):
 
         return ' '.join(frmt)
 
+    @classmethod
+    def header_struct(cls, is_ndr):
+        '''
+        return the cached compiled struct of the header
+        '''
+
+        s = cls._HEADER_STRUCTS.get(is_ndr, None)
+        if s is None:
+            s = struct.Struct(cls.header_format(is_ndr))
+            cls._HEADER_STRUCTS[is_ndr] = s
+
+        return s
+
     @classmethod
     def extract_header_from_binary(cls, data):
 
-        s = struct.Struct(cls.header_format(
-            is_ndr=cls.is_ndr(data)
-        ))
+        s = cls.header_struct(is_ndr=cls.is_ndr(data))
 
         return s.unpack(data[:s.size])
 
     @classmethod
     def extract_header_from_hex(cls, hexstr):
 
-        return cls.extract_header_from_binary(binascii.unhexlify(hexstr))
+        # only the header is decoded
+        size = cls.header_struct(is_ndr=True).size
+        return cls.extract_header_from_binary(
+            binascii.unhexlify(hexstr[:2 * size])
+        )
 
     @classmethod
     def extract_pcid_from_binary(cls, data):
@@ -107,7 +201,8 @@ class PcPatch(object):
     @classmethod
     def extract_pcid_from_hex(cls, hexstr):
 
-        return cls.extract_pcid_from_binary(binascii.unhexlify(hexstr))
+        header = cls.extract_header_from_hex(hexstr)
+        return header[cls.HEADER_POS_PCID]
 
     @classmethod
     def extract_compression_from_binary(cls, data):
@@ -118,7 +213,8 @@ class PcPatch(object):
     @classmethod
     def extract_compression_from_hex(cls, hexstr):
 
-        return cls.extract_compression_from_binary(binascii.unhexlify(hexstr))
+        header = cls.extract_header_from_hex(hexstr)
+        return header[cls.HEADER_POS_COMPRESSION]
 
     @classmethod
     def extract_npoints_from_binary(cls, data):
@@ -129,26 +225,323 @@ class PcPatch(object):
     @classmethod
     def extract_npoints_from_hex(cls, hexstr):
 
-        return cls.extract_npoints_from_binary(binascii.unhexlify(hexstr))
+        header = cls.extract_header_from_hex(hexstr)
+        return header[cls.HEADER_POS_NPOINTS]
 
     @classmethod
     def from_binary(cls, pcformat, data):
         '''
-        deserialize PcPatch from binary representation. returns tuple
+        deserialize PcPatch from binary representation. returns PcPatch
 
-        data is deserialized only if patch is not compressed
+        data is deserialized only if patch is not GHT compressed
         '''
 
-        pt = PcPatch(pcformat=pcformat, data=data)
-        pt._raw_values = values[len(PcPoint._HEADER_FORMAT):]
-
-        return pt
+        return cls(pcformat=pcformat, data=data)
 
     @classmethod
     def from_hex(cls, pcformat, hexstr):
         '''
-        deserialize PcPoint from hex representation. returns tuple
+        deserialize PcPatch from hex representation. returns PcPatch
         '''
 
         return cls.from_binary(pcformat, binascii.unhexlify(hexstr))
 
+    def as_binary(self, compression=None):
+        '''
+        serialize PcPatch. returns binary representation
+
+        compression is one of UNCOMPRESSED or DIMENSIONAL. if not provided,
+        the compression of the PcPatch is used
+        '''
+
+        if self.pcformat is None:
+            raise PcRunTimeException(
+                message='Cannot dump PcPatch without a PcFormat'
+            )
+
+        # compressed patch that could not be decoded is returned as is
+        if self._columns is None:
+            return self._data
+
+        if compression is None:
+            compression = PcPatch._COMPRESSION[self.compression]
+
+        if compression == PcPatch.UNCOMPRESSED:
+            body = _pack_uncompressed(
+                self.pcformat, True, self._columns, self.npoints
+            )
+        elif compression == PcPatch.DIMENSIONAL:
+            body = _pack_dimensional(self.pcformat, self._columns)
+        else:
+            raise PcInvalidArgException(
+                message='Cannot serialize PcPatch with compression: {compression}'.format(
+                    compression=compression
+                )
+            )
+
+        s = self.header_struct(is_ndr=True)
+        header = s.pack(
+            1, self.pcformat.pcid,
+            PcPatch._COMPRESSION_ID[compression], self.npoints
+        )
+
+        return header + body
+
+    def as_hex(self, compression=None):
+        '''
+        serialize PcPatch. returns hex representation
+        '''
+
+        return binascii.hexlify(self.as_binary(compression))
+
+    def _get_column_index(self, name_or_pos):
+
+        if isinstance(name_or_pos, int):
+            # position is 1-based
+            return name_or_pos - 1
+        else:
+            index = self.pcformat.get_dimension_index(name_or_pos)
+            if index is None:
+                raise PcInvalidArgException(
+                    message='Dimension not found: {name}'.format(
+                        name=name_or_pos
+                    )
+                )
+
+            return index
+
+    def get_raw_values(self, name_or_pos):
+        '''
+        return the raw (unscaled) values of the provided dimension name or
+        position (1-based) as an array
+        '''
+
+        self._check_columns()
+
+        return self._columns[self._get_column_index(name_or_pos)]
+
+    def get_values(self, name_or_pos):
+        '''
+        return the values of the provided dimension name or position (1-based)
+        as an array
+        '''
+
+        self._check_columns()
+
+        index = self._get_column_index(name_or_pos)
+        dim = self.pcformat.dimensions[index]
+
+        return dim.compute_processed_values(self._columns[index])
+
+    def set_values(self, name_or_pos, values):
+        '''
+        set the values of provided dimension name or position (1-based)
+        '''
+
+        self._check_columns()
+
+        index = self._get_column_index(name_or_pos)
+        dim = self.pcformat.dimensions[index]
+
+        values = numpy.asarray(values)
+        if values.shape != (self.npoints,):
+            raise PcInvalidArgException(
+                message='Value has different number of elements than PcPatch points'
+            )
+
+        self._columns[index] = dim.compute_raw_values(values)
+
+    @property
+    def values(self):
+        '''
+        return list of arrays of processed values, one array per dimension
+        '''
+
+        self._check_columns()
+
+        return [
+            dim.compute_processed_values(column)
+            for column, dim in zip(self._columns, self.pcformat.dimensions)
+        ]
+
+    @values.setter
+    def values(self, new_values):
+        '''
+        set raw values by converting provided arrays, one array per dimension
+        '''
+
+        if not isinstance(new_values, list):
+            raise PcInvalidArgException(
+                message='Value not a list'
+            )
+
+        dimensions = self.pcformat.dimensions
+        if len(new_values) != len(dimensions):
+            raise PcInvalidArgException(
+                message='Value has different number of elements than PcFormat dimensions'
+            )
+
+        new_values = [numpy.asarray(values) for values in new_values]
+
+        npoints = 0
+        if new_values:
+            npoints = len(new_values[0])
+        for values in new_values:
+            if values.shape != (npoints,):
+                raise PcInvalidArgException(
+                    message='Value has arrays of different number of elements'
+                )
+
+        self._columns = [
+            dim.compute_raw_values(values)
+            for values, dim in zip(new_values, dimensions)
+        ]
+        self._npoints = npoints
+        self._data = None
+
+    @property
+    def raw_values(self):
+        '''
+        return list of arrays of raw values, one array per dimension
+        '''
+
+        self._check_columns()
+
+        return [column.copy() for column in self._columns]
+
+    @raw_values.setter
+    def raw_values(self, new_values):
+        '''
+        set raw values with provided arrays, one array per dimension
+        '''
+
+        if not isinstance(new_values, list):
+            raise PcInvalidArgException(
+                message='Value not a list'
+            )
+
+        dimensions = self.pcformat.dimensions
+        if len(new_values) != len(dimensions):
+            raise PcInvalidArgException(
+                message='Value has different number of elements than PcFormat dimensions'
+            )
+
+        new_values = [
+            numpy.asarray(values, dtype=dim.get_dtype())
+            for values, dim in zip(new_values, dimensions)
+        ]
+
+        npoints = 0
+        if new_values:
+            npoints = len(new_values[0])
+        for values in new_values:
+            if values.shape != (npoints,):
+                raise PcInvalidArgException(
+                    message='Value has arrays of different number of elements'
+                )
+
+        self._columns = new_values
+        self._npoints = npoints
+        self._data = None
+
+    @property
+    def points(self):
+        '''
+        return list of PcPoint of the patch
+        '''
+
+        self._check_columns()
+
+        values = zip(*[column.tolist() for column in self._columns])
+
+        points = []
+        for raw_values in values:
+            pt = PcPoint(pcformat=self.pcformat)
+            pt._raw_values = list(raw_values)
+            points.append(pt)
+
+        return points
+
+    def copy(self):
+        '''
+        returns a copy of this PcPatch
+        '''
+
+        pa = PcPatch(pcformat=self.pcformat)
+        pa._compression = self._compression
+        pa._npoints = self._npoints
+        pa._data = self._data
+        if self._columns is None:
+            pa._columns = None
+        else:
+            pa._columns = [column.copy() for column in self._columns]
+
+        return pa
+
+    def transform(self, pcformat, mapping):
+        '''
+        transform PcPatch to provided pcformat using the given mapping.
+        see PcPoint.transform
+
+        returns new PcPatch
+        '''
+
+        plan = PcTransformPlan(self.pcformat, pcformat, mapping)
+
+        return plan.apply_patch(self)
+
+# reverse lookup of compression name to id
+PcPatch._COMPRESSION_ID = dict(
+    (v, k) for k, v in PcPatch._COMPRESSION.iteritems()
+)
+
+def _unpack_uncompressed(pcformat, is_ndr, data, offset, npoints):
+    '''
+    unpack the points of an uncompressed patch into native columns
+    '''
+
+    dtype = pcformat.get_dtype(is_ndr)
+    if len(data) - offset < dtype.itemsize * npoints:
+        raise PcInvalidArgException(
+            message='Data too short for number of points in PcPatch'
+        )
+
+    body = numpy.frombuffer(data, dtype=dtype, count=npoints, offset=offset)
+
+    return [
+        body[dim.name].astype(dim.get_dtype())
+        for dim in pcformat.dimensions
+    ]
+
+def _pack_uncompressed(pcformat, is_ndr, columns, npoints):
+    '''
+    pack native columns into the points of an uncompressed patch
+    '''
+
+    body = numpy.empty(npoints, dtype=pcformat.get_dtype(is_ndr))
+    for dim, column in zip(pcformat.dimensions, columns):
+        body[dim.name] = column
+
+    return body.tostring()
+
+def _unpack_dimensional(pcformat, is_ndr, data, offset, npoints):
+    '''
+    unpack the dimensions of a dimensional patch into native columns
+    '''
+
+    columns = []
+    for dim in pcformat.dimensions:
+        values, offset = pcbytes.decode(dim, npoints, data, offset, is_ndr)
+        columns.append(values)
+
+    return columns
+
+def _pack_dimensional(pcformat, columns):
+    '''
+    pack native columns into the dimensions of a dimensional patch
+    '''
+
+    return ''.join([
+        pcbytes.encode(dim, column)
+        for dim, column in zip(pcformat.dimensions, columns)
+    ])
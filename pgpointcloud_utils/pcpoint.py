@@ -1,12 +1,12 @@
 import copy
 import struct
 import binascii
-import pyproj
+import numpy
 from decimal import Decimal
-from numeric_string_parser import NumericStringParser
 
 from .pcexception import *
 from .pcformat import PcDimension, PcFormat
+from .pctransform import PcTransformPlan
 
 class PcPoint(object):
 
@@ -16,7 +16,10 @@ class PcPoint(object):
     #
     # byte (endian)
     # uint32 (pcid)
-    _HEADER_FORMAT = ['B', 'I']
+    _HEADER_FORMAT = PcFormat.POINT_HEADER_FORMAT
+
+    # compiled header structs by endian-ness
+    _HEADER_STRUCTS = {}
 
     def __init__(
         self,
@@ -136,12 +139,23 @@ class PcPoint(object):
 
         return ' '.join([header_format, data_format])
 
+    @classmethod
+    def header_struct(cls, is_ndr):
+        '''
+        return the cached compiled struct of the header
+        '''
+
+        s = cls._HEADER_STRUCTS.get(is_ndr, None)
+        if s is None:
+            s = struct.Struct(cls.header_format(is_ndr))
+            cls._HEADER_STRUCTS[is_ndr] = s
+
+        return s
+
     @classmethod
     def extract_pcid_from_binary(cls, data):
 
-        s = struct.Struct(cls.header_format(
-            is_ndr=cls.is_ndr(data)
-        ))
+        s = cls.header_struct(is_ndr=cls.is_ndr(data))
 
         header = s.unpack(data[:s.size])
         return header[1]
@@ -149,7 +163,11 @@ class PcPoint(object):
     @classmethod
     def extract_pcid_from_hex(cls, hexstr):
 
-        return cls.extract_pcid_from_binary(binascii.unhexlify(hexstr))
+        # only the header is decoded
+        size = cls.header_struct(is_ndr=True).size
+        return cls.extract_pcid_from_binary(
+            binascii.unhexlify(hexstr[:2 * size])
+        )
 
     @classmethod
     def from_binary(cls, pcformat, data):
@@ -157,15 +175,12 @@ class PcPoint(object):
         deserialize PcPoint from binary representation. returns tuple
         '''
 
-        s = struct.Struct(cls.combined_format(
-            is_ndr=cls.is_ndr(data),
-            pcformat=pcformat
-        ))
+        s = pcformat.get_struct(is_ndr=cls.is_ndr(data))
 
-        values = [v for v in s.unpack(data)]
+        values = s.unpack(data)
 
         pt = PcPoint(pcformat=pcformat)
-        pt._raw_values = values[len(PcPoint._HEADER_FORMAT):]
+        pt._raw_values = list(values[len(PcPoint._HEADER_FORMAT):])
 
         return pt
 
@@ -177,6 +192,97 @@ class PcPoint(object):
 
         return cls.from_binary(pcformat, binascii.unhexlify(hexstr))
 
+    @classmethod
+    def _header_dtype(cls, is_ndr):
+
+        if is_ndr:
+            endian = '<'
+        else:
+            endian = '>'
+
+        return numpy.dtype([
+            ('endian', endian + cls._HEADER_FORMAT[0]),
+            ('pcid', endian + cls._HEADER_FORMAT[1])
+        ])
+
+    @classmethod
+    def from_binary_batch(cls, pcformat, data):
+        '''
+        deserialize many PcPoints of the same pcformat from binary
+        representations. returns list of arrays of processed values, one
+        array per dimension
+        '''
+
+        if not isinstance(data, list):
+            data = list(data)
+
+        npoints = len(data)
+        if npoints < 1:
+            return [
+                numpy.empty(0, dtype=dim.get_dtype())
+                for dim in pcformat.dimensions
+            ]
+
+        return cls._unpack_batch(pcformat, ''.join(data), npoints)
+
+    @classmethod
+    def from_hex_batch(cls, pcformat, hexstrs):
+        '''
+        deserialize many PcPoints of the same pcformat from hex
+        representations. returns list of arrays of processed values, one
+        array per dimension
+        '''
+
+        if not isinstance(hexstrs, list):
+            hexstrs = list(hexstrs)
+
+        npoints = len(hexstrs)
+        if npoints < 1:
+            return cls.from_binary_batch(pcformat, [])
+
+        return cls._unpack_batch(
+            pcformat, binascii.unhexlify(''.join(hexstrs)), npoints
+        )
+
+    @classmethod
+    def _unpack_batch(cls, pcformat, data, npoints):
+        '''
+        unpack concatenated binary PcPoints into columns
+        '''
+
+        is_ndr = cls.is_ndr(data)
+        dtype = numpy.dtype([
+            ('header', cls._header_dtype(is_ndr)),
+            ('values', pcformat.get_dtype(is_ndr))
+        ])
+
+        if len(data) != dtype.itemsize * npoints:
+            raise PcInvalidArgException(
+                message='PcPoints do not match the size of PcFormat'
+            )
+
+        points = numpy.frombuffer(data, dtype=dtype, count=npoints)
+
+        header = points['header']
+        if numpy.any(header['endian'] != header['endian'][0]):
+            raise PcInvalidArgException(
+                message='PcPoints do not share the same endian-ness'
+            )
+        if numpy.any(header['pcid'] != pcformat.pcid):
+            raise PcInvalidArgException(
+                message='PcPoints do not share the PCID of PcFormat'
+            )
+
+        values = points['values']
+
+        return [
+            PcPoint._compute_processed_value(
+                values[dim.name].astype(dim.get_dtype()),
+                dim
+            )
+            for dim in pcformat.dimensions
+        ]
+
     def as_binary(self):
         '''
         serialize PcPoint. returns binary representation
@@ -187,11 +293,18 @@ class PcPoint(object):
                 message='Cannot dump PcPoint without a PcFormat'
             )
 
-        s = struct.Struct(PcPoint.combined_format(
-            is_ndr=True,
-            pcformat=self.pcformat
-        ))
-        values = [1, self.pcformat.pcid] + self._raw_values
+        # raw values of integer dimensions are rounded, not truncated, as
+        # done by PcDimension.compute_raw_values
+        raw_values = [
+            int(numpy.rint(raw_value))
+            if dim.get_dtype().kind in 'iu' else raw_value
+            for dim, raw_value in zip(
+                self.pcformat.dimensions, self._raw_values
+            )
+        ]
+
+        s = self.pcformat.get_struct(is_ndr=True)
+        values = [1, self.pcformat.pcid] + raw_values
 
         return s.pack(*values)
 
@@ -268,176 +381,12 @@ class PcPoint(object):
             1. converting values
             2. reprojecting coordinates (X,Y) if pcformat has different SRID
 
+        to transform many PcPoints, build a PcTransformPlan once and apply it
+        to each PcPoint
+
         returns new PcPoint
         '''
 
-        # if From pcformat == To pcformat, return PcPoint
-        if self.pcformat == pcformat:
-            return self.copy()
-
-        # get info of From pcformat
-        from_dimensions = self.pcformat.dimensions
-        num_from_dimensions = len(from_dimensions)
-
-        # get info of To pcformat
-        to_dimensions = pcformat.dimensions
-        num_to_dimensions = len(to_dimensions)
-
-        # load mapping
-        if not isinstance(mapping, dict):
-            raise PcInvalidArgException(
-                message='mapping not a dict'
-            )
-
-        # new pcpoint
-        to_pcpoint = PcPoint(pcformat=pcformat)
-
-        #
-        # run conversion
-        #
-
-        # placeholders for if expressions are needed
-        expr_assignment = {}
-        nsp = None
-
-        to_values = [0.] * num_to_dimensions
-        map_keys = mapping.keys()
-        for to_idx in xrange(num_to_dimensions):
-
-            to_dimension = to_dimensions[to_idx]
-            to_position = to_idx + 1
-            by_position = False
-
-            # position match
-            if to_position in map_keys:
-
-                map_from = mapping[to_position]
-                by_position = True
-
-            # name match
-            elif to_dimension.name in map_keys:
-
-                map_from = mapping[to_dimension.name]
-
-            # no match, exception
-            else:
-
-                raise PcInvalidArgException(
-                    message='Destination PcFormat dimension "{dimension}" at position {position} not found in mapping'.format(
-                        dimension=to_dimension.name,
-                        position=to_position
-                    )
-                )
-
-            # inspect map_from
-            # None, use the "to"
-            if map_from is None:
-
-                if by_position:
-
-                    to_values[to_idx] = self.get_value(to_position)
-
-                else:
-
-                    to_values[to_idx] = self.get_value(to_dimension.name)
-
-            # integer, use as index
-            elif isinstance(map_from, int):
-
-                to_values[to_idx] = self.get_value(map_from)
-
-            # string, use as dimension name
-            elif isinstance(map_from, str):
-
-                to_values[to_idx] = self.get_value(map_from)
-
-            # dictionary, more advanced behavior
-            elif isinstance(map_from, dict):
-
-                if map_from.has_key('value'):
-
-                    to_values[to_idx] = map_from.get('value')
-
-                elif map_from.has_key('expression'):
-
-                    expr = map_from.get('expression')
-
-                    # assignment object does not exist
-                    if len(expr_assignment) < 1:
-
-                        for from_idx in xrange(num_from_dimensions):
-                            from_position = from_idx + 1
-
-                            from_value = str(self.get_value(from_position))
-                            expr_assignment['$' + str(from_idx + 1)] = from_value
-                            expr_assignment['$' + from_dimensions[from_idx].name] = from_value
-
-                        # instance of NumericStringParser
-                        nsp = NumericStringParser()
-
-                    # substitute values for placeholders
-                    for k, v in expr_assignment.iteritems():
-                        expr = expr.replace(k, v)
-
-                    # evaluate expression
-                    to_values[to_idx] = nsp.eval(expr)
-
-                else:
-                    if by_position:
-                        key = to_position
-                    else:
-                        key = to_dimension.name
-
-                    raise PcInvalidArgException(
-                        message="Unrecognized dictionary for mapping key: {key} ".format(
-                            key=key
-                        )
-                    )
-
-            else:
-                if by_position:
-                    key = to_position
-                else:
-                    key = to_dimension.name
-
-                raise PcInvalidArgException(
-                    message="Unrecognized value for mapping key: {key} ".format(
-                        key=key
-                    )
-                )
-
-        # set values
-        to_pcpoint.values = to_values
-
-        # reproject if different srid
-        if self.pcformat.srid != pcformat.srid:
-
-            if (
-                self.pcformat.proj4text is None or
-                len(self.pcformat.proj4text) < 1 or
-                pcformat.proj4text is None or
-                len(pcformat.proj4text) < 1
-            ):
-                raise PcRunTimeException(
-                    message='Cannot reproject coordinates. Missing proj4text'
-                )
-
-            try:
-                from_proj = pyproj.Proj(self.pcformat.proj4text)
-                to_proj = pyproj.Proj(pcformat.proj4text)
-            except:
-                raise PcRunTimeException(
-                    message='Cannot reproject coordinates. Invalid proj4text'
-                )
-
-            to_x, to_y = pyproj.transform(
-                from_proj,
-                to_proj,
-                to_pcpoint.get_value('X'),
-                to_pcpoint.get_value('Y')
-            )
-
-            to_pcpoint.set_value('X', to_x)
-            to_pcpoint.set_value('Y', to_y)
+        plan = PcTransformPlan(self.pcformat, pcformat, mapping)
 
-        return to_pcpoint
+        return plan.apply(self)
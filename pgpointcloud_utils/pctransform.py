@@ -0,0 +1,423 @@
+import numpy
+from decimal import Decimal
+from pyparsing import ParseException
+from numeric_string_parser import NumericStringParser
+
+from .pcexception import *
+from .pcformat import PcFormat
+from .pctransformer import PcTransformer
+
+class PcTransformPlan(object):
+    '''
+    transformation from one PcFormat to another PcFormat using a mapping
+
+    the mapping is validated and resolved once. the plan can then be applied
+    to any number of PcPoints or PcPatches of the From PcFormat
+    '''
+
+    # kinds of steps
+    COPY = 'copy'
+    VALUE = 'value'
+    EXPRESSION = 'expression'
+
+    def __init__(self, from_pcformat, to_pcformat, mapping):
+
+        if not isinstance(from_pcformat, PcFormat):
+            raise PcInvalidArgException(
+                message='from_pcformat not an instance of PcFormat'
+            )
+
+        if not isinstance(to_pcformat, PcFormat):
+            raise PcInvalidArgException(
+                message='to_pcformat not an instance of PcFormat'
+            )
+
+        # load mapping
+        if not isinstance(mapping, dict):
+            raise PcInvalidArgException(
+                message='mapping not a dict'
+            )
+
+        self._from_pcformat = from_pcformat
+        self._to_pcformat = to_pcformat
+
+        # one step per dimension of To pcformat
+        self._steps = []
+
+        # instance of NumericStringParser, built if mapping has expressions
+        self._nsp = None
+
+        # reprojection
+        self._reproject = False
+        self._transformer = None
+        self._x_index = None
+        self._y_index = None
+
+        # indices of To dimensions whose raw values are copied as is
+        self._raw_copies = set()
+
+        # if From pcformat == To pcformat, nothing to compile
+        self._identity = from_pcformat == to_pcformat
+        if self._identity:
+            return
+
+        self._compile_mapping(mapping)
+        self._compile_reprojection()
+        self._compile_raw_copies()
+
+    @property
+    def from_pcformat(self):
+        return self._from_pcformat
+
+    @property
+    def to_pcformat(self):
+        return self._to_pcformat
+
+    def _get_from_index(self, name_or_pos, key):
+        '''
+        resolve dimension name or position (1-based) of From pcformat to
+        index
+        '''
+
+        if isinstance(name_or_pos, int):
+            index = name_or_pos - 1
+            if index < 0 or index >= len(self.from_pcformat.dimensions):
+                index = None
+        else:
+            index = self.from_pcformat.get_dimension_index(name_or_pos)
+
+        if index is None:
+            raise PcInvalidArgException(
+                message="Source dimension not found for mapping key: {key} ".format(
+                    key=key
+                )
+            )
+
+        return index
+
+    def _compile_mapping(self, mapping):
+
+        to_dimensions = self.to_pcformat.dimensions
+        num_to_dimensions = len(to_dimensions)
+
+        for to_idx in xrange(num_to_dimensions):
+
+            to_dimension = to_dimensions[to_idx]
+            to_position = to_idx + 1
+
+            # position match
+            if to_position in mapping:
+
+                key = to_position
+
+            # name match
+            elif to_dimension.name in mapping:
+
+                key = to_dimension.name
+
+            # no match, exception
+            else:
+
+                raise PcInvalidArgException(
+                    message='Destination PcFormat dimension "{dimension}" at position {position} not found in mapping'.format(
+                        dimension=to_dimension.name,
+                        position=to_position
+                    )
+                )
+
+            map_from = mapping[key]
+
+            # inspect map_from
+            # None, use the "to"
+            if map_from is None:
+
+                step = (
+                    PcTransformPlan.COPY,
+                    self._get_from_index(key, key)
+                )
+
+            # integer, use as index
+            # string, use as dimension name
+            elif isinstance(map_from, (int, basestring)):
+
+                step = (
+                    PcTransformPlan.COPY,
+                    self._get_from_index(map_from, key)
+                )
+
+            # dictionary, more advanced behavior
+            elif isinstance(map_from, dict):
+
+                if 'value' in map_from:
+
+                    step = (PcTransformPlan.VALUE, map_from.get('value'))
+
+                elif 'expression' in map_from:
+
+                    step = (
+                        PcTransformPlan.EXPRESSION,
+                        self._compile_expression(
+                            map_from.get('expression'), key
+                        )
+                    )
+
+                else:
+
+                    raise PcInvalidArgException(
+                        message="Unrecognized dictionary for mapping key: {key} ".format(
+                            key=key
+                        )
+                    )
+
+            else:
+
+                raise PcInvalidArgException(
+                    message="Unrecognized value for mapping key: {key} ".format(
+                        key=key
+                    )
+                )
+
+            self._steps.append(step)
+
+    def _compile_expression(self, expr, key):
+        '''
+        parse expression once into a tuple of functions. the first takes
+        the list of values of From dimensions. the second takes the list of
+        arrays of values of From dimensions. variables ($position or $name)
+        are resolved to the index of the From dimension
+        '''
+
+        if self._nsp is None:
+            self._nsp = NumericStringParser()
+
+        def resolve(name):
+            if name.isdigit():
+                name = int(name)
+            return self._get_from_index(name, key)
+
+        try:
+            return (
+                self._nsp.compile(expr, resolve=resolve),
+                self._nsp.compile(expr, resolve=resolve, vectorize=True)
+            )
+        except ParseException:
+            raise PcInvalidArgException(
+                message="Invalid expression for mapping key: {key} ".format(
+                    key=key
+                )
+            )
+
+    def _compile_reprojection(self):
+
+        from_pcformat = self.from_pcformat
+        to_pcformat = self.to_pcformat
+
+        # reproject if different srid
+        if from_pcformat.srid == to_pcformat.srid:
+            return
+
+        self._transformer = PcTransformer.get(
+            from_pcformat.proj4text,
+            to_pcformat.proj4text
+        )
+
+        self._x_index = to_pcformat.get_dimension_index('X')
+        self._y_index = to_pcformat.get_dimension_index('Y')
+        if self._x_index is None or self._y_index is None:
+            raise PcRunTimeException(
+                message='Cannot reproject coordinates. Missing X or Y dimension'
+            )
+
+        self._reproject = True
+
+    def _compile_raw_copies(self):
+        '''
+        find To dimensions copied from a From dimension of the same type and
+        scale. their raw values need no conversion
+        '''
+
+        from_dimensions = self.from_pcformat.dimensions
+        to_dimensions = self.to_pcformat.dimensions
+
+        for to_idx, (kind, arg) in enumerate(self._steps):
+
+            if kind != PcTransformPlan.COPY:
+                continue
+
+            # reprojected coordinates always need conversion
+            if self._reproject and to_idx in (self._x_index, self._y_index):
+                continue
+
+            from_dim = from_dimensions[arg]
+            to_dim = to_dimensions[to_idx]
+            if (
+                from_dim.get_dtype() == to_dim.get_dtype() and
+                Decimal(from_dim.scale) == Decimal(to_dim.scale)
+            ):
+                self._raw_copies.add(to_idx)
+
+    def _transform_values(self, from_values):
+        '''
+        transform list of processed values. returns list of processed values
+        '''
+
+        to_values = [0.] * len(self._steps)
+        for to_idx, (kind, arg) in enumerate(self._steps):
+
+            if kind == PcTransformPlan.COPY:
+                to_values[to_idx] = from_values[arg]
+            elif kind == PcTransformPlan.VALUE:
+                to_values[to_idx] = arg
+            else:
+                to_values[to_idx] = arg[0](from_values)
+
+        return to_values
+
+    def _transform_coordinates(self, x, y):
+        '''
+        reproject coordinates. x and y can be numbers or arrays
+        '''
+
+        return self._transformer.transform(x, y)
+
+    def apply(self, pcpoint):
+        '''
+        transform PcPoint. returns new PcPoint
+        '''
+
+        if pcpoint.pcformat != self.from_pcformat:
+            raise PcInvalidArgException(
+                message='PcPoint does not have the From PcFormat of the plan'
+            )
+
+        if self._identity:
+            return pcpoint.copy()
+
+        to_values = self._transform_values(pcpoint.values)
+
+        if self._reproject:
+            to_values[self._x_index], to_values[self._y_index] = \
+                self._transform_coordinates(
+                    to_values[self._x_index],
+                    to_values[self._y_index]
+                )
+
+        return pcpoint.__class__(pcformat=self.to_pcformat, values=to_values)
+
+    def _transform_columns(self, get_from_values, npoints, skip=()):
+        '''
+        transform columns of processed values. get_from_values returns the
+        array of processed values of a From dimension by index. To dimensions
+        whose index is in skip are left as None
+
+        returns list of arrays of processed values, one array per To
+        dimension
+        '''
+
+        to_columns = [None] * len(self._steps)
+        from_columns = _Columns(get_from_values)
+        for to_idx, (kind, arg) in enumerate(self._steps):
+
+            if to_idx in skip:
+                continue
+
+            if kind == PcTransformPlan.COPY:
+                to_columns[to_idx] = numpy.array(get_from_values(arg))
+            elif kind == PcTransformPlan.VALUE:
+                to_columns[to_idx] = numpy.full(
+                    npoints, arg, dtype=numpy.float64
+                )
+            else:
+                # expressions without variables evaluate to a scalar
+                to_columns[to_idx] = numpy.empty(npoints, dtype=numpy.float64)
+                to_columns[to_idx][...] = arg[1](from_columns)
+
+        # reproject all coordinates in one call
+        if self._reproject:
+            to_columns[self._x_index], to_columns[self._y_index] = \
+                self._transformer.transform_columns(
+                    to_columns[self._x_index].astype(numpy.float64),
+                    to_columns[self._y_index].astype(numpy.float64),
+                    inplace=True
+                )
+
+        return to_columns
+
+    def apply_columns(self, columns):
+        '''
+        transform list of arrays of processed values, one array per From
+        dimension. returns list of arrays of processed values, one array per
+        To dimension
+        '''
+
+        columns = [numpy.asarray(column) for column in columns]
+        if len(columns) != len(self.from_pcformat.dimensions):
+            raise PcInvalidArgException(
+                message='Columns has different number of elements than From PcFormat dimensions'
+            )
+
+        if self._identity:
+            return [column.copy() for column in columns]
+
+        if columns:
+            npoints = len(columns[0])
+        else:
+            npoints = 0
+
+        return self._transform_columns(lambda idx: columns[idx], npoints)
+
+    def apply_patch(self, pcpatch):
+        '''
+        transform PcPatch. returns new PcPatch
+
+        raw values are copied as is for dimensions with the same type and
+        scale. all other dimensions are converted to raw values once after
+        transforming and reprojecting
+        '''
+
+        if pcpatch.pcformat != self.from_pcformat:
+            raise PcInvalidArgException(
+                message='PcPatch does not have the From PcFormat of the plan'
+            )
+
+        if self._identity:
+            return pcpatch.copy()
+
+        # processed values of From dimensions are computed once if needed
+        from_values = {}
+        def get_from_values(from_idx):
+            if from_idx not in from_values:
+                from_values[from_idx] = pcpatch.get_values(from_idx + 1)
+            return from_values[from_idx]
+
+        to_columns = self._transform_columns(
+            get_from_values, pcpatch.npoints, skip=self._raw_copies
+        )
+
+        raw_values = []
+        for to_idx, dim in enumerate(self.to_pcformat.dimensions):
+
+            if to_idx in self._raw_copies:
+                from_idx = self._steps[to_idx][1]
+                raw_values.append(pcpatch.get_raw_values(from_idx + 1).copy())
+            else:
+                raw_values.append(dim.compute_raw_values(to_columns[to_idx]))
+
+        to_pcpatch = pcpatch.__class__(pcformat=self.to_pcformat)
+        to_pcpatch.raw_values = raw_values
+
+        return to_pcpatch
+
+class _Columns(object):
+    '''
+    arrays of processed values of From dimensions by index, as required by
+    vectorized expressions
+    '''
+
+    def __init__(self, get_from_values):
+
+        self._get_from_values = get_from_values
+
+    def __getitem__(self, from_idx):
+
+        return self._get_from_values(from_idx)
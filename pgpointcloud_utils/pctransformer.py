@@ -0,0 +1,120 @@
+import pyproj
+import numpy
+
+from .pcexception import *
+from .pccache import LRUCache
+
+class PcTransformer(object):
+    '''
+    reprojects coordinates from one proj4text to another proj4text
+
+    building a transformer is expensive. use PcTransformer.get to share
+    transformers from a process-wide cache
+    '''
+
+    # maximum number of cached transformers
+    CACHE_SIZE = 32
+
+    _CACHE = LRUCache(CACHE_SIZE)
+
+    def __init__(self, from_proj4text, to_proj4text):
+
+        if (
+            from_proj4text is None or
+            len(from_proj4text) < 1 or
+            to_proj4text is None or
+            len(to_proj4text) < 1
+        ):
+            raise PcRunTimeException(
+                message='Cannot reproject coordinates. Missing proj4text'
+            )
+
+        self._from_proj4text = from_proj4text
+        self._to_proj4text = to_proj4text
+
+        self._transformer = None
+        self._from_proj = None
+        self._to_proj = None
+
+        try:
+            # pyproj 2.1+
+            if hasattr(pyproj, 'Transformer'):
+                self._transformer = pyproj.Transformer.from_crs(
+                    from_proj4text, to_proj4text, always_xy=True
+                )
+            else:
+                self._from_proj = pyproj.Proj(from_proj4text)
+                self._to_proj = pyproj.Proj(to_proj4text)
+        except:
+            raise PcRunTimeException(
+                message='Cannot reproject coordinates. Invalid proj4text'
+            )
+
+    @classmethod
+    def get(cls, from_proj4text, to_proj4text):
+        '''
+        return the cached transformer of the proj4texts. a new transformer
+        is built and cached if not found
+        '''
+
+        key = (from_proj4text, to_proj4text)
+
+        transformer = cls._CACHE.get(key)
+        if transformer is None:
+            transformer = cls(from_proj4text, to_proj4text)
+            cls._CACHE.set(key, transformer)
+
+        return transformer
+
+    @classmethod
+    def clear_cache(cls):
+
+        cls._CACHE.clear()
+
+    @property
+    def from_proj4text(self):
+        return self._from_proj4text
+
+    @property
+    def to_proj4text(self):
+        return self._to_proj4text
+
+    def transform(self, x, y):
+        '''
+        reproject coordinates. x and y can be numbers or arrays. returns
+        tuple of x and y
+        '''
+
+        if isinstance(x, numpy.ndarray) or isinstance(y, numpy.ndarray):
+            return self.transform_columns(x, y)
+
+        if self._transformer is not None:
+            return self._transformer.transform(x, y)
+
+        return pyproj.transform(self._from_proj, self._to_proj, x, y)
+
+    def transform_columns(self, x, y, inplace=False):
+        '''
+        reproject arrays of coordinates in one call. returns tuple of arrays
+        of x and y
+
+        if inplace is True, x and y must be float64 arrays and are
+        overwritten
+        '''
+
+        if not inplace:
+            x = numpy.array(x, dtype=numpy.float64)
+            y = numpy.array(y, dtype=numpy.float64)
+
+        if x.shape != y.shape:
+            raise PcInvalidArgException(
+                message='Coordinate arrays have different number of elements'
+            )
+
+        if len(x) < 1:
+            return x, y
+
+        if self._transformer is not None:
+            return self._transformer.transform(x, y, inplace=True)
+
+        return pyproj.transform(self._from_proj, self._to_proj, x, y)
@@ -0,0 +1,268 @@
+'''
+helpers for the PL/Python functions of pgsql/functions.sql
+
+PL/Python provides plpy and SD to the body of each function. they are
+passed to these helpers as is
+'''
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from .pcexception import *
+from .pcformat import PcFormat
+from .pcpoint import PcPoint
+from .pcpatch import PcPatch
+from .pctransform import PcTransformPlan
+from .pccache import LRUCache
+
+# maximum number of loaded mappings and transform plans cached by a function
+MAPPING_CACHE_SIZE = 64
+PLAN_CACHE_SIZE = 64
+
+# fingerprint of a format. cheap to compute compared to parsing the schema
+_FINGERPRINT = "md5(pc.srid::text || ':' || pc.schema || ':' || coalesce(srs.proj4text, ''))"
+
+_FINGERPRINT_QUERY = "SELECT {fingerprint} AS fingerprint FROM pointcloud_formats pc JOIN spatial_ref_sys srs ON pc.srid = srs.srid WHERE pc.pcid = {{pcid}}".format(
+    fingerprint=_FINGERPRINT
+)
+
+_FORMAT_QUERY = "SELECT pc.srid, pc.schema, srs.proj4text, {fingerprint} AS fingerprint FROM pointcloud_formats pc JOIN spatial_ref_sys srs ON pc.srid = srs.srid WHERE pc.pcid = {{pcid}}".format(
+    fingerprint=_FINGERPRINT
+)
+
+def check_cache_txid(SD, txid):
+    '''
+    cached formats live as long as the session but are validated against
+    their fingerprint once every transaction
+    '''
+
+    last_txid = SD.get('last_txid', None)
+    if last_txid is None or last_txid != txid:
+        SD['last_txid'] = txid
+        SD['validated'] = set()
+
+def add_to_cache(SD, prefix, key, value):
+
+    SD.setdefault(prefix, {})[key] = value
+
+def get_from_cache(SD, prefix, key):
+
+    return SD.get(prefix, {}).get(key, None)
+
+def get_lru_cache(SD, prefix, maxsize):
+    '''
+    return the LRUCache stored in SD. created if not found
+    '''
+
+    cache = SD.get(prefix, None)
+    if cache is None:
+        cache = LRUCache(maxsize)
+        SD[prefix] = cache
+
+    return cache
+
+def get_pgpointcloud_format(plpy, SD, pcid):
+
+    pcid = int(pcid)
+    validated = SD.setdefault('validated', set())
+
+    cached = get_from_cache(SD, 'formats', pcid)
+    if cached is not None:
+
+        fingerprint, pcformat = cached
+        if pcid in validated:
+            return pcformat
+
+        resultset = plpy.execute(_FINGERPRINT_QUERY.format(pcid=pcid), 1)
+        if len(resultset) > 0 and resultset[0]['fingerprint'] == fingerprint:
+            validated.add(pcid)
+            return pcformat
+
+    resultset = plpy.execute(_FORMAT_QUERY.format(pcid=pcid), 1)
+
+    if len(resultset) < 1:
+        plpy.error("No record found in pointcloud_formats for PCID: {pcid}".format(
+            pcid=pcid
+        ))
+
+    pcformat = PcFormat.import_format(
+        pcid=pcid,
+        srid=resultset[0]['srid'],
+        schema=resultset[0]['schema']
+    )
+    pcformat.proj4text = resultset[0]['proj4text']
+    add_to_cache(
+        SD, 'formats', pcid, (resultset[0]['fingerprint'], pcformat)
+    )
+    validated.add(pcid)
+
+    return pcformat
+
+def load_mapping(mapping):
+    '''
+    load JSON mapping. keys that are integers are dimension positions
+    '''
+
+    raw_mapping = json.loads(mapping)
+
+    _mapping = {}
+    for k, v in raw_mapping.iteritems():
+        try:
+            _k = int(k)
+        except ValueError:
+            _k = k
+
+        _mapping[_k] = v
+
+    return _mapping
+
+def get_mapping(SD, mapping):
+    '''
+    loaded mappings are cached by JSON text
+    '''
+
+    cache = get_lru_cache(SD, 'mappings', MAPPING_CACHE_SIZE)
+
+    _mapping = cache.get(mapping)
+    if _mapping is None:
+        _mapping = load_mapping(mapping)
+        cache.set(mapping, _mapping)
+
+    return _mapping
+
+def get_transform_plan(plpy, SD, from_pcid, pcid, mapping):
+    '''
+    plans are cached by PCIDs and JSON text of mapping. a plan already
+    used in this transaction is returned without any other lookup. a plan
+    is rebuilt if either format was reloaded
+    '''
+
+    cache = get_lru_cache(SD, 'plans', PLAN_CACHE_SIZE)
+    txid = SD.get('last_txid', None)
+
+    key = (int(from_pcid), int(pcid), mapping)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == txid:
+        return cached[1]
+
+    from_pcformat = get_pgpointcloud_format(plpy, SD, from_pcid)
+    to_pcformat = get_pgpointcloud_format(plpy, SD, pcid)
+
+    if (
+        cached is not None and
+        cached[1].from_pcformat is from_pcformat and
+        cached[1].to_pcformat is to_pcformat
+    ):
+        plan = cached[1]
+    else:
+        plan = PcTransformPlan(
+            from_pcformat, to_pcformat, get_mapping(SD, mapping)
+        )
+
+    cache.set(key, (txid, plan))
+
+    return plan
+
+def transform_point(plpy, SD, pt, pcid, mapping, txid):
+    '''
+    transform hex of PcPoint. returns hex of PcPoint
+    '''
+
+    check_cache_txid(SD, txid)
+
+    # extract PCID from PcPoint
+    from_pcid = PcPoint.extract_pcid_from_hex(pt)
+
+    # if From PCID == To PCID, return PcPoint
+    if from_pcid == pcid:
+        return pt
+
+    plan = get_transform_plan(plpy, SD, from_pcid, pcid, mapping)
+
+    # deserialize, process and return
+    return plan.apply(PcPoint.from_hex(plan.from_pcformat, pt)).as_hex()
+
+def _transform_patch(plpy, SD, pa, pcid, mapping):
+
+    # extract PCID from PcPatch
+    from_pcid = PcPatch.extract_pcid_from_hex(pa)
+
+    # if From PCID == To PCID, return PcPatch
+    if from_pcid == pcid:
+        return pa
+
+    plan = get_transform_plan(plpy, SD, from_pcid, pcid, mapping)
+
+    from_pcpatch = PcPatch.from_hex(plan.from_pcformat, pa)
+    if from_pcpatch.compression == PcPatch._COMPRESSION_ID[PcPatch.GHT]:
+        plpy.error("Cannot transform PcPatch with GHT compression")
+
+    to_pcpatch = plan.apply_patch(from_pcpatch)
+
+    compression = None
+    if to_pcpatch.compression == PcPatch._COMPRESSION_ID[PcPatch.GHT]:
+        compression = PcPatch.DIMENSIONAL
+
+    return to_pcpatch.as_hex(compression)
+
+def transform_patch(plpy, SD, pa, pcid, mapping, txid):
+    '''
+    transform hex of PcPatch. returns hex of PcPatch
+
+    all points of the PcPatch are transformed at once. the PcPatch is
+    serialized with the compression of the To PcFormat. as GHT cannot be
+    written, dimensional compression is used instead
+    '''
+
+    check_cache_txid(SD, txid)
+
+    return _transform_patch(plpy, SD, pa, pcid, mapping)
+
+def transform_patches(plpy, SD, pas, pcid, mapping, txid):
+    '''
+    transform iterable of hex of PcPatches. generates hex of PcPatches in
+    the same order. NULLs are passed through
+
+    formats and plans are looked up once for all PcPatches using them
+    '''
+
+    check_cache_txid(SD, txid)
+
+    for pa in pas:
+
+        if pa is None:
+            yield None
+            continue
+
+        yield _transform_patch(plpy, SD, pa, pcid, mapping)
+
+def fetch_cursor(plpy, name, batch_size=1000):
+    '''
+    generate the value of each row of cursor returning one column. rows are
+    fetched batch_size at a time
+    '''
+
+    batch_size = int(batch_size)
+    if batch_size < 1:
+        plpy.error("Batch size must be greater than zero")
+
+    query = "FETCH FORWARD {batch_size} FROM {name}".format(
+        batch_size=batch_size,
+        name=plpy.quote_ident(name)
+    )
+
+    while True:
+
+        rows = plpy.execute(query)
+        if len(rows) < 1:
+            break
+
+        for row in rows:
+            if len(row) != 1:
+                plpy.error("Cursor must return one column")
+            yield row.values()[0]
+
+        if len(rows) < batch_size:
+            break
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pgpointcloud_utils import PcInvalidArgException
+from geojson2pgpc.inputs import read_manifest, expand_input_files
+
+class TestInputs(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+        os.mkdir(os.path.join(self.tmp_dir, 'data'))
+        for name in [
+            'a.json', 'b.geojson', 'c.ndjson', 'd.txt', 'data/e.geojsonl',
+            'data/F.GEOJSON', 'data/g.csv'
+        ]:
+            open(self.path(name), 'w').close()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, *names):
+
+        return os.path.join(self.tmp_dir, *names)
+
+    def test_glob(self):
+
+        self.assertEqual(
+            expand_input_files([self.path('[ac].*')]),
+            [self.path('a.json'), self.path('c.ndjson')]
+        )
+
+        with self.assertRaises(PcInvalidArgException):
+            expand_input_files([self.path('*.shp')])
+
+    def test_directory(self):
+
+        # GeoJSON files of directories are found by extension
+        self.assertEqual(
+            expand_input_files([self.path('data'), self.path('d.txt')]),
+            [
+                self.path('data', 'F.GEOJSON'),
+                self.path('data', 'e.geojsonl'),
+                self.path('d.txt')
+            ]
+        )
+
+    def test_dedupe(self):
+
+        # files are returned once in the order found however spelled
+        self.assertEqual(
+            expand_input_files([
+                self.path('b.geojson'),
+                self.path('*'),
+                self.path('data', '..', 'a.json'),
+                self.path('.', 'b.geojson'),
+            ]),
+            [
+                self.path('b.geojson'),
+                self.path('a.json'),
+                self.path('c.ndjson'),
+                self.path('d.txt'),
+                self.path('data', 'F.GEOJSON'),
+                self.path('data', 'e.geojsonl'),
+            ]
+        )
+
+    def test_manifest(self):
+
+        manifest = self.path('data', 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('\n'.join([
+                '# comment',
+                '',
+                '   ',
+                '  ../a.json  ',
+                '*.geojsonl',
+                '#*.GEOJSON',
+                self.path('b.geojson'),
+                ''
+            ]))
+
+        # relative paths are relative to the directory of the manifest
+        entries = read_manifest(manifest)
+        self.assertEqual(entries, [
+            self.path('data', '../a.json'),
+            self.path('data', '*.geojsonl'),
+            self.path('b.geojson'),
+        ])
+
+        self.assertEqual(
+            expand_input_files(entries + [self.path('a.json')]),
+            [
+                self.path('data', '../a.json'),
+                self.path('data', 'e.geojsonl'),
+                self.path('b.geojson'),
+            ]
+        )
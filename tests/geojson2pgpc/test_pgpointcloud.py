@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+import unittest
+import threading
+import binascii
+import struct
+
+import numpy
+
+from pgpointcloud_utils import (
+    PcInvalidArgException, PcRunTimeException, PcFormat
+)
+from geojson2pgpc import pgpointcloud
+from geojson2pgpc.pgpointcloud import (
+    PointBuffer, CopyReader, make_pcpoint_rows, copy_pcpoint_rows,
+    copy_pcpoints, make_wkb_point, pack_wkb_point, make_binary_row,
+    BinaryCopyReader, make_pcpoint_binary_rows, copy_pcpoints_binary,
+    get_connection, release_connection, close_connections,
+    get_utm_coordinates, build_pcpatches
+)
+
+class FakeCursor(object):
+
+    def __init__(self, copied):
+
+        self.copied = copied
+
+    def copy_expert(self, sql, f, size=8192):
+
+        data = []
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                break
+            data.append(chunk)
+
+        self.copied.append((sql, ''.join(data)))
+
+    def copy_from(self, f, table_name, columns=None):
+
+        self.copied.append((table_name, f.read()))
+
+    def execute(self, sql, params=None):
+        pass
+
+    def close(self):
+        pass
+
+class FakeConnection(object):
+
+    def __init__(self):
+
+        self.copied = []
+
+    def cursor(self):
+
+        return FakeCursor(self.copied)
+
+class TestPointBuffer(unittest.TestCase):
+
+    def test_append(self):
+
+        points = PointBuffer(3, capacity=2)
+        for idx in xrange(5):
+            points.append('{"a": %d}' % (idx % 2), [idx, idx * 2., None])
+
+        self.assertEqual(len(points), 5)
+
+        columns = points.columns
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns[0].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(columns[1].tolist(), [0, 2, 4, 6, 8])
+        self.assertTrue(numpy.isnan(columns[2]).all())
+
+        # equal groups are stored once
+        groups = points.groups
+        self.assertEqual(groups, ['{"a": 0}', '{"a": 1}'] * 2 + ['{"a": 0}'])
+        self.assertIs(groups[0], groups[2])
+
+        with self.assertRaises(PcInvalidArgException):
+            points.append('{}', [1., 2.])
+
+    def test_extend(self):
+
+        points = PointBuffer(2, capacity=1)
+        points.append('{}', [-1., -2.])
+        points.extend(['{}', '{}', '{"a": 1}'], numpy.array([
+            [1., 2.],
+            [3., 4.],
+            [5., 6.],
+        ]))
+        points.extend([], numpy.empty(0))
+
+        self.assertEqual(len(points), 4)
+        self.assertEqual(points.columns[0].tolist(), [-1., 1., 3., 5.])
+        self.assertEqual(points.columns[1].tolist(), [-2., 2., 4., 6.])
+        self.assertEqual(points.groups, ['{}', '{}', '{}', '{"a": 1}'])
+
+        with self.assertRaises(PcInvalidArgException):
+            points.extend(['{}'], [[1., 2., 3.]])
+        with self.assertRaises(PcInvalidArgException):
+            points.extend(['{}', '{}'], [[1., 2.]])
+
+        # failed additions leave the buffer as is
+        self.assertEqual(len(points), 4)
+
+    def test_empty(self):
+
+        points = PointBuffer(4)
+        self.assertEqual(len(points), 0)
+        self.assertEqual(len(points.columns), 4)
+        self.assertEqual(points.columns[0].tolist(), [])
+        self.assertEqual(points.groups, [])
+
+class TestCopyRows(unittest.TestCase):
+
+    def test_make_pcpoint_rows(self):
+
+        rows = make_pcpoint_rows(
+            ['0101', '0102'],
+            [{'name': 'a\tb'}, {'name': 'c\\d\ne'}]
+        )
+
+        self.assertEqual(rows.split('\n'), [
+            '0101\t{"name": "a\\\\tb"}',
+            '0102\t{"name": "c\\\\\\\\d\\\\ne"}',
+        ])
+
+        # no rows
+        self.assertEqual(make_pcpoint_rows([], []), '')
+
+    def test_copy_reader(self):
+
+        data = ['a\t1\nb\t2', '', 'c\t3']
+
+        # rows of all strings are ended once whatever the size of reads
+        for size in [-1, 1, 2, 3, 5, 64]:
+            reader = CopyReader(iter(data))
+            chunks = []
+            while True:
+                chunk = reader.read(size)
+                if not chunk:
+                    break
+                if size > 0:
+                    self.assertTrue(len(chunk) <= size)
+                chunks.append(chunk)
+
+            self.assertEqual(''.join(chunks), 'a\t1\nb\t2\nc\t3\n')
+
+        self.assertEqual(CopyReader([]).read(), '')
+
+    def test_copy_reader_lazy(self):
+
+        consumed = []
+
+        def generate():
+            for idx in xrange(3):
+                consumed.append(idx)
+                yield 'row%d' % idx
+
+        reader = CopyReader(generate())
+        self.assertEqual(reader.read(2), 'ro')
+        self.assertEqual(consumed, [0])
+        self.assertEqual(reader.read(5), 'w0\nro')
+        self.assertEqual(consumed, [0, 1])
+
+    def test_copy_pcpoint_rows(self):
+
+        dbconn = FakeConnection()
+        copy_pcpoint_rows(dbconn, 'temp_table', (
+            make_pcpoint_rows([wkb], [{'id': idx}])
+            for idx, wkb in enumerate(['0101', '0102', '0103'])
+        ))
+
+        # all rows in one COPY
+        self.assertEqual(dbconn.copied, [(
+            'COPY temp_table (pt, group_by) FROM STDIN',
+            '0101\t{"id": 0}\n0102\t{"id": 1}\n0103\t{"id": 2}\n'
+        )])
+
+    def test_copy_pcpoints(self):
+
+        dbconn = FakeConnection()
+        wkb_set = ['%04x' % idx for idx in xrange(2500)]
+        copy_pcpoints(dbconn, 'temp_table', wkb_set, {'name': 'a\tb'})
+
+        # rows of all batches in one COPY, group escaped
+        self.assertEqual(len(dbconn.copied), 1)
+        sql, data = dbconn.copied[0]
+        self.assertEqual(sql, 'COPY temp_table (pt, group_by) FROM STDIN')
+        self.assertEqual(data.split('\n'), [
+            wkb + '\t{"name": "a\\\\tb"}' for wkb in wkb_set
+        ] + [''])
+
+        # no rows
+        dbconn = FakeConnection()
+        copy_pcpoints(dbconn, 'temp_table', [], {})
+        self.assertEqual(dbconn.copied[0][1], '')
+
+class TestBinaryCopy(unittest.TestCase):
+
+    HEADER = 'PGCOPY\n\xff\r\n\x00' + '\x00' * 8
+    TRAILER = '\xff\xff'
+
+    def test_pack_wkb_point(self):
+
+        packed = pack_wkb_point(1, 'd d', [1.5, -2.])
+        self.assertEqual(packed, struct.pack('< B I d d', 1, 1, 1.5, -2.))
+        self.assertEqual(
+            binascii.hexlify(packed), make_wkb_point(1, 'd d', [1.5, -2.])
+        )
+
+    def test_make_binary_row(self):
+
+        # number of fields, then length and bytes of each field. NULL is
+        # length -1 without bytes. unicode is UTF-8
+        self.assertEqual(
+            make_binary_row(('abc', None, '', u'\xe9')),
+            '\x00\x04' +
+            '\x00\x00\x00\x03abc' +
+            '\xff\xff\xff\xff' +
+            '\x00\x00\x00\x00' +
+            '\x00\x00\x00\x02\xc3\xa9'
+        )
+
+        self.assertEqual(make_binary_row(()), '\x00\x00')
+
+    def test_binary_copy_reader(self):
+
+        rows = [make_binary_row(('a', None)), make_binary_row(('bc', 'd'))]
+        expected = self.HEADER + ''.join(rows) + self.TRAILER
+
+        for size in [-1, 1, 3, 19, 64]:
+            reader = BinaryCopyReader(iter(rows))
+            chunks = []
+            while True:
+                chunk = reader.read(size)
+                if not chunk:
+                    break
+                if size > 0:
+                    self.assertTrue(len(chunk) <= size)
+                chunks.append(chunk)
+
+            self.assertEqual(''.join(chunks), expected)
+
+        # header and trailer without rows
+        self.assertEqual(
+            BinaryCopyReader([]).read(), self.HEADER + self.TRAILER
+        )
+
+    def test_copy_pcpoints_binary(self):
+
+        wkb_set = [pack_wkb_point(1, 'd', [idx]) for idx in xrange(3)]
+        groups = [{'id': idx} for idx in xrange(3)]
+
+        dbconn = FakeConnection()
+        copy_pcpoints_binary(dbconn, 'temp_table', iter([
+            make_pcpoint_binary_rows(wkb_set[:2], groups[:2]),
+            make_pcpoint_binary_rows(wkb_set[2:], groups[2:]),
+        ]))
+
+        self.assertEqual(dbconn.copied, [(
+            'COPY temp_table (pt, group_by) FROM STDIN WITH (FORMAT binary)',
+            self.HEADER + ''.join([
+                make_binary_row((wkb, '{"id": %d}' % idx))
+                for idx, wkb in enumerate(wkb_set)
+            ]) + self.TRAILER
+        )])
+
+class FakeCopyToCursor(object):
+
+    def __init__(self, data):
+
+        self.data = data
+        self.sql = None
+
+    def copy_expert(self, sql, f, size=8192):
+
+        self.sql = sql
+        f.write(self.data)
+
+class TestUtmCoordinates(unittest.TestCase):
+
+    def test_get_utm_coordinates(self):
+
+        cursor = FakeCopyToCursor('1.5\t-2\n3e2\t4.25\n')
+        x, y = get_utm_coordinates(cursor, 'temp_table')
+
+        self.assertEqual(x.tolist(), [1.5, 300.])
+        self.assertEqual(y.tolist(), [-2., 4.25])
+        self.assertIn('WHERE geom IS NOT NULL', cursor.sql)
+
+        x, y = get_utm_coordinates(FakeCopyToCursor(''), 'temp_table')
+        self.assertEqual(len(x), 0)
+        self.assertEqual(len(y), 0)
+
+    def test_get_utm_coordinates_invalid(self):
+
+        for data in [
+            '1.5\t\\N\n3\t4\n',
+            '1.5\t2\nabc\t4\n',
+            '1.5\t2\n3\n',
+            '1.5\t2\t5\n3\t4\n',
+        ]:
+            with self.assertRaises(PcRunTimeException):
+                get_utm_coordinates(FakeCopyToCursor(data), 'temp_table')
+
+SCHEMA = """<?xml version="1.0" encoding="UTF-8"?>
+<pc:PointCloudSchema xmlns:pc="http://pointcloud.org/schemas/PC/1.1"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <pc:dimension>
+    <pc:position>1</pc:position>
+    <pc:size>4</pc:size>
+    <pc:name>X</pc:name>
+    <pc:interpretation>int32_t</pc:interpretation>
+    <pc:scale>0.01</pc:scale>
+  </pc:dimension>
+  <pc:dimension>
+    <pc:position>2</pc:position>
+    <pc:size>4</pc:size>
+    <pc:name>Y</pc:name>
+    <pc:interpretation>int32_t</pc:interpretation>
+    <pc:scale>0.01</pc:scale>
+  </pc:dimension>
+</pc:PointCloudSchema>
+"""
+
+class TestBuildPcPatches(unittest.TestCase):
+
+    def setUp(self):
+
+        # no proj4text so coordinates are binned as is
+        self.pcformat = PcFormat.import_format(
+            pcid=1, srid=0, schema=SCHEMA
+        )
+
+        x, y = numpy.meshgrid(numpy.arange(20.), numpy.arange(20.))
+        self.columns = [x.ravel(), y.ravel()]
+        self.groups = ['{"a": %d}' % (idx % 2) for idx in xrange(400)]
+
+    def build(self, binary, strategy):
+
+        dbconn = FakeConnection()
+        num_patches = build_pcpatches(
+            dbconn, 'file_table', self.pcformat, self.columns, self.groups,
+            max_points_per_patch=10, buffer_size=3, strategy=strategy,
+            binary=binary
+        )
+
+        return num_patches, dbconn.copied
+
+    def test_num_patches(self):
+
+        for strategy in ['grid', 'quadtree']:
+
+            num_patches, copied = self.build(False, strategy)
+            self.assertTrue(num_patches > 1)
+
+            # text COPY every buffer_size PcPatches
+            self.assertEqual(len(copied), (num_patches + 2) // 3)
+            self.assertEqual(
+                sum(len(data.split('\n')) for table, data in copied),
+                num_patches
+            )
+
+            # all PcPatches in one binary COPY
+            num_binary_patches, copied = self.build(True, strategy)
+            self.assertEqual(num_binary_patches, num_patches)
+            self.assertEqual(len(copied), 1)
+
+        # no points
+        dbconn = FakeConnection()
+        self.assertEqual(build_pcpatches(
+            dbconn, 'file_table', self.pcformat, [[], []], []
+        ), 0)
+        self.assertEqual(dbconn.copied, [])
+
+class FakeThreadedConnectionPool(object):
+
+    def __init__(self, minconn, maxconn, dsn):
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.used = []
+
+    def getconn(self):
+
+        # same limit as psycopg2 pools
+        if len(self.used) >= self.maxconn:
+            raise Exception('connection pool exhausted')
+
+        dbconn = object()
+        self.used.append(dbconn)
+        return dbconn
+
+    def putconn(self, dbconn):
+
+        self.used.remove(dbconn)
+
+    def closeall(self):
+        pass
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+
+        self._pool_class = pgpointcloud.ThreadedConnectionPool
+        pgpointcloud.ThreadedConnectionPool = FakeThreadedConnectionPool
+
+    def tearDown(self):
+
+        close_connections()
+        pgpointcloud.ThreadedConnectionPool = self._pool_class
+
+    def _get_in_thread(self, dsn, pool_size):
+
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(get_connection(dsn, pool_size))
+        )
+        thread.daemon = True
+        thread.start()
+
+        return thread, result
+
+    def test_grow(self):
+
+        dbconn1 = get_connection('dsn', 1)
+
+        # larger pool_size grows the pool instead of waiting forever
+        thread, result = self._get_in_thread('dsn', 2)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        dbconn2 = result[0]
+        self.assertIsNot(dbconn1, dbconn2)
+
+        # smaller pool_size does not shrink the pool. waits until a
+        # connection is released
+        thread, result = self._get_in_thread('dsn', 1)
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+
+        release_connection('dsn', dbconn1)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(result), 1)
+
+        release_connection('dsn', dbconn2)
+        release_connection('dsn', result[0])
+
+    def test_grow_wakes_waiting(self):
+
+        dbconn = get_connection('dsn', 1)
+
+        thread, result = self._get_in_thread('dsn', 1)
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+
+        # growing the pool makes connections available to waiting callers
+        other = get_connection('dsn', 3)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(result), 1)
+
+        for dbconn in (dbconn, other, result[0]):
+            release_connection('dsn', dbconn)
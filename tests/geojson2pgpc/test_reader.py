@@ -0,0 +1,105 @@
+import unittest
+from cStringIO import StringIO
+
+import simplejson as json
+
+from pgpointcloud_utils import PcInvalidArgException
+from geojson2pgpc.reader import GeoJSONReader, RS
+
+def make_feature(idx):
+
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [idx, idx * 2.]},
+        'properties': {'name': 'feature %d' % idx, 'value': idx},
+    }
+
+class TestGeoJSONReader(unittest.TestCase):
+
+    def setUp(self):
+        super(TestGeoJSONReader, self).setUp()
+
+        self.features = [make_feature(idx) for idx in xrange(10)]
+
+    def read(self, data, chunk_size=None):
+
+        reader = GeoJSONReader(StringIO(data), chunk_size=chunk_size)
+        return reader, list(reader.features())
+
+    def test_feature_collection(self):
+
+        data = json.dumps({
+            'type': 'FeatureCollection',
+            'properties': {'source': 'test'},
+            'features': self.features,
+        }, indent=2)
+
+        # features and tokens split across chunks of any size
+        for chunk_size in [1, 2, 3, 7, 64, len(data)]:
+
+            reader, features = self.read(data, chunk_size)
+            self.assertEqual(features, self.features)
+            self.assertEqual(reader.members['type'], 'FeatureCollection')
+            self.assertEqual(reader.members['properties'], {'source': 'test'})
+
+    def test_members_after_features(self):
+
+        data = '{"features": %s, "type": "FeatureCollection", "properties": {"source": "test"}}' % (
+            json.dumps(self.features[:2])
+        )
+
+        reader = GeoJSONReader(StringIO(data), chunk_size=5)
+        features = reader.features()
+
+        self.assertEqual(next(features), self.features[0])
+        self.assertNotIn('properties', reader.members)
+
+        self.assertEqual(list(features), self.features[1:2])
+        self.assertEqual(reader.members['properties'], {'source': 'test'})
+
+    def test_empty_feature_collection(self):
+
+        reader, features = self.read('{"type": "FeatureCollection", "features": [ ]}')
+        self.assertEqual(features, [])
+        self.assertEqual(reader.members['type'], 'FeatureCollection')
+
+        reader, features = self.read('')
+        self.assertEqual(features, [])
+
+    def test_sequence(self):
+
+        # GeoJSONSeq with record separators
+        data = ''.join(
+            RS + json.dumps(feat) + '\n' for feat in self.features
+        )
+        for chunk_size in [1, 5, 64]:
+            reader, features = self.read(data, chunk_size)
+            self.assertEqual(features, self.features)
+
+        # newline-delimited with blank lines
+        data = '\n\n'.join(json.dumps(feat) for feat in self.features)
+        reader, features = self.read('\r\n' + data + '\n\n', 4)
+        self.assertEqual(features, self.features)
+        self.assertEqual(reader.members, {})
+
+    def test_invalid(self):
+
+        data = json.dumps({
+            'type': 'FeatureCollection',
+            'features': self.features[:2],
+        })
+
+        for invalid in [
+            # truncated
+            data[:-1],
+            data[:len(data) // 2],
+            # not JSON
+            '{"type": "FeatureCollection", "features": [} ',
+            '[1, 2]',
+            '{1: 2}',
+            # not features
+            json.dumps({'type': 'Point', 'coordinates': [1, 2]}),
+        ]:
+
+            with self.assertRaises(PcInvalidArgException):
+                self.read(invalid, 8)
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pgpointcloud_utils import PcInvalidArgException
+from ogr2pgpc.inputs import read_manifest, expand_input_files
+
+class TestInputs(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+        os.mkdir(os.path.join(self.tmp_dir, 'shapes'))
+        for name in ['a.gpkg', 'b.csv', 'shapes/c.shp', 'shapes/c.dbf']:
+            open(self.path(name), 'w').close()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, *names):
+
+        return os.path.join(self.tmp_dir, *names)
+
+    def test_glob(self):
+
+        # directories are kept as is
+        self.assertEqual(
+            expand_input_files([self.path('*')]),
+            [self.path('a.gpkg'), self.path('b.csv'), self.path('shapes')]
+        )
+
+        with self.assertRaises(PcInvalidArgException):
+            expand_input_files([self.path('*.kml')])
+
+    def test_dedupe(self):
+
+        self.assertEqual(
+            expand_input_files([
+                self.path('shapes', 'c.shp'),
+                self.path('shapes', '..', 'shapes', 'c.shp'),
+                self.path('.', 'a.gpkg'),
+                self.path('*.gpkg'),
+            ]),
+            [self.path('shapes', 'c.shp'), self.path('.', 'a.gpkg')]
+        )
+
+    def test_manifest(self):
+
+        manifest = self.path('shapes', 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write('\n'.join([
+                '# comment',
+                '',
+                '  *.shp  ',
+                '../b.csv',
+                self.path('a.gpkg'),
+                '\t',
+            ]))
+
+        # relative paths are relative to the directory of the manifest
+        entries = read_manifest(manifest)
+        self.assertEqual(entries, [
+            self.path('shapes', '*.shp'),
+            self.path('shapes', '../b.csv'),
+            self.path('a.gpkg'),
+        ])
+
+        self.assertEqual(
+            expand_input_files(entries + [self.path('b.csv')]),
+            [
+                self.path('shapes', 'c.shp'),
+                self.path('shapes', '../b.csv'),
+                self.path('a.gpkg'),
+            ]
+        )
@@ -0,0 +1,188 @@
+import unittest
+import threading
+import time
+
+try:
+    from ogr2pgpc import library, pgpointcloud
+except ImportError:
+    library = None
+
+class FakeConnection(object):
+
+    def __init__(self):
+
+        self.committed = False
+
+    def commit(self):
+
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+class FakeThreadedConnectionPool(object):
+
+    def __init__(self, minconn, maxconn, dsn):
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.used = []
+
+    def getconn(self):
+
+        # same limit as psycopg2 pools
+        if len(self.used) >= self.maxconn:
+            raise Exception('connection pool exhausted')
+
+        dbconn = FakeConnection()
+        self.used.append(dbconn)
+        return dbconn
+
+    def putconn(self, dbconn):
+
+        self.used.remove(dbconn)
+
+    def closeall(self):
+        pass
+
+class FakeOgr(object):
+
+    @staticmethod
+    def Open(input_file, update=False):
+
+        return object()
+
+@unittest.skipIf(library is None, 'ogr2pgpc.library cannot be imported')
+class TestConvertLayersConcurrently(unittest.TestCase):
+
+    def setUp(self):
+
+        self._saved = []
+
+        self.converted = []
+        self.failing = set()
+
+        def convert_layer(layer, pcid, fields, file_table, dbconn):
+            time.sleep(0.01)
+            if layer in self.failing:
+                raise Exception('layer %s failed' % layer)
+            self.converted.append((layer, dbconn))
+
+        config = dict(library.Config)
+        config.update({
+            'dsn': 'dsn',
+            'input_file': 'input',
+            'layer_concurrency': 2,
+            'commit_barrier': True
+        })
+
+        self.patch(library, 'Config', config)
+        self.patch(library, 'ogr', FakeOgr)
+        self.patch(
+            library, 'get_layer', lambda dsin, layer_ref, filtered: layer_ref
+        )
+        self.patch(library, 'convert_layer', convert_layer)
+        self.patch(
+            pgpointcloud, 'ThreadedConnectionPool', FakeThreadedConnectionPool
+        )
+
+    def tearDown(self):
+
+        pgpointcloud.close_connections()
+
+        for obj, name, value in reversed(self._saved):
+            setattr(obj, name, value)
+
+    def patch(self, obj, name, value):
+
+        self._saved.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def test_get_pool_size(self):
+
+        config = {'pool_size': 1, 'layer_concurrency': 2}
+        self.assertEqual(library.get_pool_size(config, 4), 3)
+
+        config['commit_barrier'] = True
+        self.assertEqual(library.get_pool_size(config, 4), 5)
+        self.assertEqual(library.get_pool_size(config, 1), 3)
+
+        config['pool_size'] = 8
+        self.assertEqual(library.get_pool_size(config, 4), 8)
+
+        config['layer_concurrency'] = 1
+        self.assertEqual(library.get_pool_size(config, 4), 8)
+
+    def test_commit_barrier(self):
+
+        # connection of the file, held while layers are imported
+        file_dbconn = library.open_db_connection('dsn')
+
+        # more layers than layer_concurrency. layers hold their connections
+        # until all are imported
+        layers = range(4)
+        thread = threading.Thread(
+            target=library.convert_layers_concurrently,
+            args=(layers, False, 1, {}, 'table')
+        )
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(
+            sorted(layer for layer, dbconn in self.converted), layers
+        )
+
+        # all layers committed on their own connections
+        dbconns = set(dbconn for layer, dbconn in self.converted)
+        self.assertEqual(len(dbconns), 4)
+        self.assertTrue(all(dbconn.committed for dbconn in dbconns))
+        self.assertNotIn(file_dbconn, dbconns)
+
+        library.close_db_connection('dsn', file_dbconn)
+
+    def test_commit_barrier_drops_table(self):
+
+        class FakeDataSource(object):
+
+            name = 'input.gpkg'
+
+            def GetLayerCount(self):
+                return 4
+
+        dropped = []
+
+        self.patch(library, 'DSIn', FakeDataSource())
+        self.patch(library, 'DBConn', FakeConnection())
+        self.patch(library, 'interpret_fields', lambda layer: {})
+        self.patch(library, 'get_pcid', lambda layer, fields: 1)
+        self.patch(
+            library, 'create_pcpatch_table',
+            lambda dbconn, table_name, action: None
+        )
+        self.patch(
+            library, 'drop_pcpatch_table',
+            lambda dbconn, table_name: dropped.append(table_name)
+        )
+
+        # a layer fails after the table is committed
+        self.failing.add(2)
+
+        for action, expected in [
+            ('create', ['"input"']),
+            ('drop', ['"input"']),
+            ('append', [])
+        ]:
+
+            del dropped[:]
+            library.DBConn.committed = False
+            library.Config['table_action'] = action
+
+            with self.assertRaises(library.PcRunTimeException):
+                library.convert_file()
+
+            self.assertEqual(dropped, expected)
+            self.assertTrue(library.DBConn.committed)
+
+            pgpointcloud.close_connections()
@@ -0,0 +1,81 @@
+import unittest
+
+import numpy
+from pyparsing import ParseException
+
+from pgpointcloud_utils.numeric_string_parser import NumericStringParser
+
+class TestNumericStringParser(unittest.TestCase):
+
+    def setUp(self):
+        super(TestNumericStringParser, self).setUp()
+
+        self.nsp = NumericStringParser()
+
+    def test_eval(self):
+
+        self.assertEqual(self.nsp.eval('2^4'), 16)
+        self.assertEqual(self.nsp.eval('-3 + abs(-2) * 4'), 5)
+        self.assertEqual(self.nsp.eval('round(2.5)'), 3)
+
+    def test_compile(self):
+
+        func = self.nsp.compile('$a * 2 + $b_1 ^ 2')
+        self.assertEqual(func({'a': 1, 'b_1': 3}), 11)
+        self.assertEqual(func({'a': -1, 'b_1': 2}), 2)
+
+        func = self.nsp.compile('sgn($1 - $10)')
+        self.assertEqual(func({'1': 4, '10': 5}), -1)
+
+    def test_compile_resolve(self):
+
+        names = ['X', 'Y']
+        func = self.nsp.compile('$X / $Y', resolve=names.index)
+        self.assertEqual(func([1, 4]), 0.25)
+
+        with self.assertRaises(ValueError):
+            self.nsp.compile('$X / $Z', resolve=names.index)
+
+    def test_compile_vectorize(self):
+
+        values = {
+            'a': numpy.array([-2.5, -1.2, 0., 0.5, 1.5, 3.7]),
+            'b': numpy.array([2, 3, 1, 2, 16, 65535], dtype=numpy.uint16),
+        }
+
+        for expr in [
+            '$a * $b - 1',
+            '$b ^ -1',
+            '2 ^ ($b / 4096) + $a ^ 2',
+            '-$a / $b',
+            'sin($a) + cos($a) - tan($a)',
+            'abs($a) + trunc($a) + round($a) + sgn($a)',
+            '$b * $b',
+        ]:
+            func = self.nsp.compile(expr)
+            vfunc = self.nsp.compile(expr, vectorize=True)
+
+            expected = [
+                func({'a': a, 'b': b})
+                for a, b in zip(values['a'].tolist(), values['b'].tolist())
+            ]
+            numpy.testing.assert_allclose(vfunc(values), expected)
+
+        # no variables
+        vfunc = self.nsp.compile('round(2.5) * 2', vectorize=True)
+        self.assertEqual(vfunc({}), 6)
+
+    def test_compile_invalid(self):
+
+        with self.assertRaises(ParseException):
+            self.nsp.compile('$X +')
+
+    def test_parse_cache(self):
+
+        stack = self.nsp.parse('1 + $X')
+        self.assertIs(NumericStringParser().parse('1 + $X'), stack)
+
+        # prefix parse is not served to callers parsing all of the text
+        self.nsp.parse('1 + 2 )', parseAll=False)
+        with self.assertRaises(ParseException):
+            self.nsp.parse('1 + 2 )')
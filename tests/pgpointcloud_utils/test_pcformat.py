@@ -1,6 +1,8 @@
 import unittest
 import struct
 
+import numpy
+
 from pgpointcloud_utils import PcDimension, PcFormat
 
 class TestPcDimension(unittest.TestCase):
@@ -191,3 +193,49 @@ class TestPcFormat(unittest.TestCase):
         self.assertEqual(pcformat.get_dimension_index('Y'), 1)
         self.assertEqual(pcformat.get_dimension_index('Z'), 2)
         self.assertEqual(pcformat.get_dimension_index('Intensity'), 3)
+
+    def test_get_struct(self):
+
+        pcformat = PcFormat.import_format(
+            pcid=1,
+            srid=4326,
+            schema=self.schema
+        )
+
+        s = pcformat.get_struct(is_ndr=True)
+        self.assertIsInstance(s, struct.Struct)
+        self.assertEqual(s.format, '< B I i i i H')
+        self.assertIs(pcformat.get_struct(is_ndr=True), s)
+
+        s = pcformat.get_struct(is_ndr=False, with_header=False)
+        self.assertEqual(s.format, '> i i i H')
+        self.assertIs(pcformat.get_struct(is_ndr=False, with_header=False), s)
+
+        # reassigning dimensions invalidates cached structs
+        pcformat.dimensions = pcformat.dimensions[:2]
+        s = pcformat.get_struct(is_ndr=True)
+        self.assertEqual(s.format, '< B I i i')
+
+    def test_get_dtype(self):
+
+        pcformat = PcFormat.import_format(
+            pcid=1,
+            srid=4326,
+            schema=self.schema
+        )
+
+        dtype = pcformat.get_dtype(is_ndr=True)
+        self.assertEqual(dtype.names, ('X', 'Y', 'Z', 'Intensity'))
+        self.assertEqual(dtype['X'], numpy.dtype('<i4'))
+        self.assertEqual(dtype['Intensity'], numpy.dtype('<u2'))
+        self.assertEqual(dtype.itemsize, pcformat.get_struct(True, False).size)
+        self.assertIs(pcformat.get_dtype(is_ndr=True), dtype)
+
+        dtype = pcformat.get_dtype(is_ndr=False)
+        self.assertEqual(dtype['Y'], numpy.dtype('>i4'))
+
+        data = struct.pack('< i i i H i i i H', 1, 2, 3, 4, 5, 6, 7, 8)
+        points = numpy.frombuffer(data, dtype=pcformat.get_dtype(True))
+        self.assertEqual(points['Z'].tolist(), [3, 7])
+
+        self.assertEqual(pcformat.scales.tolist(), [0.01, 0.01, 0.01, 1.])
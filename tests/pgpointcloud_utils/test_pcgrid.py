@@ -0,0 +1,97 @@
+import unittest
+
+import numpy
+
+from pgpointcloud_utils import pcgrid, PcInvalidArgException
+
+class TestPcGrid(unittest.TestCase):
+
+    def test_utm_srid(self):
+
+        self.assertEqual(pcgrid.utm_srid(-127., 45.), 32609)
+        self.assertEqual(pcgrid.utm_srid(151.2, -33.9), 32756)
+        self.assertEqual(pcgrid.utm_srid(-180., 1.), 32601)
+
+    def test_snap_to_grid(self):
+
+        x = numpy.array([0., 4.9, 5., 15., 24.9])
+        y = numpy.array([100., 96., 95., 85., 70.])
+
+        cols, rows = pcgrid.snap_to_grid(x, y, 0., 100., 10.)
+
+        # same as ST_SnapToGrid, ties go to the even cell
+        self.assertEqual(cols.tolist(), [0, 0, 0, 2, 2])
+        self.assertEqual(rows.tolist(), [0, 0, 0, -2, -3])
+
+        with self.assertRaises(PcInvalidArgException):
+            pcgrid.snap_to_grid(x, y, 0., 100., 0)
+
+    def test_group_cells(self):
+
+        cols = numpy.array([1, 0, 1, -1, 0, 1])
+        rows = numpy.array([0, 5, 0, 2, 5, 1])
+
+        cells = pcgrid.group_cells(cols, rows)
+        self.assertEqual(
+            sorted(cell.tolist() for cell in cells),
+            [[0, 2], [1, 4], [3], [5]]
+        )
+        self.assertEqual(
+            sorted(pcgrid.count_cells(cols, rows).tolist()), [1, 1, 2, 2]
+        )
+
+        self.assertEqual(
+            pcgrid.group_cells(numpy.array([]), numpy.array([])), []
+        )
+
+    def test_compute_patch_size(self):
+
+        rng = numpy.random.RandomState(0)
+        x = rng.uniform(0., 1000., 5000)
+        y = rng.uniform(0., 1000., 5000)
+
+        for max_points in (50, 400):
+
+            patch_size = pcgrid.compute_patch_size(x, y, max_points)
+            self.assertGreater(patch_size, 0)
+
+            ulx, uly, lrx, lry = pcgrid.get_extent(x, y)
+            cols, rows = pcgrid.snap_to_grid(x, y, ulx, uly, patch_size)
+            self.assertLessEqual(
+                pcgrid.count_cells(cols, rows).max(), max_points
+            )
+
+        # all points at one location
+        self.assertEqual(
+            pcgrid.compute_patch_size(numpy.zeros(10), numpy.zeros(10)), 100
+        )
+
+    def test_quadtree_cells(self):
+
+        rng = numpy.random.RandomState(0)
+
+        # dense cluster in sparse background
+        x = numpy.concatenate((
+            rng.normal(500., 5., 3000), rng.uniform(0., 1000., 1000)
+        ))
+        y = numpy.concatenate((
+            rng.normal(500., 5., 3000), rng.uniform(0., 1000., 1000)
+        ))
+
+        cells = pcgrid.quadtree_cells(x, y, 400)
+        sizes = [len(cell) for cell in cells]
+        self.assertLessEqual(max(sizes), 400)
+        self.assertEqual(
+            sorted(numpy.concatenate(cells).tolist()), range(len(x))
+        )
+        for cell in cells:
+            self.assertTrue((numpy.diff(cell) > 0).all())
+
+        # points at the same location are chunked
+        cells = pcgrid.quadtree_cells(numpy.ones(10), numpy.ones(10), 4)
+        self.assertEqual([len(cell) for cell in cells], [4, 4, 2])
+
+        self.assertEqual(pcgrid.quadtree_cells([], [], 4), [])
+
+        with self.assertRaises(PcInvalidArgException):
+            pcgrid.quadtree_cells(x, y, 0)
@@ -0,0 +1,240 @@
+import unittest
+import struct
+import binascii
+import zlib
+
+import numpy
+
+from pgpointcloud_utils import PcDimension, PcFormat, PcPatch, PcPoint
+from pgpointcloud_utils import pcbytes
+
+class TestPcPatch(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPcPatch, self).setUp()
+
+        self.schema = """<?xml version="1.0" encoding="UTF-8"?>
+<pc:PointCloudSchema xmlns:pc="http://pointcloud.org/schemas/PC/1.1" 
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <pc:dimension>
+    <pc:position>1</pc:position>
+    <pc:size>4</pc:size>
+    <pc:name>X</pc:name>
+    <pc:interpretation>int32_t</pc:interpretation>
+    <pc:scale>0.01</pc:scale>
+  </pc:dimension>
+  <pc:dimension>
+    <pc:position>2</pc:position>
+    <pc:size>4</pc:size>
+    <pc:name>Y</pc:name>
+    <pc:interpretation>int32_t</pc:interpretation>
+    <pc:scale>0.01</pc:scale>
+  </pc:dimension>
+  <pc:dimension>
+    <pc:position>3</pc:position>
+    <pc:size>4</pc:size>
+    <pc:name>Z</pc:name>
+    <pc:interpretation>int32_t</pc:interpretation>
+    <pc:scale>0.01</pc:scale>
+  </pc:dimension>
+  <pc:dimension>
+    <pc:position>4</pc:position>
+    <pc:size>2</pc:size>
+    <pc:name>Intensity</pc:name>
+    <pc:interpretation>uint16_t</pc:interpretation>
+    <pc:scale>1</pc:scale>
+  </pc:dimension>
+  <pc:metadata>
+    <Metadata name="compression">dimensional</Metadata>
+  </pc:metadata>
+</pc:PointCloudSchema>
+"""
+
+        self.pcid = 1
+        self.srid = 4326
+
+        self.pcformat = PcFormat.import_format(
+            pcid=self.pcid,
+            srid=self.srid,
+            schema=self.schema
+        )
+
+        self.raw_points = [
+            (-12700, 4500, 12400, 4),
+            (-12701, 4501, 12400, 5),
+            (-12702, 4502, 12401, 6),
+        ]
+
+    def build_uncompressed(self, is_ndr=True):
+
+        endian = '<' if is_ndr else '>'
+
+        data = struct.pack(
+            endian + 'B I I I',
+            1 if is_ndr else 0, self.pcid, 0, len(self.raw_points)
+        )
+        for raw in self.raw_points:
+            data += struct.pack(endian + 'i i i H', *raw)
+
+        return data
+
+    def test_extract_header_from_binary(self):
+
+        data = self.build_uncompressed()
+        self.assertEqual(PcPatch.extract_pcid_from_binary(data), self.pcid)
+        self.assertEqual(PcPatch.extract_compression_from_binary(data), 0)
+        self.assertEqual(PcPatch.extract_npoints_from_binary(data), 3)
+
+    def test_from_binary_uncompressed(self):
+
+        for is_ndr in [True, False]:
+
+            pa = PcPatch.from_binary(
+                self.pcformat, self.build_uncompressed(is_ndr)
+            )
+            self.assertIsInstance(pa, PcPatch)
+            self.assertEqual(pa.npoints, 3)
+            self.assertEqual(pa.compression, 0)
+
+            self.assertEqual(
+                pa.get_raw_values('X').tolist(), [-12700, -12701, -12702]
+            )
+            self.assertEqual(pa.get_values(4).tolist(), [4, 5, 6])
+            for actual, expected in zip(
+                pa.get_values('Y').tolist(), [45., 45.01, 45.02]
+            ):
+                self.assertAlmostEqual(actual, expected)
+
+    def test_as_hex(self):
+
+        data = self.build_uncompressed()
+        pa = PcPatch.from_binary(self.pcformat, data)
+        self.assertEqual(pa.as_binary(), data)
+
+        pa = PcPatch.from_binary(self.pcformat, self.build_uncompressed(False))
+        self.assertEqual(pa.as_hex(), binascii.hexlify(data))
+
+    def test_set_values(self):
+
+        pa = PcPatch.from_binary(self.pcformat, self.build_uncompressed())
+        pa.set_values('X', [-128., -128.01, -128.02])
+        self.assertEqual(
+            pa.get_raw_values('X').tolist(), [-12800, -12801, -12802]
+        )
+
+        with self.assertRaises(Exception):
+            pa.set_values('X', [1.])
+
+    def test_points(self):
+
+        pa = PcPatch.from_binary(self.pcformat, self.build_uncompressed())
+        points = pa.points
+        self.assertEqual(len(points), 3)
+        for pt, raw in zip(points, self.raw_points):
+            self.assertIsInstance(pt, PcPoint)
+            self.assertEqual(pt._raw_values, list(raw))
+
+    def test_from_binary_dimensional(self):
+
+        # X: none, Y: rle, Z: zlib, Intensity: sigbits
+        data = struct.pack('< B I I I', 1, self.pcid, 2, 3)
+        data += struct.pack('< B I 3i', 0, 12, -12700, -12701, -12702)
+        data += struct.pack(
+            '< B I B i B i B i', 1, 15, 1, 4500, 1, 4501, 1, 4502
+        )
+        body = zlib.compress(struct.pack('< 3i', 12400, 12400, 12401))
+        data += struct.pack('< B I', 3, len(body)) + body
+        # 4, 5, 6 => 2 unique bits (00, 01, 10) and common value 4
+        data += struct.pack('< B I H H H', 2, 6, 2, 4, 0x1800)
+
+        pa = PcPatch.from_binary(self.pcformat, data)
+        self.assertEqual(pa.npoints, 3)
+        self.assertEqual(pa.compression, 2)
+        for idx, raw in enumerate(zip(*self.raw_points)):
+            self.assertEqual(pa.get_raw_values(idx + 1).tolist(), list(raw))
+
+    def test_as_binary_dimensional(self):
+
+        pa = PcPatch.from_binary(self.pcformat, self.build_uncompressed())
+        data = pa.as_binary(PcPatch.DIMENSIONAL)
+        self.assertEqual(PcPatch.extract_compression_from_binary(data), 2)
+
+        dpa = PcPatch.from_binary(self.pcformat, data)
+        for idx in xrange(len(self.pcformat.dimensions)):
+            self.assertEqual(
+                dpa.get_raw_values(idx + 1).tolist(),
+                pa.get_raw_values(idx + 1).tolist()
+            )
+
+        # format with dimensional compression defaults to dimensional
+        self.assertEqual(dpa.as_binary(), data)
+
+class TestPcBytes(unittest.TestCase):
+
+    def test_sigbits(self):
+
+        dim = PcDimension(name='a', size=2, interpretation='uint16_t')
+
+        # 10, 11, 12, 13 => 3 unique bits and common value 8
+        data = pcbytes.encode(dim, [10, 11, 12, 13], pcbytes.SIGBITS)
+        self.assertEqual(
+            data,
+            struct.pack('< B I H H H', pcbytes.SIGBITS, 6, 3, 8, 0x4E50)
+        )
+
+        values, offset = pcbytes.decode(dim, 4, data)
+        self.assertEqual(values.tolist(), [10, 11, 12, 13])
+        self.assertEqual(offset, len(data))
+
+        # XDR
+        data = struct.pack('> B I H H H', pcbytes.SIGBITS, 6, 3, 8, 0x4E50)
+        values, offset = pcbytes.decode(dim, 4, data, is_ndr=False)
+        self.assertEqual(values.tolist(), [10, 11, 12, 13])
+
+    def test_roundtrip(self):
+
+        rng = numpy.random.RandomState(0)
+
+        for interpretation in [
+            'int8_t', 'uint8_t', 'int16_t', 'uint16_t', 'int32_t',
+            'uint32_t', 'int64_t', 'uint64_t', 'float', 'double'
+        ]:
+            size = PcDimension.INTERPRETATION_MAPPING[interpretation]['size']
+            dim = PcDimension(
+                name='a', size=size, interpretation=interpretation
+            )
+            dtype = numpy.dtype(dim.struct_format)
+
+            samples = [
+                numpy.zeros(0, dtype=dtype),
+                numpy.full(600, 7, dtype=dtype),
+                rng.randint(0, 100, 400).astype(dtype),
+                numpy.repeat(rng.randint(0, 100, 40), 10).astype(dtype),
+            ]
+
+            for values in samples:
+                for compression in pcbytes.COMPRESSION:
+                    data = pcbytes.encode(dim, values, compression)
+                    decoded, offset = pcbytes.decode(dim, len(values), data)
+                    self.assertEqual(offset, len(data))
+                    self.assertEqual(decoded.dtype, dtype)
+                    self.assertEqual(decoded.tolist(), values.tolist())
+
+    def test_suggest_compression(self):
+
+        dim = PcDimension(name='a', size=4, interpretation='int32_t')
+
+        self.assertEqual(
+            pcbytes.suggest_compression(dim, numpy.full(400, 7, 'i')),
+            pcbytes.RLE
+        )
+        self.assertEqual(
+            pcbytes.suggest_compression(dim, numpy.arange(400, dtype='i')),
+            pcbytes.SIGBITS
+        )
+
+        dim = PcDimension(name='a', size=8, interpretation='double')
+        self.assertEqual(
+            pcbytes.suggest_compression(dim, numpy.linspace(0., 1., 400)),
+            pcbytes.ZLIB
+        )
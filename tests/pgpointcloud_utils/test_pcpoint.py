@@ -1,7 +1,7 @@
 import unittest
 import struct
 
-from pgpointcloud_utils import PcDimension, PcFormat, PcPoint
+from pgpointcloud_utils import PcDimension, PcFormat, PcPatch, PcPoint
 
 class TestPcPoint(unittest.TestCase):
 
@@ -90,11 +90,56 @@ class TestPcPoint(unittest.TestCase):
         self.assertEqual(pt.pcformat.pcid, self.pcid)
         self.assertEqual(len(pt.values), len(self.pcformat.dimensions))
 
+    def test_from_hex_batch(self):
+
+        pts = [
+            PcPoint.from_hex(pcformat=self.pcformat, hexstr=self.hexstr)
+            for idx in xrange(3)
+        ]
+        pts[1].set_value('Intensity', 5.)
+        pts[2].set_value('X', -128.)
+
+        columns = PcPoint.from_hex_batch(
+            self.pcformat, [pt.as_hex() for pt in pts]
+        )
+        self.assertEqual(len(columns), len(self.pcformat.dimensions))
+        for idx in xrange(len(pts)):
+            for column, value in zip(columns, pts[idx].values):
+                self.assertAlmostEqual(column[idx], value)
+
+        columns = PcPoint.from_binary_batch(
+            self.pcformat, (pt.as_binary() for pt in pts)
+        )
+        self.assertEqual(columns[3].tolist(), [4, 5, 4])
+
+        # different PCID
+        pt = pts[0].copy()
+        pt.pcformat = PcFormat(pcid=2, dimensions=self.pcformat.dimensions)
+        with self.assertRaises(Exception):
+            PcPoint.from_hex_batch(self.pcformat, [self.hexstr, pt.as_hex()])
+
     def test_as_hex(self):
 
         pt = PcPoint.from_hex(pcformat=self.pcformat, hexstr=self.hexstr)
         self.assertEqual(pt.as_hex().upper(), self.hexstr)
 
+    def test_as_binary_rounding(self):
+
+        # 0.29 / 0.01 is 28.999... and is rounded as in PcPatches
+        pt = PcPoint(self.pcformat, values=[-127.01, 45.07, 0.29, 4])
+        pa = PcPatch(
+            self.pcformat, values=[[value] for value in pt.values]
+        )
+
+        self.assertEqual(
+            pt.as_binary()[5:],
+            pa.as_binary(PcPatch.UNCOMPRESSED)[13:]
+        )
+        self.assertEqual(
+            PcPoint.from_binary(self.pcformat, pt.as_binary()).get_value('Z'),
+            0.29
+        )
+
     def test_get_value(self):
 
         pt = PcPoint.from_hex(pcformat=self.pcformat, hexstr=self.hexstr)
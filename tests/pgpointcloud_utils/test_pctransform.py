@@ -0,0 +1,158 @@
+import unittest
+
+import numpy
+
+from pgpointcloud_utils import (
+    PcDimension, PcFormat, PcPatch, PcPoint, PcTransformPlan,
+    PcInvalidArgException
+)
+
+class TestPcTransformPlan(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPcTransformPlan, self).setUp()
+
+        self.from_pcformat = PcFormat(pcid=1, srid=4326, dimensions=[
+            PcDimension(name='X', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Y', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Z', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Intensity', size=2, interpretation='uint16_t'),
+        ])
+        self.from_pcformat.proj4text = '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs '
+
+        self.to_pcformat = PcFormat(pcid=2, srid=4326, dimensions=[
+            PcDimension(name='X', size=8, interpretation='double'),
+            PcDimension(name='Y', size=8, interpretation='double'),
+            PcDimension(name='Z', size=8, interpretation='double'),
+            PcDimension(name='Intensity', size=2, interpretation='uint16_t'),
+            PcDimension(name='Reflectivity', size=8, interpretation='double'),
+        ])
+
+        self.mapping = {
+            'X': 1,
+            2: None,
+            'Z': 'Z',
+            4: 'Intensity',
+            'Reflectivity': {
+                'expression': '$Intensity * 2 + $3'
+            }
+        }
+
+        self.columns = [
+            numpy.array([-127., -127.01, -127.02]),
+            numpy.array([45., 45.01, 45.02]),
+            numpy.array([124., 124., 124.01]),
+            numpy.array([4, 5, 6]),
+        ]
+
+    def test_invalid_mapping(self):
+
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, [])
+
+        mapping = dict(self.mapping)
+        del mapping['Reflectivity']
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+
+        mapping = dict(self.mapping)
+        mapping['Reflectivity'] = 'Unknown'
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+
+        mapping = dict(self.mapping)
+        mapping['Reflectivity'] = {'unknown': 1}
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+
+        mapping['Reflectivity'] = {'expression': '$Unknown * 2'}
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+
+        mapping['Reflectivity'] = {'expression': '$Intensity *'}
+        with self.assertRaises(PcInvalidArgException):
+            PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+
+    def test_apply(self):
+
+        plan = PcTransformPlan(
+            self.from_pcformat, self.to_pcformat, self.mapping
+        )
+
+        pt = PcPoint(self.from_pcformat, values=[-127., 45., 124., 4.])
+        tpt = plan.apply(pt)
+        self.assertEqual(tpt.pcformat, self.to_pcformat)
+        for actual, expected in zip(tpt.values, [-127., 45., 124., 4., 132.]):
+            self.assertAlmostEqual(actual, expected)
+
+        # plan is reusable
+        pt = PcPoint(self.from_pcformat, values=[-128., 46., 125., 5.])
+        tpt = plan.apply(pt)
+        self.assertAlmostEqual(tpt.get_value('Reflectivity'), 135.)
+
+    def test_apply_columns(self):
+
+        plan = PcTransformPlan(
+            self.from_pcformat, self.to_pcformat, self.mapping
+        )
+
+        columns = plan.apply_columns(self.columns)
+        self.assertEqual(len(columns), len(self.to_pcformat.dimensions))
+        for actual, expected in zip(columns[:4], self.columns):
+            self.assertEqual(actual.tolist(), expected.tolist())
+        numpy.testing.assert_allclose(columns[4], [132., 134., 136.01])
+
+        mapping = dict(self.mapping)
+        mapping['Reflectivity'] = {
+            'expression': 'round($X) * sgn($Y - 45.005) - 2 ^ 3'
+        }
+        plan = PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+        columns = plan.apply_columns(self.columns)
+        numpy.testing.assert_allclose(columns[4], [119., -135., -135.])
+
+        mapping['Reflectivity'] = {'expression': 'PI'}
+        plan = PcTransformPlan(self.from_pcformat, self.to_pcformat, mapping)
+        columns = plan.apply_columns(self.columns)
+        numpy.testing.assert_allclose(columns[4], [numpy.pi] * 3)
+
+    def test_apply_patch(self):
+
+        pa = PcPatch(self.from_pcformat, values=self.columns)
+        tpa = pa.transform(self.to_pcformat, self.mapping)
+
+        self.assertIsInstance(tpa, PcPatch)
+        self.assertEqual(tpa.pcformat, self.to_pcformat)
+        self.assertEqual(tpa.npoints, 3)
+        numpy.testing.assert_allclose(tpa.get_values('X'), self.columns[0])
+        numpy.testing.assert_allclose(
+            tpa.get_values('Reflectivity'), [132., 134., 136.01]
+        )
+
+    def test_apply_patch_reproject(self):
+
+        to_pcformat = PcFormat(pcid=3, srid=32609, dimensions=[
+            PcDimension(name='X', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Y', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Z', size=4, interpretation='int32_t', scale=0.01),
+            PcDimension(name='Intensity', size=2, interpretation='uint16_t'),
+        ])
+        to_pcformat.proj4text = '+proj=utm +zone=9 +datum=WGS84 +units=m +no_defs '
+
+        mapping = {'X': None, 'Y': None, 'Z': None, 'Intensity': None}
+        plan = PcTransformPlan(self.from_pcformat, to_pcformat, mapping)
+
+        pa = PcPatch(self.from_pcformat, values=self.columns)
+        tpa = plan.apply_patch(pa)
+
+        # coordinates are rounded to the scale of To dimensions
+        for idx, pt in enumerate(pa.points):
+            tpt = plan.apply(pt)
+            self.assertAlmostEqual(tpa.get_values('X')[idx], tpt.get_value('X'), 2)
+            self.assertAlmostEqual(tpa.get_values('Y')[idx], tpt.get_value('Y'), 2)
+
+        self.assertEqual(
+            tpa.get_raw_values('Z').tolist(), pa.get_raw_values('Z').tolist()
+        )
+        self.assertEqual(
+            tpa.get_raw_values('Intensity').tolist(), [4, 5, 6]
+        )
@@ -0,0 +1,50 @@
+import unittest
+
+from pgpointcloud_utils import PcTransformer, PcRunTimeException
+from pgpointcloud_utils.pccache import LRUCache
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru(self):
+
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+
+        # b is least recently used
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+class TestPcTransformer(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPcTransformer, self).setUp()
+
+        self.wgs84 = '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs '
+        self.utm9 = '+proj=utm +zone=9 +datum=WGS84 +units=m +no_defs '
+
+    def test_get(self):
+
+        PcTransformer.clear_cache()
+
+        transformer = PcTransformer.get(self.wgs84, self.utm9)
+        self.assertIsInstance(transformer, PcTransformer)
+        self.assertIs(PcTransformer.get(self.wgs84, self.utm9), transformer)
+        self.assertIsNot(PcTransformer.get(self.utm9, self.wgs84), transformer)
+
+    def test_invalid(self):
+
+        with self.assertRaises(PcRunTimeException):
+            PcTransformer(self.wgs84, None)
+
+    def test_transform(self):
+
+        transformer = PcTransformer.get(self.wgs84, self.utm9)
+        x, y = transformer.transform(-127., 45.)
+        self.assertAlmostEqual(x, 657630.64, 2)
+        self.assertAlmostEqual(y, 4984896.17, 2)
@@ -0,0 +1,323 @@
+import unittest
+import json
+import hashlib
+
+import numpy
+
+from pgpointcloud_utils import PcPatch, PcPoint
+from pgpointcloud_utils import plpython
+
+def make_schema(dimensions, compression):
+
+    xml = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<pc:PointCloudSchema xmlns:pc="http://pointcloud.org/schemas/PC/1.1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">',
+    ]
+    for position, (name, size, interpretation, scale) in enumerate(dimensions):
+        xml.append(
+            '<pc:dimension><pc:position>{position}</pc:position><pc:size>{size}</pc:size><pc:name>{name}</pc:name><pc:interpretation>{interpretation}</pc:interpretation><pc:scale>{scale}</pc:scale></pc:dimension>'.format(
+                position=position + 1,
+                size=size,
+                name=name,
+                interpretation=interpretation,
+                scale=scale
+            )
+        )
+    xml.append(
+        '<pc:metadata><Metadata name="compression">{compression}</Metadata></pc:metadata>'.format(
+            compression=compression
+        )
+    )
+    xml.append('</pc:PointCloudSchema>')
+
+    return '\n'.join(xml)
+
+class PlpyError(Exception):
+    pass
+
+class FakePlpy(object):
+    '''
+    stand-in for plpy. formats are looked up in a dict by pcid
+    '''
+
+    def __init__(self, formats):
+
+        self.formats = formats
+        self.cursors = {}
+        self.queries = []
+
+    def quote_ident(self, name):
+
+        return '"' + name + '"'
+
+    def execute(self, query, limit=None):
+
+        self.queries.append(query)
+
+        if query.startswith('FETCH'):
+            count, name = query.split()[2::2]
+            rows = self.cursors[name.strip('"')]
+            batch, rows[:] = rows[:int(count)], rows[int(count):]
+            return batch
+
+        pcid = int(query.rsplit('=', 1)[1])
+        if pcid not in self.formats:
+            return []
+
+        srid, schema, proj4text = self.formats[pcid]
+        fingerprint = hashlib.md5(
+            ':'.join([str(srid), schema, proj4text])
+        ).hexdigest()
+
+        return [{
+            'srid': srid,
+            'schema': schema,
+            'proj4text': proj4text,
+            'fingerprint': fingerprint,
+        }]
+
+    def error(self, message):
+
+        raise PlpyError(message)
+
+class TestPlpython(unittest.TestCase):
+
+    def setUp(self):
+        super(TestPlpython, self).setUp()
+
+        proj4text = '+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs '
+        self.plpy = FakePlpy({
+            1: (4326, make_schema([
+                ('X', 4, 'int32_t', 0.01),
+                ('Y', 4, 'int32_t', 0.01),
+                ('Intensity', 2, 'uint16_t', 1),
+            ], 'dimensional'), proj4text),
+            2: (4326, make_schema([
+                ('X', 8, 'double', 1),
+                ('Y', 8, 'double', 1),
+                ('Intensity', 2, 'uint16_t', 1),
+                ('Double', 4, 'uint32_t', 1),
+            ], 'ght'), proj4text),
+        })
+        self.SD = {}
+
+        self.mapping = json.dumps({
+            '1': None,
+            'Y': 'Y',
+            '3': 3,
+            'Double': {'expression': '$Intensity * 2'},
+        })
+
+    def test_load_mapping(self):
+
+        self.assertEqual(
+            plpython.load_mapping(self.mapping),
+            {
+                1: None,
+                'Y': 'Y',
+                3: 3,
+                'Double': {'expression': '$Intensity * 2'}
+            }
+        )
+
+    def test_transform_point(self):
+
+        from_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 1)
+        pt = PcPoint(from_pcformat, values=[-127., 45., 4])
+
+        hexstr = plpython.transform_point(
+            self.plpy, self.SD, pt.as_hex(), 2, self.mapping, 1
+        )
+        to_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 2)
+        tpt = PcPoint.from_hex(to_pcformat, hexstr)
+        self.assertEqual(tpt.values, [-127., 45., 4, 8])
+
+        # same pcid
+        self.assertEqual(
+            plpython.transform_point(
+                self.plpy, self.SD, pt.as_hex(), 1, self.mapping, 1
+            ),
+            pt.as_hex()
+        )
+
+        # unknown pcid
+        with self.assertRaises(PlpyError):
+            plpython.transform_point(
+                self.plpy, self.SD, pt.as_hex(), 3, self.mapping, 1
+            )
+
+    def test_transform_patch(self):
+
+        from_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 1)
+        pa = PcPatch(from_pcformat, values=[
+            numpy.array([-127., -127.01, -127.02]),
+            numpy.array([45., 45.01, 45.02]),
+            numpy.array([4, 5, 6]),
+        ])
+
+        hexstr = plpython.transform_patch(
+            self.plpy, self.SD, pa.as_hex(), 2, self.mapping, 1
+        )
+
+        # GHT is written as dimensional
+        self.assertEqual(
+            PcPatch.extract_compression_from_hex(hexstr),
+            PcPatch._COMPRESSION_ID[PcPatch.DIMENSIONAL]
+        )
+
+        to_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 2)
+        tpa = PcPatch.from_hex(to_pcformat, hexstr)
+        self.assertEqual(tpa.npoints, 3)
+        numpy.testing.assert_allclose(
+            tpa.get_values('X'), [-127., -127.01, -127.02]
+        )
+        self.assertEqual(tpa.get_values('Double').tolist(), [8, 10, 12])
+
+    def make_patches(self):
+
+        from_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 1)
+
+        pas = []
+        for i in xrange(5):
+            pas.append(PcPatch(from_pcformat, values=[
+                numpy.array([-127., -127.01]) - i,
+                numpy.array([45., 45.01]) + i,
+                numpy.array([4, 5]) + i,
+            ]).as_hex())
+
+        return pas
+
+    def test_transform_patches(self):
+
+        pas = self.make_patches()
+        pas.insert(2, None)
+
+        results = plpython.transform_patches(
+            self.plpy, self.SD, pas, 2, self.mapping, 1
+        )
+        self.assertEqual(next(results), plpython.transform_patch(
+            self.plpy, self.SD, pas[0], 2, self.mapping, 1
+        ))
+
+        results = list(results)
+        self.assertEqual(len(results), 5)
+        self.assertIsNone(results[1])
+
+        to_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 2)
+        tpa = PcPatch.from_hex(to_pcformat, results[-1])
+        self.assertEqual(tpa.get_values('Double').tolist(), [16, 18])
+
+    def test_fetch_cursor(self):
+
+        pas = self.make_patches()
+        self.plpy.cursors['patches'] = [{'pa': pa} for pa in pas]
+
+        results = list(plpython.transform_patches(
+            self.plpy, self.SD,
+            plpython.fetch_cursor(self.plpy, 'patches', 2),
+            2, self.mapping, 1
+        ))
+        self.assertEqual(results, list(plpython.transform_patches(
+            self.plpy, self.SD, pas, 2, self.mapping, 1
+        )))
+
+        fetches = [q for q in self.plpy.queries if q.startswith('FETCH')]
+        self.assertEqual(fetches, ['FETCH FORWARD 2 FROM "patches"'] * 3)
+
+        with self.assertRaises(PlpyError):
+            list(plpython.fetch_cursor(self.plpy, 'patches', 0))
+
+    def test_format_cache(self):
+
+        plpython.check_cache_txid(self.SD, 1)
+        pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 1)
+        self.assertIs(
+            plpython.get_pgpointcloud_format(self.plpy, self.SD, 1), pcformat
+        )
+        self.assertEqual(len(self.plpy.queries), 1)
+
+        # new transaction, format is validated once
+        plpython.check_cache_txid(self.SD, 2)
+        self.assertIs(
+            plpython.get_pgpointcloud_format(self.plpy, self.SD, 1), pcformat
+        )
+        self.assertIs(
+            plpython.get_pgpointcloud_format(self.plpy, self.SD, 1), pcformat
+        )
+        self.assertEqual(len(self.plpy.queries), 2)
+        self.assertIn('fingerprint', self.plpy.queries[-1])
+        self.assertNotIn('schema,', self.plpy.queries[-1])
+
+        # format changed, new transaction reloads format
+        srid, schema, proj4text = self.plpy.formats[1]
+        self.plpy.formats[1] = (
+            srid, schema.replace('uint16_t', 'uint32_t'), proj4text
+        )
+        plpython.check_cache_txid(self.SD, 3)
+        new_pcformat = plpython.get_pgpointcloud_format(self.plpy, self.SD, 1)
+        self.assertIsNot(new_pcformat, pcformat)
+        self.assertEqual(
+            new_pcformat.get_dimension('Intensity').interpretation, 'uint32_t'
+        )
+        self.assertEqual(len(self.plpy.queries), 4)
+
+    def test_plan_cache(self):
+
+        plpython.check_cache_txid(self.SD, 1)
+        plan = plpython.get_transform_plan(self.plpy, self.SD, 1, 2, self.mapping)
+        self.assertIs(
+            plpython.get_transform_plan(self.plpy, self.SD, 1, 2, self.mapping),
+            plan
+        )
+
+        # plan is rebuilt if a format is reloaded
+        srid, schema, proj4text = self.plpy.formats[2]
+        self.plpy.formats[2] = (srid, schema, proj4text + ' ')
+        plpython.check_cache_txid(self.SD, 2)
+        new_plan = plpython.get_transform_plan(
+            self.plpy, self.SD, 1, 2, self.mapping
+        )
+        self.assertIsNot(new_plan, plan)
+        self.assertIs(new_plan.from_pcformat, plan.from_pcformat)
+
+    def test_plan_cache_same_transaction(self):
+
+        plpython.check_cache_txid(self.SD, 1)
+        plan = plpython.get_transform_plan(self.plpy, self.SD, 1, 2, self.mapping)
+        num_queries = len(self.plpy.queries)
+
+        # no query for a plan already used in this transaction
+        for i in xrange(3):
+            self.assertIs(
+                plpython.get_transform_plan(
+                    self.plpy, self.SD, 1, 2, self.mapping
+                ),
+                plan
+            )
+        self.assertEqual(len(self.plpy.queries), num_queries)
+
+        # mappings are loaded once per JSON text
+        other_mapping = json.dumps(json.loads(self.mapping), indent=2)
+        other_plan = plpython.get_transform_plan(
+            self.plpy, self.SD, 1, 2, other_mapping
+        )
+        self.assertIsNot(other_plan, plan)
+        self.assertIs(
+            plpython.get_mapping(self.SD, self.mapping),
+            plpython.get_mapping(self.SD, self.mapping)
+        )
+
+    def test_plan_cache_size(self):
+
+        plpython.check_cache_txid(self.SD, 1)
+        for i in xrange(plpython.PLAN_CACHE_SIZE + 10):
+            mapping = json.loads(self.mapping)
+            mapping['Double'] = {'value': i}
+            plpython.get_transform_plan(
+                self.plpy, self.SD, 1, 2, json.dumps(mapping)
+            )
+
+        self.assertEqual(len(self.SD['plans']), plpython.PLAN_CACHE_SIZE)
+        self.assertEqual(
+            len(self.SD['mappings']), plpython.MAPPING_CACHE_SIZE
+        )